@@ -0,0 +1,272 @@
+"""存储、加密与启动性能基准。
+
+用法示例：
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000 --output new.json --compare bench.json
+
+结果以 JSON 输出：每个库规模下每个操作的吞吐量、p50/p99 延迟与峰值内存；
+--compare 模式与保存的基线逐项比较，任一指标退化超过阈值时以非零状态退出。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from save_api_key.storage import ApiKeyStore  # noqa: E402
+
+PASSWORD = "benchmark-password"
+# 生成库时使用低成本 KDF，只有 unlock 项使用默认参数
+FAST_KDF = {"algorithm": "pbkdf2-sha256", "iterations": 1000}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def peak_memory_kb(fn: Callable[[], object]) -> float:
+    """在 tracemalloc 下调用一次 fn，返回期间的峰值内存（KB）"""
+    tracemalloc.start()
+    try:
+        fn()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(
+    fn: Callable[[int], object],
+    repeat: int,
+    items_per_call: int = 1,
+    memory_fn: Callable[[], object] | None = None,
+) -> dict[str, float]:
+    """调用 fn(i) repeat 次，返回吞吐量、延迟分位数与峰值内存。
+
+    tracemalloc 会显著拖慢分配密集的操作，因此计时在关闭 tracemalloc 时进行，峰值内存另用一次
+    调用单独测量：默认再调用一次 fn(0)，有副作用的操作（如 create）通过 memory_fn 提供可重复的调用。
+    """
+    latencies: list[float] = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    peak_kb = peak_memory_kb(memory_fn or (lambda: fn(0)))
+    total = sum(latencies)
+    return {
+        "count": repeat,
+        "total_s": total,
+        "ops_per_s": repeat * items_per_call / total if total else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_kb": peak_kb,
+    }
+
+
+def _populate(db_path: str, size: int) -> ApiKeyStore:
+    store = ApiKeyStore(db_path, PASSWORD, kdf_params=FAST_KDF)
+    batch = 5000
+    for start in range(0, size, batch):
+        store.create_many(
+            (f"key_{i:07d}", f"secret-value-{i}-" + "x" * 40, f"remark {i}")
+            for i in range(start, min(size, start + batch))
+        )
+    return store
+
+
+def bench_size(size: int, samples: int, workdir: str) -> dict[str, dict[str, float]]:
+    db_path = os.path.join(workdir, f"vault_{size}.db")
+    results: dict[str, dict[str, float]] = {}
+
+    start = time.perf_counter()
+    store = _populate(db_path, size)
+    elapsed = time.perf_counter() - start
+    results["populate_create_many"] = {"count": size, "total_s": elapsed, "ops_per_s": size / elapsed}
+
+    rng = random.Random(size)
+    keys = [f"key_{rng.randrange(size):07d}" for _ in range(samples)]
+    results["get"] = measure(lambda i: store.get(keys[i]), samples)
+    # 写操作的内存测量依次作用于同一个探测 key：create 新建，update 修改，delete 删除
+    results["create"] = measure(
+        lambda i: store.create(f"new_{i:07d}", "value", "remark"), samples,
+        memory_fn=lambda: store.create("memory_probe", "value", "remark"),
+    )
+    results["update"] = measure(
+        lambda i: store.update(f"new_{i:07d}", f"new_{i:07d}", "value2", "remark2"), samples,
+        memory_fn=lambda: store.update("memory_probe", "memory_probe", "value2", "remark2"),
+    )
+    results["delete"] = measure(
+        lambda i: store.delete(f"new_{i:07d}"), samples,
+        memory_fn=lambda: store.delete("memory_probe"),
+    )
+    results["list_all"] = measure(lambda _i: store.list_all(), 3, items_per_call=size)
+    results["list_keys"] = measure(lambda _i: list(store.iter_keys()), 3, items_per_call=size)
+    store.close()
+
+    results["legacy_migration"] = bench_legacy_migration(db_path, size, workdir)
+    return results
+
+
+def bench_legacy_migration(template_db: str, size: int, workdir: str) -> dict[str, float]:
+    """把库改写成旧版格式（明文行 + 旁路的盐值/验证器文件）后，测量解锁时的迁移耗时"""
+    legacy_db = os.path.join(workdir, f"legacy_{size}.db")
+
+    def build() -> None:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(legacy_db + suffix):
+                os.remove(legacy_db + suffix)
+        conn = sqlite3.connect(template_db)
+        for name, value in conn.execute("SELECT name, value FROM meta WHERE name IN ('salt', 'verifier', 'kdf')"):
+            with open(f"{legacy_db}.{name}", "wb") as f:
+                f.write(value if isinstance(value, bytes) else value.encode())
+        conn.close()
+        conn = sqlite3.connect(legacy_db)
+        conn.execute("CREATE TABLE apikeys (key TEXT PRIMARY KEY, value TEXT NOT NULL, remark TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO apikeys VALUES (?, ?, ?)",
+            ((f"key_{i:07d}", f"plain-{i}", f"remark {i}") for i in range(size)),
+        )
+        conn.commit()
+        conn.close()
+
+    def run() -> None:
+        ApiKeyStore(legacy_db, PASSWORD).close()
+
+    # 迁移只能执行一次：计时与内存测量各用一份新建的旧库，重建不计入内存峰值
+    build()
+    result = measure(lambda _i: run(), 1, items_per_call=size, memory_fn=lambda: None)
+    build()
+    result["peak_kb"] = peak_memory_kb(run)
+    return result
+
+
+def bench_unlock(workdir: str, samples: int) -> dict[str, float]:
+    db_path = os.path.join(workdir, "unlock.db")
+    ApiKeyStore(db_path, PASSWORD).close()
+    return measure(lambda _i: ApiKeyStore(db_path, PASSWORD).close(), samples)
+
+
+def bench_cold_import(module: str, samples: int) -> dict[str, object]:
+    """在全新解释器中导入模块，只统计导入本身的耗时"""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - t)"
+    )
+    latencies: list[float] = []
+    for _ in range(samples):
+        proc = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            return {"error": error}
+        latencies.append(float(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "count": samples,
+        "total_s": sum(latencies),
+        "ops_per_s": samples / sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def run(sizes: list[int], samples: int) -> dict[str, object]:
+    workdir = tempfile.mkdtemp(prefix="save_api_key_bench_")
+    try:
+        results: dict[str, object] = {}
+        for size in sizes:
+            print(f"[INFO] 基准：{size} 条", file=sys.stderr)
+            results[str(size)] = bench_size(size, min(samples, size), workdir)
+        results["startup"] = {
+            "kdf_unlock": bench_unlock(workdir, 3),
+            "import_main": bench_cold_import("main", 3),
+            "import_ui": bench_cold_import("save_api_key.ui", 3),
+            "import_storage": bench_cold_import("save_api_key.storage", 3),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+
+# 指标越大越好的字段，其余延迟/内存字段越小越好
+_HIGHER_IS_BETTER = {"ops_per_s"}
+_COMPARED_FIELDS = ("ops_per_s", "p50_ms", "p99_ms", "peak_kb")
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """返回退化超过 threshold（比例）的指标说明"""
+    regressions: list[str] = []
+    for group, ops in current["results"].items():
+        base_ops = baseline.get("results", {}).get(group, {})
+        for op, metrics in ops.items():
+            base = base_ops.get(op)
+            if not base:
+                continue
+            for field in _COMPARED_FIELDS:
+                new, old = metrics.get(field), base.get(field)
+                if not new or not old:
+                    continue
+                ratio = new / old
+                worse = ratio < 1 - threshold if field in _HIGHER_IS_BETTER else ratio > 1 + threshold
+                marker = "REGRESSION" if worse else "ok"
+                print(f"{group:>8} {op:<22} {field:<10} {old:12.3f} -> {new:12.3f} ({ratio:6.2f}x) {marker}")
+                if worse:
+                    regressions.append(f"{group}/{op}/{field}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="save_api_key 性能基准")
+    parser.add_argument("--sizes", default="1000,10000", help="逗号分隔的库规模，例如 1000,10000,100000")
+    parser.add_argument("--samples", type=int, default=200, help="单条操作的采样次数")
+    parser.add_argument("--output", help="结果 JSON 文件路径，缺省输出到标准输出")
+    parser.add_argument("--compare", help="与之比较的基线 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的退化比例，默认 0.2")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run(sizes, args.samples)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} 项指标退化: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,22 @@
 import os
+import logging
+import threading
 import tkinter as tk
 from tkinter import ttk
 from save_api_key.config import get_default_db_path
 from save_api_key.storage import ApiKeyStore
 from save_api_key.ui import ApiKeyApp, LoginDialog
 
+logger = logging.getLogger("save_api_key.main")
+
 def get_master_password() -> str | None:
     """弹出登录对话框并返回用户输入的主密码"""
     db_path = get_default_db_path()
-    salt_path = db_path + ".salt"
-    is_first_run = not os.path.exists(salt_path)
+    # 不传主密码打开只读取 meta 表，不会派生密钥
+    with ApiKeyStore(db_path) as store:
+        is_first_run = not store.initialized
 
-    print("[DEBUG] 创建Tk根窗口...")
+    logger.debug("创建Tk根窗口...")
     root = tk.Tk()
     root.title("登录 - API Key Manager")
     
@@ -24,7 +29,7 @@ def get_master_password() -> str | None:
     y = (root.winfo_screenheight() - root.winfo_reqheight()) // 2
     root.geometry(f"+{x}+{y}")
 
-    print("[DEBUG] 创建 LoginDialog 对话框...")
+    logger.debug("创建 LoginDialog 对话框...")
     try:
         # 传入 is_first_run 参数
         dialog = LoginDialog(root, is_first_run=is_first_run)
@@ -37,35 +42,80 @@ def get_master_password() -> str | None:
         root.update()
         
     except Exception as e:
-        print(f"[ERROR] 初始化对话框失败: {e}")
+        logger.error("初始化对话框失败: %s", e)
         root.destroy()
         return None
 
-    print("[DEBUG] 等待登录对话框关闭...")
+    logger.debug("等待登录对话框关闭...")
     root.wait_window(dialog)
 
     result = getattr(dialog, 'result', None)
-    print(f"[DEBUG] 登录对话框已关闭，是否获得密码: {result is not None}")
+    logger.debug("登录对话框已关闭，是否获得密码: %s", result is not None)
 
     root.destroy()
     return result
 
+def unlock_store(db_path: str, master_password: str) -> ApiKeyStore:
+    """在后台线程中派生密钥并打开存储，期间显示进度窗口，避免界面卡死"""
+    root = tk.Tk()
+    root.title("解锁中 - API Key Manager")
+    root.resizable(False, False)
+    ttk.Label(root, text="正在解锁数据库，请稍候...").pack(padx=20, pady=(15, 8))
+    progress = ttk.Progressbar(root, mode="indeterminate", length=240)
+    progress.pack(padx=20, pady=(0, 15))
+    progress.start(10)
+    root.update_idletasks()
+    x = (root.winfo_screenwidth() - root.winfo_reqwidth()) // 2
+    y = (root.winfo_screenheight() - root.winfo_reqheight()) // 2
+    root.geometry(f"+{x}+{y}")
+
+    outcome: dict[str, object] = {}
+
+    def work() -> None:
+        try:
+            outcome["store"] = ApiKeyStore(db_path, master_password, access_stats=True)
+        except Exception as exc:
+            outcome["error"] = exc
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+
+    def poll() -> None:
+        if worker.is_alive():
+            root.after(50, poll)
+        else:
+            root.quit()
+
+    root.after(50, poll)
+    root.mainloop()
+    root.destroy()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["store"]
+
 def main() -> None:
-    print("[DEBUG] 程序启动...")
+    # 默认只输出警告及以上；设置 SAVE_API_KEY_LOG_LEVEL=DEBUG 查看详细日志
+    logging.basicConfig(
+        level=os.environ.get("SAVE_API_KEY_LOG_LEVEL", "WARNING").upper(),
+        format="[%(levelname)s] %(name)s: %(message)s",
+    )
+    logger.debug("程序启动...")
     try:
         # 获取主密码
-        print("[DEBUG] 开始获取主密码...")
+        logger.debug("开始获取主密码...")
         master_password = get_master_password()
         if not master_password:
-            print("[DEBUG] 用户取消登录")
+            logger.debug("用户取消登录")
             return  # 用户取消
         
-        print("[DEBUG] 获取到主密码，开始验证...")
+        logger.debug("获取到主密码，开始验证...")
 
         # 验证密码并创建存储
         db_path = get_default_db_path()
-        store = ApiKeyStore(db_path, master_password)
-        if not store.verify_password(master_password):
+        # 构造时只派生一次密钥，并直接用派生出的 cipher 校验验证器
+        store = unlock_store(db_path, master_password)
+        if not store.unlocked:
+            store.close()
             # 立即置空密码变量，减少内存停留时间
             master_password = None
             # 创建临时 root 用于显示错误弹窗
@@ -76,7 +126,7 @@ def main() -> None:
             temp_root.destroy()
             return
 
-        print("[DEBUG] 密码验证成功，启动主应用...")
+        logger.debug("密码验证成功，启动主应用...")
         # 验证通过后，也应尽快置空密码
         master_password = None
         
@@ -97,11 +147,11 @@ def main() -> None:
                 )
             else:
                 raise e
+        finally:
+            store.close()
         
     except Exception as e:
-        print(f"[ERROR] 程序运行错误: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("程序运行错误: %s", e)
         raise
 
 if __name__ == "__main__":
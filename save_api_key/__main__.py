@@ -0,0 +1,5 @@
+import sys
+
+from save_api_key.cli import main
+
+sys.exit(main())
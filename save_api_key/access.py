@@ -0,0 +1,83 @@
+"""按 key 统计访问次数与最近访问时间，先在内存中累计，再按间隔或关闭时批量写回（write-behind）。
+
+读取路径上只是一次加锁的字典更新，不产生任何写事务；后台线程每隔 interval 把累计的增量交给
+flush 回调，在一个事务中用 executemany 写入。回调失败时增量合并回内存，下次重试，不会丢失。
+进程异常退出时尚未写回的统计会丢失，这是以读路径零写入换来的取舍。
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# {key: (新增访问次数, 最近访问时间)}
+AccessCounts = dict[str, tuple[int, float]]
+FlushCallback = Callable[[AccessCounts], None]
+
+
+class AccessRecorder:
+    def __init__(self, flush: FlushCallback, interval: float, clock: Callable[[], float] = time.time) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self._flush = flush
+        self._interval = interval
+        self._clock = clock
+        self._pending: AccessCounts = {}
+        self._lock = threading.Lock()
+        # 保证同一时间只有一次写回，close 的最后一次写回不会与后台线程交错
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, keys: Iterable[str]) -> None:
+        """记一次访问；首次调用时才启动后台写回线程"""
+        now = self._clock()
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            for key in keys:
+                count, _last = self._pending.get(key, (0, now))
+                self._pending[key] = (count + 1, now)
+            if self._thread is None and self._pending:
+                self._thread = threading.Thread(target=self._run, name="save_api_key-access", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> int:
+        """立即写回累计的增量，返回写回的 key 数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                self._flush(pending)
+            except BaseException:
+                with self._lock:
+                    for key, (count, last) in self._pending.items():
+                        old_count, old_last = pending.get(key, (0, last))
+                        pending[key] = (old_count + count, max(old_last, last))
+                    self._pending = pending
+                raise
+            return len(pending)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("access stats flush failed")
+
+    def close(self) -> None:
+        """停止后台线程并做最后一次写回；之后的 record 被忽略"""
+        with self._lock:
+            self._stopped.set()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
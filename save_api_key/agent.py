@@ -0,0 +1,280 @@
+"""类似 ssh-agent 的解锁守护进程。
+
+守护进程解锁一次后在内存中持有派生密钥，通过权限受限（0600，所在目录 0700）的
+Unix 域套接字提供 get / get_many / list 查询，空闲超时后自动锁定并退出。
+
+协议：每帧为 4 字节大端长度前缀 + UTF-8 JSON。
+请求 {"op": "...", ...}，响应 {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}。
+"""
+from __future__ import annotations
+
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+from typing import Any
+
+from save_api_key.storage import ApiKeyRecord, ApiKeyStore
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class AgentError(Exception):
+    pass
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock: socket.socket, payload: dict[str, Any]) -> None:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(data) > MAX_FRAME_SIZE:
+        raise AgentError("frame too large")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock: socket.socket) -> dict[str, Any] | None:
+    """读取一帧；对端正常关闭时返回 None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise AgentError("frame too large")
+    data = _recv_exact(sock, size)
+    if data is None:
+        raise AgentError("connection closed mid-frame")
+    return json.loads(data)
+
+
+def _record_to_dict(record: ApiKeyRecord) -> dict[str, str]:
+    return {"key": record.key, "value": record.value, "remark": record.remark}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        agent = self.server.agent
+        try:
+            self._serve(agent)
+        finally:
+            # 每个客户端连接一个线程，线程结束前关闭它在 store 中打开的 SQLite 连接
+            agent._store.release_connection()
+
+    def _serve(self, agent: "AgentServer") -> None:
+        if not agent._peer_allowed(self.request):
+            return
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except (AgentError, ValueError, OSError):
+                return
+            if request is None:
+                return
+            agent._touch()
+            try:
+                response = {"ok": True, "result": agent._dispatch(request)}
+            except Exception as exc:
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            try:
+                send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    agent: "AgentServer"
+
+
+class AgentServer:
+    def __init__(self, store: ApiKeyStore, socket_path: str, idle_timeout: float = 900.0) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise AgentError("unix domain sockets are not supported on this platform")
+        if not store.unlocked:
+            raise AgentError("store must be unlocked")
+        self._store = store
+        self._socket_path = socket_path
+        self._idle_timeout = idle_timeout
+        self._last_activity = time.monotonic()
+        self._server: _UnixServer | None = None
+        # 绑定后套接字文件的 (st_dev, st_ino)，退出时只删除自己创建的那个文件
+        self._socket_id: tuple[int, int] | None = None
+        self._stopped = threading.Event()
+
+    def _touch(self) -> None:
+        self._last_activity = time.monotonic()
+
+    def _peer_allowed(self, sock: socket.socket) -> bool:
+        # Linux 上额外校验对端 uid，文件权限之外再加一层保护
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _pid, uid, _gid = struct.unpack("3i", creds)
+        return uid == os.getuid()
+
+    def _dispatch(self, request: dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "ping":
+            return "pong"
+        if op == "get":
+            record = self._store.get(request["key"])
+            return _record_to_dict(record) if record is not None else None
+        if op == "get_many":
+            return {
+                r.key: _record_to_dict(r.record)
+                for r in self._store.get_many(request["keys"])
+                if r.ok
+            }
+        if op == "list":
+            return [{"key": e.key, "remark": e.remark} for e in self._store.iter_keys()]
+        if op == "lock":
+            threading.Thread(target=self.stop, daemon=True).start()
+            return None
+        raise AgentError(f"unknown op: {op}")
+
+    def _bind(self) -> _UnixServer:
+        directory = os.path.dirname(os.path.abspath(self._socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._remove_stale_socket()
+        old_umask = os.umask(0o177)
+        try:
+            server = _UnixServer(self._socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self._socket_path, 0o600)
+        st = os.stat(self._socket_path)
+        self._socket_id = (st.st_dev, st.st_ino)
+        server.agent = self
+        return server
+
+    def _remove_stale_socket(self) -> None:
+        """只删除上次异常退出遗留的套接字：不是套接字的文件或仍有 agent 在监听时拒绝启动"""
+        try:
+            st = os.lstat(self._socket_path)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(st.st_mode):
+            raise AgentError(f"{self._socket_path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.settimeout(1.0)
+        try:
+            probe.connect(self._socket_path)
+        except OSError as exc:
+            if exc.errno != errno.ECONNREFUSED:
+                raise AgentError(f"cannot check existing socket {self._socket_path}: {exc}") from exc
+        else:
+            raise AgentError(f"another agent is already listening on {self._socket_path}")
+        finally:
+            probe.close()
+        os.unlink(self._socket_path)
+
+    def _unlink_own_socket(self) -> None:
+        try:
+            st = os.lstat(self._socket_path)
+        except FileNotFoundError:
+            return
+        # 套接字已被删除并由其他 agent 重新创建时不去动它
+        if (st.st_dev, st.st_ino) == self._socket_id:
+            os.unlink(self._socket_path)
+
+    def _watch_idle(self) -> None:
+        while not self._stopped.wait(min(5.0, self._idle_timeout)):
+            if time.monotonic() - self._last_activity >= self._idle_timeout:
+                self.stop()
+                return
+
+    def serve_forever(self) -> None:
+        """阻塞运行直到被锁定（lock 请求、空闲超时或 stop()）"""
+        self._server = self._bind()
+        self._touch()
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._server.server_close()
+            self._unlink_own_socket()
+            self._store.lock()
+
+    def stop(self) -> None:
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._store.lock()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class AgentClient:
+    """与守护进程通信的客户端，连接在多次调用间复用"""
+
+    def __init__(self, socket_path: str, timeout: float = 5.0) -> None:
+        self._socket_path = socket_path
+        self._timeout = timeout
+        self._sock: socket.socket | None = None
+
+    def __enter__(self) -> "AgentClient":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _call(self, payload: dict[str, Any]) -> Any:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(self._socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        try:
+            send_frame(self._sock, payload)
+            response = recv_frame(self._sock)
+        except (OSError, AgentError):
+            self.close()
+            raise
+        if response is None:
+            self.close()
+            raise AgentError("agent closed the connection")
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "agent error"))
+        return response.get("result")
+
+    def ping(self) -> bool:
+        return self._call({"op": "ping"}) == "pong"
+
+    def get(self, key: str) -> ApiKeyRecord | None:
+        data = self._call({"op": "get", "key": key})
+        return ApiKeyRecord(data["key"], data["value"], data["remark"]) if data else None
+
+    def get_many(self, keys: list[str]) -> dict[str, ApiKeyRecord]:
+        data = self._call({"op": "get_many", "keys": list(keys)})
+        return {k: ApiKeyRecord(v["key"], v["value"], v["remark"]) for k, v in data.items()}
+
+    def list(self) -> list[dict[str, str]]:
+        return self._call({"op": "list"})
+
+    def lock(self) -> None:
+        self._call({"op": "lock"})
+        self.close()
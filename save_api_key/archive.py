@@ -0,0 +1,146 @@
+"""加密备份归档格式（流式读写）。
+
+布局：MAGIC + 4 字节头长度 + JSON 头（KDF 参数与盐值），随后是若干帧，
+每帧为 4 字节长度 + 1 字节结束标记 + nonce + AES-GCM(zlib(NDJSON))。
+附加认证数据为 头 + 帧序号 + 结束标记，帧被重排、截断或替换都会导致认证失败；
+最后一帧为空的结束帧，缺失时视为归档被截断。
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import struct
+import zlib
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Union
+
+from save_api_key import kdf
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIC = b"SAKARC\x01"
+_LENGTH = struct.Struct(">I")
+_FRAME_HEADER = struct.Struct(">IB")
+_FRAME_AAD = struct.Struct(">QB")
+_NONCE_SIZE = 12
+_ARCHIVE_INFO = b"save_api_key archive v1"
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+ArchiveSource = Union[BinaryIO, Iterable[bytes]]
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _archive_cipher(password: str, salt: bytes, params: dict[str, object]) -> AESGCM:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    raw_key = kdf.derive_key(password, salt, params)
+    key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_ARCHIVE_INFO).derive(raw_key)
+    return AESGCM(key)
+
+
+def _seal_frame(aead: AESGCM, header: bytes, index: int, final: bool, rows: list[dict[str, str]]) -> bytes:
+    payload = zlib.compress(
+        b"".join(
+            json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+            for row in rows
+        )
+    )
+    nonce = os.urandom(_NONCE_SIZE)
+    body = nonce + aead.encrypt(nonce, payload, header + _FRAME_AAD.pack(index, final))
+    return _FRAME_HEADER.pack(len(body), final) + body
+
+
+def write_archive(
+    batches: Iterable[list[dict[str, str]]],
+    password: str,
+    kdf_params: dict[str, object],
+) -> Iterator[bytes]:
+    """把逐批产生的记录编码为归档，按帧产出 bytes；每批对应一帧"""
+    # 与恢复时相同的范围检查，不会写出无法恢复的归档
+    kdf_params = kdf.validate_params(kdf_params)
+    salt = os.urandom(16)
+    header = json.dumps(
+        {"kdf": kdf_params, "salt": base64.b64encode(salt).decode()},
+        separators=(",", ":"),
+    ).encode()
+    aead = _archive_cipher(password, salt, kdf_params)
+    yield MAGIC + _LENGTH.pack(len(header)) + header
+    index = 0
+    for rows in batches:
+        if rows:
+            yield _seal_frame(aead, header, index, False, rows)
+            index += 1
+    yield _seal_frame(aead, header, index, True, [])
+
+
+class _Reader:
+    """统一读取文件对象或 bytes 块迭代器"""
+
+    def __init__(self, source: ArchiveSource) -> None:
+        self._file = source if hasattr(source, "read") else None
+        self._chunks = None if self._file is not None else iter(source)
+        self._buf = bytearray()
+
+    def read_exact(self, size: int) -> bytes:
+        if self._file is not None:
+            data = self._file.read(size)
+            while data is not None and 0 < len(data) < size:
+                more = self._file.read(size - len(data))
+                if not more:
+                    break
+                data += more
+        else:
+            while len(self._buf) < size:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buf += chunk
+            data = bytes(self._buf[:size])
+            del self._buf[:size]
+        if not data or len(data) < size:
+            raise ArchiveError("archive truncated")
+        return data
+
+
+def read_archive(source: ArchiveSource, password: str) -> Iterator[list[dict[str, str]]]:
+    """逐帧解密并产出记录批次；认证失败或截断时抛出 ArchiveError"""
+    from cryptography.exceptions import InvalidTag
+
+    reader = _Reader(source)
+    if reader.read_exact(len(MAGIC)) != MAGIC:
+        raise ArchiveError("not a save_api_key archive")
+    (header_size,) = _LENGTH.unpack(reader.read_exact(_LENGTH.size))
+    if header_size > MAX_FRAME_SIZE:
+        raise ArchiveError("archive header too large")
+    header = reader.read_exact(header_size)
+    try:
+        meta = json.loads(header)
+        salt = base64.b64decode(meta["salt"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ArchiveError("malformed archive header") from exc
+    try:
+        # 归档头是不可信输入：派生之前先限定算法与成本，构造的参数不能让恢复卡死或耗尽内存
+        params = kdf.validate_params(meta.get("kdf"))
+    except ValueError as exc:
+        raise ArchiveError(f"unacceptable archive kdf parameters: {exc}") from exc
+    aead = _archive_cipher(password, salt, params)
+    index = 0
+    while True:
+        size, final = _FRAME_HEADER.unpack(reader.read_exact(_FRAME_HEADER.size))
+        if size > MAX_FRAME_SIZE or size <= _NONCE_SIZE:
+            raise ArchiveError("invalid frame size")
+        body = reader.read_exact(size)
+        try:
+            payload = aead.decrypt(body[:_NONCE_SIZE], body[_NONCE_SIZE:], header + _FRAME_AAD.pack(index, final))
+        except InvalidTag as exc:
+            raise ArchiveError("archive authentication failed (wrong password or corrupted data)") from exc
+        if final:
+            return
+        yield [json.loads(line) for line in zlib.decompress(payload).splitlines() if line]
+        index += 1
@@ -0,0 +1,210 @@
+"""供 asyncio 服务使用的 ApiKeyStore 包装。
+
+所有 SQL 与加解密（包括解锁时的 KDF）都在一个有界线程池中执行，不阻塞事件循环；
+同一 key 的并发 get 会合并为一次查询，写操作完成后丢弃该 key 正在进行的合并查询，
+保证写入之后发起的读取一定能看到新值。
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from save_api_key.storage import ApiKeyEntry, ApiKeyRecord, ApiKeyStore, BatchResult, ChangeSet, KeyUsage
+
+R = TypeVar("R")
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _read_records(store: ApiKeyStore, batch_size: int, after: str | None) -> tuple[list[ApiKeyRecord], str | None]:
+    """读取一页记录：一次键集分页查询 + 一次批量解密，返回 (记录, 本页最后一个 key)"""
+    page = store.list_keys(limit=batch_size, after=after)
+    if not page:
+        return [], None
+    results = store.get_many([entry.key for entry in page])
+    return [r.record for r in results if r.ok], page[-1].key if len(page) == batch_size else None
+
+
+class AsyncApiKeyStore:
+    def __init__(self, store: ApiKeyStore, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive")
+        self._store = store
+        # 线程数即同时访问数据库的上限，每个工作线程持有 store 的一个长连接
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="save_api_key-async",
+        )
+        self._inflight: dict[str, asyncio.Future[Optional[ApiKeyRecord]]] = {}
+
+    @classmethod
+    async def open(
+        cls,
+        db_path: str,
+        master_password: str | None = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        **kwargs: object,
+    ) -> "AsyncApiKeyStore":
+        """在线程池中构造 ApiKeyStore，解锁时的 KDF 与旧数据迁移不会阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        store = await loop.run_in_executor(
+            None, functools.partial(ApiKeyStore, db_path, master_password, **kwargs)
+        )
+        return cls(store, max_workers=max_workers)
+
+    @property
+    def store(self) -> ApiKeyStore:
+        return self._store
+
+    @property
+    def unlocked(self) -> bool:
+        return self._store.unlocked
+
+    async def __aenter__(self) -> "AsyncApiKeyStore":
+        return self
+
+    async def __aexit__(self, *_exc: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """等待已提交的操作完成后关闭线程池与数据库连接"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        await loop.run_in_executor(None, self._store.close)
+
+    async def _run(self, fn: Callable[..., R], *args: object) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def _forget(self, *keys: str) -> None:
+        for key in keys:
+            self._inflight.pop(key, None)
+
+    async def get(self, key: str) -> Optional[ApiKeyRecord]:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(self._store.get, key))
+            self._inflight[key] = future
+
+            def _done(f: asyncio.Future, key: str = key) -> None:
+                # 只移除自己：写操作可能已丢弃本次查询并由新的查询占位
+                if self._inflight.get(key) is f:
+                    del self._inflight[key]
+
+            future.add_done_callback(_done)
+        # shield：单个调用方被取消时不影响共享同一查询的其他调用方
+        return await asyncio.shield(future)
+
+    async def create(self, key: str, value: str, remark: str, expires_at: float | None = None) -> ApiKeyRecord:
+        try:
+            return await self._run(self._store.create, key, value, remark, expires_at)
+        finally:
+            self._forget(key)
+
+    async def update(self, old_key: str, new_key: str, new_value: str, new_remark: str) -> ApiKeyRecord:
+        try:
+            return await self._run(self._store.update, old_key, new_key, new_value, new_remark)
+        finally:
+            self._forget(old_key, new_key)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._run(self._store.delete, key)
+        finally:
+            self._forget(key)
+
+    async def set_expiry(self, key: str, expires_at: float | None) -> None:
+        await self._run(self._store.set_expiry, key, expires_at)
+
+    async def list_expiring(self, within: float = 0.0, now: float | None = None) -> list[ApiKeyEntry]:
+        return await self._run(self._store.list_expiring, within, now)
+
+    async def purge_expired(self, now: float | None = None) -> list[str]:
+        keys = await self._run(self._store.purge_expired, now)
+        self._forget(*keys)
+        return keys
+
+    async def list_all(self) -> list[dict[str, str]]:
+        return await self._run(self._store.list_all)
+
+    async def list_keys(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        after: str | None = None,
+    ) -> list[ApiKeyEntry]:
+        return await self._run(self._store.list_keys, limit, offset, after)
+
+    async def search(self, query: str, limit: int = 50) -> list[ApiKeyEntry]:
+        return await self._run(self._store.search, query, limit)
+
+    async def changes_since(self, revision: int) -> ChangeSet:
+        return await self._run(self._store.changes_since, revision)
+
+    async def top_keys(self, n: int = 10) -> list[KeyUsage]:
+        return await self._run(self._store.top_keys, n)
+
+    async def unused_since(self, since: float) -> list[KeyUsage]:
+        return await self._run(self._store.unused_since, since)
+
+    async def verify_password(self, master_password: str) -> bool:
+        return await self._run(self._store.verify_password, master_password)
+
+    async def rotate_master_password(self, old_password: str, new_password: str) -> int:
+        return await self._run(self._store.rotate_master_password, old_password, new_password)
+
+    async def create_many(self, items: Iterable[tuple[str, str, str]]) -> list[BatchResult]:
+        items = list(items)
+        try:
+            return await self._run(self._store.create_many, items)
+        finally:
+            self._forget(*(item[0] for item in items))
+
+    async def get_many(self, keys: Iterable[str]) -> list[BatchResult]:
+        return await self._run(self._store.get_many, list(keys))
+
+    async def update_many(self, items: Iterable[tuple[str, str, str, str]]) -> list[BatchResult]:
+        items = list(items)
+        try:
+            return await self._run(self._store.update_many, items)
+        finally:
+            self._forget(*(k for item in items for k in item[:2]))
+
+    async def delete_many(self, keys: Iterable[str]) -> list[BatchResult]:
+        keys = list(keys)
+        try:
+            return await self._run(self._store.delete_many, keys)
+        finally:
+            self._forget(*keys)
+
+    async def iter_keys(self, batch_size: int = 500) -> AsyncIterator[ApiKeyEntry]:
+        """按 key 顺序异步流式返回元数据，不解密"""
+        after: str | None = None
+        while True:
+            page = await self._run(self._store.list_keys, batch_size, 0, after)
+            for entry in page:
+                yield entry
+            if len(page) < batch_size:
+                return
+            after = page[-1].key
+
+    async def iter_records(self, batch_size: int = 500) -> AsyncIterator[ApiKeyRecord]:
+        """按 key 顺序异步流式返回解密后的记录，每页只在线程池中执行一次任务"""
+        after: str | None = None
+        while True:
+            records, after = await self._run(_read_records, self._store, batch_size, after)
+            for record in records:
+                yield record
+            if after is None:
+                return
+
+    def __aiter__(self) -> AsyncIterator[ApiKeyRecord]:
+        return self.iter_records()
+
+    async def lock(self) -> None:
+        await self._run(self._store.lock)
+
+    def stats(self) -> dict[str, dict]:
+        return self._store.stats()
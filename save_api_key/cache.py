@@ -0,0 +1,90 @@
+"""解密结果的进程内缓存：容量上限 + LRU 淘汰 + 每项 TTL。
+
+明文以 bytearray 保存，过期、淘汰、失效或 clear() 时原地清零，缩短明文在内存中的停留时间；
+get 返回的 str 由 Python 管理，无法清零，调用方用完即弃。
+写入与读取之间的竞争由代数（generation）解决：读库前记下代数，期间发生过任何失效时不回填缓存，
+避免把已被覆盖的旧值写回。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class _Entry:
+    __slots__ = ("value", "remark", "expires")
+
+    def __init__(self, value: bytearray, remark: str, expires: float) -> None:
+        self.value = value
+        self.remark = remark
+        self.expires = expires
+
+    def wipe(self) -> None:
+        self.value[:] = bytes(len(self.value))
+
+
+class RecordCache:
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[str, str] | None:
+        """返回未过期的 (value, remark) 并标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= self._clock():
+                del self._entries[key]
+                entry.wipe()
+                return None
+            self._entries.move_to_end(key)
+            return entry.value.decode(), entry.remark
+
+    def put(self, key: str, value: str, remark: str, generation: int) -> int:
+        """写入一条记录，返回因超出容量而淘汰的条目数；generation 已过期时不写入"""
+        evicted = 0
+        with self._lock:
+            if generation != self._generation:
+                return 0
+            old = self._entries.pop(key, None)
+            if old is not None:
+                old.wipe()
+            self._entries[key] = _Entry(bytearray(value.encode()), remark, self._clock() + self._ttl)
+            while len(self._entries) > self._max_size:
+                _key, entry = self._entries.popitem(last=False)
+                entry.wipe()
+                evicted += 1
+        return evicted
+
+    def invalidate(self, keys: list[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    entry.wipe()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            for entry in self._entries.values():
+                entry.wipe()
+            self._entries.clear()
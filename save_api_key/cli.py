@@ -0,0 +1,503 @@
+"""无界面的命令行入口：python -m save_api_key <command> ...
+
+只导入 storage，不加载 tkinter / Pillow / pystray；cryptography 在需要解锁时才导入。
+主密码优先从环境变量 SAVE_API_KEY_PASSWORD 读取，否则交互式输入。
+设置了 SAVE_API_KEY_AGENT_SOCK 时，get 会先向已解锁的 agent 查询，无需主密码与 KDF。
+"""
+from __future__ import annotations
+
+import argparse
+import getpass
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from save_api_key.config import get_default_agent_socket_path, get_default_db_path
+from save_api_key.importers import FORMATS
+from save_api_key.storage import CONFLICT_POLICIES, CONFLICT_SKIP, ApiKeyStore, ImportResult
+
+PASSWORD_ENV = "SAVE_API_KEY_PASSWORD"
+NEW_PASSWORD_ENV = "SAVE_API_KEY_NEW_PASSWORD"
+ARCHIVE_PASSWORD_ENV = "SAVE_API_KEY_ARCHIVE_PASSWORD"
+AGENT_ENV = "SAVE_API_KEY_AGENT_SOCK"
+# run 启动的子进程不继承主密码等凭据
+_CREDENTIAL_ENVS = (PASSWORD_ENV, NEW_PASSWORD_ENV, ARCHIVE_PASSWORD_ENV)
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+# list 带搜索条件且未指定 --limit 时最多输出的条数
+_SEARCH_LIMIT = 100
+
+
+class CliError(Exception):
+    pass
+
+
+def _read_password() -> str:
+    password = os.environ.get(PASSWORD_ENV)
+    if password:
+        return password
+    if not sys.stdin.isatty():
+        raise CliError(f"未提供主密码：请设置环境变量 {PASSWORD_ENV}")
+    return getpass.getpass("主密码: ")
+
+
+def _read_new_password() -> str:
+    password = os.environ.get(NEW_PASSWORD_ENV)
+    if password:
+        return password
+    if not sys.stdin.isatty():
+        raise CliError(f"未提供新主密码：请设置环境变量 {NEW_PASSWORD_ENV}")
+    password = getpass.getpass("新主密码: ")
+    if password != getpass.getpass("再次输入新主密码: "):
+        raise CliError("两次输入的新主密码不一致")
+    return password
+
+
+def _open_store(args: argparse.Namespace, **kwargs: object) -> ApiKeyStore:
+    store = ApiKeyStore(args.db, _read_password(), **kwargs)
+    if not store.unlocked:
+        store.close()
+        raise CliError("主密码错误")
+    return store
+
+
+def _parse_duration(text: str) -> float:
+    """把 90、90s、30m、12h、30d、2w 形式的时长转换为秒"""
+    text = text.strip().lower()
+    scale = _DURATION_UNITS.get(text[-1:], None)
+    number = text[:-1] if scale is not None else text
+    try:
+        seconds = float(number) * (scale or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的时长: {text!r}") from None
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(f"时长不能为负: {text!r}")
+    return seconds
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def _get_via_agent(key: str):
+    from save_api_key.agent import AgentClient, AgentError
+
+    try:
+        with AgentClient(os.environ[AGENT_ENV]) as client:
+            return True, client.get(key)
+    except (OSError, AgentError):
+        # agent 未运行或已锁定时退回直接读库
+        return False, None
+
+
+def _get_many_via_agent(keys: list[str]) -> dict[str, str] | None:
+    from save_api_key.agent import AgentClient, AgentError
+
+    try:
+        with AgentClient(os.environ[AGENT_ENV]) as client:
+            return {key: record.value for key, record in client.get_many(keys).items()}
+    except (OSError, AgentError):
+        return None
+
+
+def _cmd_get(args: argparse.Namespace) -> int:
+    found = False
+    if os.environ.get(AGENT_ENV):
+        found, record = _get_via_agent(args.key)
+    if not found:
+        with _open_store(args) as store:
+            record = store.get(args.key)
+    if record is None:
+        raise CliError(f"key 不存在: {args.key}")
+    if args.json:
+        print(json.dumps({"key": record.key, "value": record.value, "remark": record.remark}, ensure_ascii=False))
+    else:
+        print(record.value)
+    return 0
+
+
+def _cmd_list(args: argparse.Namespace) -> int:
+    # 列表只读取 key 与备注，不需要主密码，也不会加载加密库
+    with ApiKeyStore(args.db) as store:
+        if args.expiring is not None:
+            entries = store.list_expiring(args.expiring)
+            if args.query:
+                query = args.query.lower()
+                entries = [e for e in entries if query in e.key.lower() or query in e.remark.lower()]
+        elif args.query:
+            entries = store.search(args.query, limit=args.limit if args.limit is not None else _SEARCH_LIMIT)
+        else:
+            entries = store.iter_keys()
+        # 不带搜索条件时 iter_keys 是分批读取的生成器，截断后不会再读取后面的批次
+        for entry in itertools.islice(entries, args.limit):
+            if args.json:
+                item = {"key": entry.key, "remark": entry.remark}
+                if entry.expires_at is not None:
+                    item["expires_at"] = entry.expires_at
+                print(json.dumps(item, ensure_ascii=False))
+            elif entry.expires_at is not None:
+                print(f"{entry.key}\t{entry.remark}\t{_format_time(entry.expires_at)}")
+            else:
+                print(f"{entry.key}\t{entry.remark}")
+    return 0
+
+
+def _cmd_set(args: argparse.Namespace) -> int:
+    value = sys.stdin.readline().rstrip("\n") if args.value == "-" else args.value
+    with _open_store(args) as store:
+        existing = store.get(args.key)
+        if existing is None:
+            store.create(args.key, value, args.remark or args.key)
+        else:
+            store.update(args.key, args.key, value, args.remark or existing.remark)
+    return 0
+
+
+def _cmd_delete(args: argparse.Namespace) -> int:
+    with _open_store(args) as store:
+        if store.get(args.key) is None:
+            raise CliError(f"key 不存在: {args.key}")
+        store.delete(args.key)
+    return 0
+
+
+def _cmd_usage(args: argparse.Namespace) -> int:
+    # 统计只读取 key、备注与计数列，不需要主密码
+    with ApiKeyStore(args.db) as store:
+        if args.unused_for is not None:
+            usages = store.unused_since(time.time() - args.unused_for)
+        else:
+            usages = store.top_keys(args.top)
+        for usage in usages:
+            if args.json:
+                item = {"key": usage.key, "count": usage.count, "last_access": usage.last_access}
+                print(json.dumps(item, ensure_ascii=False))
+            else:
+                last = _format_time(usage.last_access) if usage.last_access is not None else "-"
+                print(f"{usage.key}\t{usage.count}\t{last}")
+    return 0
+
+
+def _cmd_expire(args: argparse.Namespace) -> int:
+    expires_at = None if args.clear else time.time() + args.after
+    with _open_store(args) as store:
+        try:
+            store.set_expiry(args.key, expires_at)
+        except KeyError:
+            raise CliError(f"key 不存在: {args.key}") from None
+    return 0
+
+
+def _cmd_purge(args: argparse.Namespace) -> int:
+    with _open_store(args) as store:
+        for key in store.purge_expired():
+            print(key)
+    return 0
+
+
+def _open_private(path: str):
+    """以仅当前用户可读写（0600）的权限创建或截断文件；已存在的文件也收紧权限"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o600)
+        return os.fdopen(fd, "w", encoding="utf-8")
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+def _cmd_export(args: argparse.Namespace) -> int:
+    with _open_store(args) as store:
+        rows = store.list_all()
+    # 导出文件包含全部明文，不受 umask 影响，创建时即只允许当前用户访问
+    try:
+        out = _open_private(args.file) if args.file != "-" else sys.stdout
+    except OSError as exc:
+        raise CliError(f"无法写入 {args.file}: {exc}") from exc
+    try:
+        json.dump(rows, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def _print_import_result(result: ImportResult) -> int:
+    for key, error in result.errors:
+        print(f"跳过 {key}: {error}", file=sys.stderr)
+    print(
+        f"新增 {result.inserted} 条，覆盖 {result.updated} 条，跳过 {result.skipped} 条，失败 {result.failed} 条",
+        file=sys.stderr,
+    )
+    return 1 if result.failed else 0
+
+
+def _print_progress(result: ImportResult) -> None:
+    print(f"\r已处理 {result.processed} 条", end="", file=sys.stderr, flush=True)
+
+
+def _cmd_import(args: argparse.Namespace) -> int:
+    from save_api_key import importers
+
+    from_stdin = args.file == "-"
+    fmt = args.format or ("json" if from_stdin else importers.detect_format(args.file))
+    with _open_store(args) as store:
+        try:
+            src = sys.stdin if from_stdin else open(args.file, "r", encoding="utf-8-sig", newline="")
+            try:
+                result = store.import_records(
+                    importers.parse(src, fmt, args.remark),
+                    on_conflict=args.on_conflict,
+                    batch_size=args.batch_size,
+                    progress=_print_progress if sys.stderr.isatty() else None,
+                    replace_all=args.replace_all,
+                )
+            finally:
+                if not from_stdin:
+                    src.close()
+        except OSError as exc:
+            raise CliError(f"无法读取 {args.file}: {exc}") from exc
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    return _print_import_result(result)
+
+
+def _cmd_backup(args: argparse.Namespace) -> int:
+    password = _read_password()
+    store = ApiKeyStore(args.db, password)
+    with store:
+        if not store.unlocked:
+            raise CliError("主密码错误")
+        # 未单独指定归档密码时沿用主密码
+        archive_password = os.environ.get(ARCHIVE_PASSWORD_ENV) or password
+        to_stdout = args.file == "-"
+        out = sys.stdout.buffer if to_stdout else open(args.file, "wb")
+        try:
+            for chunk in store.export_stream(archive_password):
+                out.write(chunk)
+        finally:
+            if not to_stdout:
+                out.close()
+    return 0
+
+
+def _cmd_restore(args: argparse.Namespace) -> int:
+    password = _read_password()
+    store = ApiKeyStore(args.db, password)
+    with store:
+        if not store.unlocked:
+            raise CliError("主密码错误")
+        archive_password = os.environ.get(ARCHIVE_PASSWORD_ENV) or password
+        from_stdin = args.file == "-"
+        try:
+            src = sys.stdin.buffer if from_stdin else open(args.file, "rb")
+            try:
+                result = store.import_stream(src, archive_password, on_conflict=args.on_conflict)
+            finally:
+                if not from_stdin:
+                    src.close()
+        except OSError as exc:
+            raise CliError(f"无法读取 {args.file}: {exc}") from exc
+    return _print_import_result(result)
+
+
+def _cmd_upgrade(args: argparse.Namespace) -> int:
+    with _open_store(args) as store:
+        count = store.upgrade_format()
+        if args.vacuum:
+            store.vacuum()
+    print(f"升级 {count} 条记录到 v2 格式", file=sys.stderr)
+    return 0
+
+
+def _cmd_passwd(args: argparse.Namespace) -> int:
+    old_password = _read_password()
+    new_password = _read_new_password()
+    store = ApiKeyStore(args.db, old_password)
+    with store:
+        if not store.unlocked:
+            raise CliError("主密码错误")
+        count = store.rotate_master_password(old_password, new_password)
+    print(f"主密码已更换，重新加密 {count} 条记录", file=sys.stderr)
+    return 0
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    from save_api_key import runner
+
+    command = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+    if not command:
+        raise CliError("缺少要运行的命令：run --map ENV=key ... -- cmd args")
+    mappings = runner.parse_mappings(args.map or [])
+    keys = list(dict.fromkeys(mappings.values()))
+    values = _get_many_via_agent(keys) if os.environ.get(AGENT_ENV) and keys else None
+    if values is None:
+        with _open_store(args) as store:
+            values = runner.fetch_values(store, keys)
+    base = {name: value for name, value in os.environ.items() if name not in _CREDENTIAL_ENVS}
+    try:
+        env = runner.build_env(mappings, values, base)
+    except KeyError as exc:
+        raise CliError(exc.args[0]) from exc
+    if os.name == "posix":
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            runner.exec_with_env(command, env)
+        except OSError as exc:
+            raise CliError(f"无法启动 {command[0]}: {exc}") from exc
+    try:
+        return subprocess.run(command, env=env).returncode
+    except OSError as exc:
+        raise CliError(f"无法启动 {command[0]}: {exc}") from exc
+
+
+def _cmd_agent(args: argparse.Namespace) -> int:
+    from save_api_key.agent import AgentError, AgentServer
+
+    socket_path = args.socket or get_default_agent_socket_path()
+    # agent 反复查询同一批 key，缓存解密结果后命中只需查字典
+    # 访问统计只在 agent 这类长期运行的进程中开启：短命的 get / run 每次退出都要写回一次，
+    # 等于每次读取一个写事务，并行读取时还会在写锁上排队
+    store = _open_store(args, cache_size=args.cache_size, cache_ttl=args.cache_ttl, access_stats=True)
+    try:
+        server = AgentServer(store, socket_path, idle_timeout=args.idle_timeout)
+    except AgentError as exc:
+        store.close()
+        raise CliError(str(exc)) from exc
+    print(f"{AGENT_ENV}={socket_path}; export {AGENT_ENV}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except AgentError as exc:
+        raise CliError(str(exc)) from exc
+    finally:
+        store.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m save_api_key", description="API Key 管理命令行")
+    parser.add_argument("--db", default=None, help="数据库路径，默认 ~/.save_api_key/apikeys.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("get", help="输出某个 key 的值")
+    p.add_argument("key")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出完整记录")
+    p.set_defaults(func=_cmd_get)
+
+    p = sub.add_parser("list", help="列出 key 与备注（无需主密码）")
+    p.add_argument("query", nargs="?", default="", help="按 key/备注过滤")
+    p.add_argument("--limit", type=int, default=None,
+                   help=f"最多输出的条数；默认全部，搜索时默认 {_SEARCH_LIMIT}")
+    p.add_argument("--json", action="store_true", help="每行输出一个 JSON 对象")
+    p.add_argument("--expiring", type=_parse_duration, metavar="DURATION",
+                   help="只列出在该时长内到期（含已过期）的 key，如 7d、12h")
+    p.set_defaults(func=_cmd_list)
+
+    p = sub.add_parser("set", help="新建或更新一个 key")
+    p.add_argument("key")
+    p.add_argument("value", help="值；传 - 则从标准输入读取一行")
+    p.add_argument("--remark", default="", help="备注，新建时缺省为 key 本身")
+    p.set_defaults(func=_cmd_set)
+
+    p = sub.add_parser("delete", help="删除一个 key")
+    p.add_argument("key")
+    p.set_defaults(func=_cmd_delete)
+
+    p = sub.add_parser("usage", help="按访问次数列出最常用的 key，或列出长期未用的 key（无需主密码）")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--top", type=int, default=10, help="列出访问次数最多的前 N 个 key")
+    group.add_argument("--unused-for", type=_parse_duration, metavar="DURATION",
+                       help="列出在该时长内没有被读取过的 key（含从未读取过的），如 90d")
+    p.add_argument("--json", action="store_true", help="每行输出一个 JSON 对象")
+    p.set_defaults(func=_cmd_usage)
+
+    p = sub.add_parser("expire", help="设置或清除 key 的过期时间")
+    p.add_argument("key")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--in", dest="after", type=_parse_duration, metavar="DURATION",
+                       help="从现在起多久后过期，如 30d、12h、90m 或秒数")
+    group.add_argument("--clear", action="store_true", help="清除过期时间")
+    p.set_defaults(func=_cmd_expire)
+
+    p = sub.add_parser("purge", help="删除所有已过期的 key，并输出被删除的 key")
+    p.set_defaults(func=_cmd_purge)
+
+    p = sub.add_parser("export", help="导出全部记录为明文 JSON")
+    p.add_argument("file", nargs="?", default="-")
+    p.set_defaults(func=_cmd_export)
+
+    p = sub.add_parser("import", help="从 .env / JSON / JSON Lines / CSV 文件批量导入记录")
+    p.add_argument("file", nargs="?", default="-", help="文件路径；传 - 则从标准输入读取（默认按 JSON 解析）")
+    p.add_argument("--format", choices=FORMATS, help="文件格式，缺省时按扩展名推断")
+    p.add_argument("--remark", help="没有备注列的条目使用的备注，缺省为 key 本身")
+    p.add_argument(
+        "--on-conflict",
+        choices=CONFLICT_POLICIES,
+        default=CONFLICT_SKIP,
+        help="key 已存在时：skip 保留现有，upsert / overwrite 覆盖同名记录；库中其余记录不受影响",
+    )
+    p.add_argument(
+        "--replace-all",
+        action="store_true",
+        help="先清空整个库，只保留导入的内容（不可撤销）",
+    )
+    p.add_argument("--batch-size", type=int, default=5000, help="每个事务写入的条数")
+    p.set_defaults(func=_cmd_import)
+
+    p = sub.add_parser("backup", help=f"导出加密压缩的备份归档（归档密码默认同主密码，可由 {ARCHIVE_PASSWORD_ENV} 指定）")
+    p.add_argument("file", nargs="?", default="-")
+    p.set_defaults(func=_cmd_backup)
+
+    p = sub.add_parser("restore", help="从备份归档导入")
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument(
+        "--on-conflict",
+        choices=CONFLICT_POLICIES,
+        default=CONFLICT_SKIP,
+        help="key 已存在时：skip 保留现有，upsert 覆盖同名记录，overwrite 用归档整体替换",
+    )
+    p.set_defaults(func=_cmd_restore)
+
+    p = sub.add_parser("upgrade", help="把旧的 Fernet 密文重新加密为紧凑的 v2 二进制格式")
+    p.add_argument("--vacuum", action="store_true", help="升级后整理数据库文件以归还空间")
+    p.set_defaults(func=_cmd_upgrade)
+
+    p = sub.add_parser("passwd", help=f"更换主密码并重新加密全部记录（新密码可由 {NEW_PASSWORD_ENV} 提供）")
+    p.set_defaults(func=_cmd_passwd)
+
+    p = sub.add_parser("run", help="把 key 注入环境变量后运行命令：run --map ENV=key ... -- cmd args")
+    p.add_argument(
+        "--map",
+        action="append",
+        metavar="ENV=KEY",
+        help="把 KEY 的值放入环境变量 ENV，可重复；只写 KEY 时变量与 key 同名",
+    )
+    p.add_argument("argv", nargs=argparse.REMAINDER, metavar="command", help="要运行的命令及参数")
+    p.set_defaults(func=_cmd_run)
+
+    p = sub.add_parser("agent", help="解锁一次并在前台运行 agent，通过 Unix 套接字提供查询")
+    p.add_argument("--socket", help="套接字路径，默认 ~/.save_api_key/agent.sock")
+    p.add_argument("--idle-timeout", type=float, default=900.0, help="空闲多少秒后自动锁定退出")
+    p.add_argument("--cache-size", type=int, default=0, help="缓存多少条解密结果，0 表示不缓存")
+    p.add_argument("--cache-ttl", type=float, default=30.0, help="每条缓存的存活秒数")
+    p.set_defaults(func=_cmd_agent)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.db is None:
+        args.db = get_default_db_path()
+    try:
+        return args.func(args)
+    except (CliError, ValueError, KeyError) as exc:
+        print(f"错误: {exc}", file=sys.stderr)
+        return 1
@@ -8,3 +8,12 @@ def get_default_db_path() -> str:
     os.makedirs(base_dir, exist_ok=True)
     return os.path.join(base_dir, "apikeys.db")
 
+
+
+def get_default_agent_socket_path() -> str:
+    override = os.environ.get("SAVE_API_KEY_AGENT_SOCK")
+    if override:
+        return override
+    base_dir = os.path.join(os.path.expanduser("~"), ".save_api_key")
+    os.makedirs(base_dir, mode=0o700, exist_ok=True)
+    return os.path.join(base_dir, "agent.sock")
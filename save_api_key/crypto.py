@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import TYPE_CHECKING, Callable, Sequence, TypeVar
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class CryptoEngine:
+    """把整库级别的加解密分块交给线程池执行。
+
+    cryptography 的底层 OpenSSL 调用会释放 GIL，因此线程池即可获得接近线性的加速；
+    条目数少于 serial_threshold 时直接串行执行，避免线程调度开销。
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        chunk_size: int = 256,
+        serial_threshold: int = 512,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.serial_threshold = serial_threshold
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="save_api_key-crypto",
+                )
+            return self._executor
+
+    def map(self, fn: Callable[[T], R], items: Sequence[T]) -> list[R]:
+        """对 items 逐个应用 fn，保持输入顺序；任一条目抛出的异常会原样传播"""
+        if self.max_workers <= 1 or len(items) < self.serial_threshold:
+            return [fn(item) for item in items]
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        results: list[R] = []
+        for part in self._get_executor().map(lambda chunk: [fn(item) for item in chunk], chunks):
+            results.extend(part)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
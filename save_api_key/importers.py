@@ -0,0 +1,227 @@
+"""从 .env / JSON / JSON Lines / CSV 文件流式解析待导入的记录。
+
+每个解析器都是生成器，逐条产出 {"key", "value", "remark"}，交给 ApiKeyStore.import_records
+分批写入；内存占用与文件大小无关（顶层为对象的 JSON 除外，见 parse_json）。
+无法识别的条目产出 {"key": "line N", "error": ParseError(...)}，导入时记为失败而不中断。
+缺少备注时以 remark 参数或 key 本身作为备注。
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+from typing import Iterable, Iterator, TextIO
+
+FORMATS = ("env", "json", "jsonl", "csv")
+
+_JSON_CHUNK_SIZE = 64 * 1024
+_ENV_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _error(where: str, message: str) -> dict[str, object]:
+    return {"key": where, "error": ParseError(f"{where}: {message}")}
+
+
+def _row(key: object, value: object, remark: object, default_remark: str | None) -> dict[str, object]:
+    return {"key": key, "value": value, "remark": remark or default_remark or key}
+
+
+def _env_value(raw: str) -> str:
+    if raw[:1] == '"':
+        chars = []
+        i = 1
+        while i < len(raw):
+            ch = raw[i]
+            if ch == "\\" and i + 1 < len(raw):
+                chars.append(_ENV_ESCAPES.get(raw[i + 1], "\\" + raw[i + 1]))
+                i += 2
+                continue
+            if ch == '"':
+                rest = raw[i + 1:].strip()
+                if rest and not rest.startswith("#"):
+                    raise ValueError("unexpected text after closing quote")
+                return "".join(chars)
+            chars.append(ch)
+            i += 1
+        raise ValueError("unterminated double quote")
+    if raw[:1] == "'":
+        end = raw.find("'", 1)
+        if end < 0:
+            raise ValueError("unterminated single quote")
+        rest = raw[end + 1:].strip()
+        if rest and not rest.startswith("#"):
+            raise ValueError("unexpected text after closing quote")
+        return raw[1:end]
+    # 未加引号的值中，空白之后的 # 开始行内注释
+    for marker in (" #", "\t#"):
+        raw = raw.split(marker, 1)[0]
+    return raw.strip()
+
+
+def parse_env(lines: Iterable[str], remark: str | None = None) -> Iterator[dict[str, object]]:
+    """解析 KEY=VALUE 行：支持 export 前缀、# 注释、单/双引号值与双引号中的转义"""
+    for lineno, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        name, sep, rest = line.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            yield _error(f"line {lineno}", "expected KEY=VALUE")
+            continue
+        try:
+            value = _env_value(rest.strip())
+        except ValueError as exc:
+            yield _error(f"line {lineno}", str(exc))
+            continue
+        yield _row(name, value, None, remark)
+
+
+def _record_from_object(item: object, where: str, remark: str | None) -> dict[str, object]:
+    if not isinstance(item, dict):
+        return _error(where, "expected an object")
+    if "key" not in item or "value" not in item:
+        return _error(where, "object needs 'key' and 'value'")
+    return _row(item["key"], item["value"], item.get("remark"), remark)
+
+
+def parse_json(f: TextIO, remark: str | None = None) -> Iterator[dict[str, object]]:
+    """解析 JSON：顶层数组 [{"key", "value", "remark"?}, ...] 逐个元素增量解码；
+    顶层对象 {"KEY": "value", ...} 需要整体读入后再逐项产出。语法错误时抛出 ParseError。
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(_JSON_CHUNK_SIZE)
+    eof = not buf
+    pos = 0
+
+    def skip_ws() -> None:
+        # 跳过空白，必要时继续读取；读到文件末尾后 eof 为 True
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            buf, pos = f.read(_JSON_CHUNK_SIZE), 0
+            eof = not buf
+
+    skip_ws()
+    if buf[pos:pos + 1] == "{":
+        try:
+            data = json.loads(buf[pos:] + f.read())
+        except ValueError as exc:
+            raise ParseError(f"invalid JSON: {exc}") from exc
+        for key, value in data.items():
+            yield _row(key, value, None, remark)
+        return
+    if buf[pos:pos + 1] != "[":
+        raise ParseError("expected a JSON array or object")
+    pos += 1
+    index = 0
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise ParseError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        if index and buf[pos] == ",":
+            pos += 1
+            skip_ws()
+        elif index:
+            raise ParseError(f"expected ',' after element {index - 1}")
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError as exc:
+                more = "" if eof else f.read(_JSON_CHUNK_SIZE)
+                if not more:
+                    raise ParseError(f"invalid JSON at element {index}: {exc}") from exc
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            # 元素可能恰好在块边界被截断成另一个合法值（如数字），末尾未见分隔符时先补读
+            if end == len(buf) and not eof:
+                more = f.read(_JSON_CHUNK_SIZE)
+                if more:
+                    buf = buf[pos:] + more
+                    pos = 0
+                    continue
+                eof = True
+            break
+        yield _record_from_object(item, f"element {index}", remark)
+        index += 1
+        # 只移动 pos；已解析的前缀在读入下一块时才丢弃，避免每个元素都复制剩余缓冲区
+        pos = end
+
+
+def parse_jsonl(lines: Iterable[str], remark: str | None = None) -> Iterator[dict[str, object]]:
+    """解析 JSON Lines：每行一个 {"key", "value", "remark"?} 对象"""
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            yield _error(f"line {lineno}", f"invalid JSON: {exc}")
+            continue
+        yield _record_from_object(item, f"line {lineno}", remark)
+
+
+def parse_csv(f: TextIO, remark: str | None = None) -> Iterator[dict[str, object]]:
+    """解析带表头的 CSV：必须有 key 与 value 列（不区分大小写），remark 列可选"""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {name.strip().lower(): i for i, name in enumerate(header)}
+    if "key" not in columns or "value" not in columns:
+        raise ParseError("CSV header must contain 'key' and 'value' columns")
+    key_col, value_col, remark_col = columns["key"], columns["value"], columns.get("remark")
+    for fields in reader:
+        if not any(field.strip() for field in fields):
+            continue
+        if len(fields) <= max(key_col, value_col):
+            yield _error(f"line {reader.line_num}", "missing columns")
+            continue
+        note = fields[remark_col] if remark_col is not None and remark_col < len(fields) else None
+        yield _row(fields[key_col], fields[value_col], note, remark)
+
+
+def detect_format(path: str) -> str:
+    name = os.path.basename(path).lower()
+    if name == ".env" or name.startswith(".env.") or name.endswith(".env"):
+        return "env"
+    ext = os.path.splitext(name)[1]
+    if ext == ".json":
+        return "json"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"cannot detect import format of {path!r}; specify one of {', '.join(FORMATS)}")
+
+
+def parse(f: TextIO, fmt: str, remark: str | None = None) -> Iterator[dict[str, object]]:
+    """按格式名选择解析器；CSV 需要以 newline="" 打开文件"""
+    if fmt == "env":
+        return parse_env(f, remark)
+    if fmt == "json":
+        return parse_json(f, remark)
+    if fmt == "jsonl":
+        return parse_jsonl(f, remark)
+    if fmt == "csv":
+        return parse_csv(f, remark)
+    raise ValueError(f"unknown import format: {fmt}")
+
+
+def iter_file(path: str, fmt: str | None = None, remark: str | None = None) -> Iterator[dict[str, object]]:
+    """打开文件并流式产出记录；fmt 缺省时按文件名推断。兼容带 BOM 的 UTF-8 文件"""
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from parse(f, fmt, remark)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+
+PBKDF2_SHA256 = "pbkdf2-sha256"
+SCRYPT = "scrypt"
+
+KEY_LENGTH = 32
+
+# 没有记录 KDF 参数的旧库一律按此参数派生
+LEGACY_KDF_PARAMS: dict[str, object] = {"algorithm": PBKDF2_SHA256, "iterations": 100000}
+DEFAULT_KDF_PARAMS: dict[str, object] = dict(LEGACY_KDF_PARAMS)
+
+_MIN_PBKDF2_ITERATIONS = 100000
+_MAX_SCRYPT_N = 2 ** 20
+# 来自不可信输入（如备份归档头）的参数上限：单次派生最多数秒、scrypt 内存不超过 1 GiB
+_MAX_PBKDF2_ITERATIONS = 10_000_000
+_MAX_SCRYPT_R = 32
+_MAX_SCRYPT_P = 16
+_MAX_SCRYPT_MEMORY = 2 ** 30
+
+
+def validate_params(params: object) -> dict[str, object]:
+    """校验 KDF 参数的算法与成本范围，返回规范化后的副本；超出范围时抛出 ValueError。
+
+    用于不可信来源的参数，避免构造的超大成本让派生卡死或耗尽内存。
+    """
+    if not isinstance(params, dict):
+        raise ValueError("kdf params must be an object")
+    algorithm = params.get("algorithm")
+    try:
+        if algorithm == PBKDF2_SHA256:
+            iterations = int(params["iterations"])
+            if not 1 <= iterations <= _MAX_PBKDF2_ITERATIONS:
+                raise ValueError(f"pbkdf2 iterations out of range: {iterations}")
+            return {"algorithm": PBKDF2_SHA256, "iterations": iterations}
+        if algorithm == SCRYPT:
+            n, r, p = int(params["n"]), int(params["r"]), int(params["p"])
+        else:
+            raise ValueError(f"unsupported kdf algorithm: {algorithm}")
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"malformed kdf params: {exc}") from exc
+    if n < 2 or n & (n - 1) or n > _MAX_SCRYPT_N:
+        raise ValueError(f"scrypt n must be a power of two up to {_MAX_SCRYPT_N}: {n}")
+    if not 1 <= r <= _MAX_SCRYPT_R or not 1 <= p <= _MAX_SCRYPT_P:
+        raise ValueError(f"scrypt r/p out of range: r={r}, p={p}")
+    if 128 * n * r > _MAX_SCRYPT_MEMORY:
+        raise ValueError("scrypt parameters need too much memory")
+    return {"algorithm": SCRYPT, "n": n, "r": r, "p": p}
+
+
+def derive_key(master_password: str, salt: bytes, params: dict[str, object]) -> bytes:
+    """按 params 描述的算法与成本派生 32 字节原始密钥"""
+    # 延迟导入 cryptography，使不需要解锁的代码路径保持轻量
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+    algorithm = params.get("algorithm")
+    if algorithm == PBKDF2_SHA256:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=KEY_LENGTH,
+            salt=salt,
+            iterations=int(params["iterations"]),
+        )
+    elif algorithm == SCRYPT:
+        kdf = Scrypt(
+            salt=salt,
+            length=KEY_LENGTH,
+            n=int(params["n"]),
+            r=int(params["r"]),
+            p=int(params["p"]),
+        )
+    else:
+        raise ValueError(f"unsupported kdf algorithm: {algorithm}")
+    return kdf.derive(master_password.encode())
+
+
+def _time_derive(params: dict[str, object]) -> float:
+    start = time.perf_counter()
+    derive_key("calibration", b"\0" * 16, params)
+    return time.perf_counter() - start
+
+
+def calibrate(target_seconds: float = 0.5, algorithm: str = PBKDF2_SHA256) -> dict[str, object]:
+    """在当前机器上测量派生耗时，返回使单次解锁约耗时 target_seconds 的 KDF 参数"""
+    if algorithm == PBKDF2_SHA256:
+        probe = 20000
+        elapsed = _time_derive({"algorithm": PBKDF2_SHA256, "iterations": probe})
+        iterations = int(probe * target_seconds / max(elapsed, 1e-6))
+        # 取整到千位，且不低于旧库的默认强度
+        iterations = max(_MIN_PBKDF2_ITERATIONS, iterations // 1000 * 1000)
+        return {"algorithm": PBKDF2_SHA256, "iterations": iterations}
+    if algorithm == SCRYPT:
+        params: dict[str, object] = {"algorithm": SCRYPT, "n": 2 ** 14, "r": 8, "p": 1}
+        # scrypt 的耗时与 n 近似线性，逐次翻倍直到达到目标或内存上限
+        while int(params["n"]) < _MAX_SCRYPT_N and _time_derive(params) * 2 <= target_seconds:
+            params["n"] = int(params["n"]) * 2
+        return params
+    raise ValueError(f"unsupported kdf algorithm: {algorithm}")
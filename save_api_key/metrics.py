@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Iterator
+
+# 回调签名：(操作名, 耗时秒数, 异常或 None)，可用于接入外部 tracing
+SpanHook = Callable[[str, float, "BaseException | None"], None]
+
+# 延迟直方图的桶上界（秒），从 10 微秒到 10 秒按 1-2.5-5 递增
+_BUCKET_BOUNDS: tuple[float, ...] = tuple(
+    base * scale
+    for scale in (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+    for base in (1.0, 2.5, 5.0)
+) + (10.0,)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(_BUCKET_BOUNDS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数（秒）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for idx, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return _BUCKET_BOUNDS[idx] if idx < len(_BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p99_s": self.quantile(0.99),
+            "max_s": self.max,
+        }
+
+
+class StoreMetrics:
+    """ApiKeyStore 的计数器与延迟直方图，线程安全"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._histograms: dict[str, Histogram] = {}
+        self._hooks: list[SpanHook] = []
+
+    def add_hook(self, hook: SpanHook) -> None:
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook: SpanHook) -> None:
+        with self._lock:
+            self._hooks = [h for h in self._hooks if h is not hook]
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float, error: BaseException | None = None) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+            if error is not None:
+                self._counters[name + ".errors"] = self._counters.get(name + ".errors", 0) + 1
+            hooks = self._hooks
+        for hook in hooks:
+            hook(name, seconds, error)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            self.observe(name, time.perf_counter() - start, exc)
+            raise
+        self.observe(name, time.perf_counter() - start)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "latency": {name: h.snapshot() for name, h in self._histograms.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class NullMetrics(StoreMetrics):
+    """关闭统计时使用：所有记录操作都是空操作"""
+
+    _NULL_SPAN = nullcontext()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float, error: BaseException | None = None) -> None:
+        pass
+
+    def span(self, name: str) -> ContextManager[None]:  # type: ignore[override]
+        return self._NULL_SPAN
+
+
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,73 @@
+"""把库中的 key 注入子进程环境变量后启动命令。
+
+所有 key 通过一次 get_many（一次 IN 查询 + 一次批量解密）取回；明文只存在于本进程内存与
+子进程环境中，不写入任何文件。命令行的 run 在 POSIX 上用 exec 直接替换当前进程，
+之后不再有持有明文的父进程。
+"""
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+from typing import Iterable, Mapping, NoReturn, Sequence
+
+from save_api_key.storage import ApiKeyStore
+
+_ENV_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+
+def parse_mappings(specs: Iterable[str]) -> dict[str, str]:
+    """解析 ENV=key 形式的映射，返回 {环境变量名: key}；只写 key 时环境变量与 key 同名"""
+    mappings: dict[str, str] = {}
+    for spec in specs:
+        name, sep, key = spec.partition("=")
+        name = name.strip()
+        key = key.strip() if sep else name
+        if not _ENV_NAME.match(name):
+            raise ValueError(f"invalid environment variable name: {name!r}")
+        if not key:
+            raise ValueError(f"empty key in mapping: {spec!r}")
+        if name in mappings and mappings[name] != key:
+            raise ValueError(f"environment variable mapped twice: {name}")
+        mappings[name] = key
+    return mappings
+
+
+def fetch_values(store: ApiKeyStore, keys: Iterable[str]) -> dict[str, str]:
+    """一次批量读取并解密，返回 {key: value}；不存在的 key 不出现在结果中"""
+    return {r.key: r.record.value for r in store.get_many(list(dict.fromkeys(keys))) if r.ok}
+
+
+def build_env(
+    mappings: Mapping[str, str],
+    values: Mapping[str, str],
+    base: Mapping[str, str] | None = None,
+) -> dict[str, str]:
+    """在 base（默认当前环境）之上加入映射的值；有任何 key 缺失时抛出 KeyError 并列出全部缺失项"""
+    missing = sorted({key for key in mappings.values() if key not in values})
+    if missing:
+        raise KeyError(f"keys not found: {', '.join(missing)}")
+    env = dict(os.environ if base is None else base)
+    env.update({name: values[key] for name, key in mappings.items()})
+    return env
+
+
+def run_with_secrets(
+    store: ApiKeyStore,
+    mappings: Mapping[str, str],
+    argv: Sequence[str],
+    base_env: Mapping[str, str] | None = None,
+    **kwargs: object,
+) -> int:
+    """以注入了密钥的环境运行命令并等待结束，返回退出码；其余参数原样传给 subprocess.run"""
+    if not argv:
+        raise ValueError("no command given")
+    env = build_env(mappings, fetch_values(store, mappings.values()), base_env)
+    return subprocess.run(list(argv), env=env, **kwargs).returncode
+
+
+def exec_with_env(argv: Sequence[str], env: Mapping[str, str]) -> NoReturn:
+    """用 argv 替换当前进程；只在 POSIX 上使用，Windows 的 exec 只是模拟"""
+    if not argv:
+        raise ValueError("no command given")
+    os.execvpe(argv[0], list(argv), dict(env))
@@ -1,11 +1,68 @@
+from __future__ import annotations
+
 import os
+import json
+import logging
 import sqlite3
 import base64
+import hmac
+import itertools
+import random
+import threading
+import time
 from contextlib import contextmanager
-from typing import Iterator, Optional
-from cryptography.fernet import Fernet, InvalidToken
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, TypeVar
+
+from save_api_key import archive, kdf
+from save_api_key.access import AccessCounts, AccessRecorder
+from save_api_key.cache import RecordCache
+from save_api_key.crypto import CryptoEngine
+from save_api_key.metrics import SpanHook, StoreMetrics
+
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+def _fernet():
+    # cryptography 只在真正派生密钥或加解密时才导入，只读元数据的命令行操作无需加载
+    from cryptography import fernet
+    return fernet
+
+
+def _invalid_tag() -> type[Exception]:
+    from cryptography.exceptions import InvalidTag
+    return InvalidTag
+
+
+def _aead_cipher(raw_key: bytes) -> AESGCM:
+    """由 KDF 输出经 HKDF 派生独立的 AES-256-GCM 密钥，不与 Fernet 密钥复用"""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_AEAD_INFO).derive(raw_key)
+    return AESGCM(key)
+
+
+def _make_ciphers(raw_key: bytes) -> tuple[Fernet, AESGCM]:
+    """同一 KDF 输出对应的 (Fernet, AES-GCM)：前者用于验证器与旧行，后者用于 v2 行"""
+    return _fernet().Fernet(base64.urlsafe_b64encode(raw_key)), _aead_cipher(raw_key)
+
+
+def _seal(aead: AESGCM, data: bytes) -> bytes:
+    nonce = os.urandom(_AEAD_NONCE_SIZE)
+    return _AEAD_VERSION + nonce + aead.encrypt(nonce, data, _AEAD_VERSION)
+
+
+def _unseal(aead: AESGCM, blob: bytes) -> bytes:
+    if blob[:1] != _AEAD_VERSION:
+        raise ValueError("unknown ciphertext version")
+    return aead.decrypt(blob[1:1 + _AEAD_NONCE_SIZE], blob[1 + _AEAD_NONCE_SIZE:], _AEAD_VERSION)
 
 
 class ApiKeyRecord:
@@ -15,59 +72,648 @@ class ApiKeyRecord:
         self.remark = remark
 
 
+class ApiKeyEntry:
+    """列表项：只携带 key 与备注，value 在访问时才按需查询并解密，不在内存中缓存明文"""
+
+    def __init__(self, store: "ApiKeyStore", key: str, remark: str, expires_at: float | None = None) -> None:
+        self._store = store
+        self.key = key
+        self.remark = remark
+        # 过期时间（Unix 时间戳）；只有 list_expiring 会填充
+        self.expires_at = expires_at
+
+    @property
+    def value(self) -> str:
+        record = self._store.get(self.key)
+        if record is None:
+            raise KeyError(self.key)
+        return record.value
+
+
+class BatchResult:
+    """批量操作中单条记录的结果：成功时 record 非空，失败时 error 非空"""
+
+    def __init__(
+        self,
+        key: str,
+        record: ApiKeyRecord | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        self.key = key
+        self.record = record
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ImportResult:
+    """流式导入的汇总：只保存计数与出错条目，内存占用与导入规模无关"""
+
+    def __init__(self) -> None:
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors: list[tuple[str, Exception]] = []
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    @property
+    def processed(self) -> int:
+        return self.inserted + self.updated + self.skipped + self.failed
+
+    def add(self, counts: tuple[int, int, int]) -> None:
+        inserted, updated, skipped = counts
+        self.inserted += inserted
+        self.updated += updated
+        self.skipped += skipped
+
+
+class KeyUsage:
+    """top_keys / unused_since 的结果项：累计访问次数与最近访问时间（从未访问过为 None）"""
+
+    def __init__(self, key: str, remark: str, count: int, last_access: float | None) -> None:
+        self.key = key
+        self.remark = remark
+        self.count = count
+        self.last_access = last_access
+
+
+class ChangeSet:
+    """changes_since 的结果：revision 为本次读取时的修订号，下次以它为起点增量同步。
+
+    changed 为新增或修改过的条目（只含 key 与备注），deleted 为已删除或被重命名掉的 key；
+    reset 为 True 表示起点修订号比库中的还新（例如库被备份覆盖），调用方应丢弃本地状态，
+    此时 changed 为全部现存条目。
+    """
+
+    def __init__(self, revision: int, changed: list[ApiKeyEntry], deleted: list[str], reset: bool = False) -> None:
+        self.revision = revision
+        self.changed = changed
+        self.deleted = deleted
+        self.reset = reset
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.deleted or self.reset)
+
+
+# 导入时 key 已存在的处理方式：保留现有记录 / 覆盖同名记录 / 用导入内容整体替换库
+CONFLICT_SKIP = "skip"
+CONFLICT_UPSERT = "upsert"
+CONFLICT_OVERWRITE = "overwrite"
+CONFLICT_POLICIES = (CONFLICT_SKIP, CONFLICT_UPSERT, CONFLICT_OVERWRITE)
+
+# import_records 每个事务写入的条数：越大事务与 executemany 的固定开销摊得越薄，写锁也持有越久
+_IMPORT_BATCH_SIZE = 5000
+
+# SQLite 单条语句可绑定的参数数量有限，IN 查询按此大小分块
+_IN_CHUNK_SIZE = 500
+
+# 每行 value 的存储格式
+FMT_LEGACY = 0  # 引入格式列之前写入的数据：可能是明文，也可能是 Fernet 密文
+FMT_FERNET = 1  # base64 文本形式的 Fernet token
+FMT_AEAD = 2  # 二进制 v2：版本字节 + 12 字节 nonce + AES-GCM 密文与 16 字节标签，以 BLOB 存储
+
+# v2 密文的首字节；同时作为 AES-GCM 的附加认证数据，防止版本字节被篡改
+_AEAD_VERSION = b"\x02"
+_AEAD_NONCE_SIZE = 12
+_AEAD_INFO = b"save_api_key v2 value encryption"
+
+# key/备注 的 trigram 全文索引，由触发器与 apikeys 保持同步；只索引元数据，不含 value
+_FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS apikeys_fts
+    USING fts5(key, remark, content='apikeys', tokenize='trigram')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apikeys_fts_ai AFTER INSERT ON apikeys BEGIN
+        INSERT INTO apikeys_fts(rowid, key, remark) VALUES (new.rowid, new.key, new.remark);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apikeys_fts_ad AFTER DELETE ON apikeys BEGIN
+        INSERT INTO apikeys_fts(apikeys_fts, rowid, key, remark)
+        VALUES ('delete', old.rowid, old.key, old.remark);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apikeys_fts_au AFTER UPDATE OF key, remark ON apikeys BEGIN
+        INSERT INTO apikeys_fts(apikeys_fts, rowid, key, remark)
+        VALUES ('delete', old.rowid, old.key, old.remark);
+        INSERT INTO apikeys_fts(rowid, key, remark) VALUES (new.rowid, new.key, new.remark);
+    END
+    """,
+    "INSERT INTO apikeys_fts(apikeys_fts) VALUES ('rebuild')",
+)
+
+
+def _migrate_search_index(conn: sqlite3.Connection) -> None:
+    # 部分 SQLite 编译版本没有 FTS5 或 trigram 分词器，此时 search() 退化为 LIKE 扫描
+    conn.execute("SAVEPOINT fts")
+    try:
+        for statement in _FTS_SCHEMA:
+            conn.execute(statement)
+    except sqlite3.OperationalError:
+        conn.execute("ROLLBACK TO fts")
+    conn.execute("RELEASE fts")
+
+
+# 旧版本存放在数据库旁的文件，迁移后改存 meta 表中同名的行
+_SIDE_FILES = (("salt", ".salt"), ("verifier", ".verifier"), ("kdf", ".kdf"))
+
+
+def _import_side_files(conn: sqlite3.Connection) -> None:
+    db_file = conn.execute("PRAGMA database_list").fetchone()["file"]
+    if not db_file:
+        return
+    for name, suffix in _SIDE_FILES:
+        path = db_file + suffix
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            value = data.decode() if name == "kdf" else data
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+
+# 当前事务的修订号；写入语句以子查询引用，避免把修订号拼进 SQL 导致语句缓存失效
+_CURRENT_REVISION = "(SELECT value FROM meta WHERE name = 'revision')"
+# 当前 Unix 时间戳（秒，REAL），由 SQLite 计算，批量写入时无需为每行绑定参数
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+
+# 依次把 schema 从版本 i 升级到 i + 1 的步骤（SQL 语句序列或接收连接的函数），
+# 当前版本记录在 PRAGMA user_version
+_SCHEMA_MIGRATIONS: tuple[tuple[str, ...] | Callable[[sqlite3.Connection], None], ...] = (
+    (
+        f"ALTER TABLE apikeys ADD COLUMN fmt INTEGER NOT NULL DEFAULT {FMT_LEGACY}",
+        f"CREATE INDEX IF NOT EXISTS idx_apikeys_legacy ON apikeys(fmt) WHERE fmt = {FMT_LEGACY}",
+    ),
+    _migrate_search_index,
+    # upgrade_format() 按此索引定位尚未升级到 v2 的 Fernet 行
+    (f"CREATE INDEX IF NOT EXISTS idx_apikeys_fernet ON apikeys(fmt) WHERE fmt = {FMT_FERNET}",),
+    # 库级别的键值元数据：盐值、验证器、KDF 参数与主密码轮换进度
+    ("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB NOT NULL)",),
+    _import_side_files,
+    # 修订号：每个修改数据的事务把 meta.revision 加一，写入的行与删除墓碑记录该修订号；
+    # 已有的行记为修订号 1，changes_since(0) 即返回全部条目
+    (
+        "ALTER TABLE apikeys ADD COLUMN rev INTEGER NOT NULL DEFAULT 1",
+        "CREATE INDEX IF NOT EXISTS idx_apikeys_rev ON apikeys(rev)",
+        "CREATE TABLE IF NOT EXISTS apikeys_tombstones (key TEXT PRIMARY KEY, rev INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_apikeys_tombstones_rev ON apikeys_tombstones(rev)",
+        "INSERT OR IGNORE INTO meta (name, value) VALUES ('revision', 1)",
+        """
+        CREATE TRIGGER IF NOT EXISTS apikeys_tombstones_ai AFTER INSERT ON apikeys BEGIN
+            DELETE FROM apikeys_tombstones WHERE key = new.key;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS apikeys_tombstones_ad AFTER DELETE ON apikeys BEGIN
+            INSERT OR REPLACE INTO apikeys_tombstones (key, rev) VALUES (old.key, {_CURRENT_REVISION});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS apikeys_tombstones_au AFTER UPDATE OF key ON apikeys
+        WHEN new.key != old.key BEGIN
+            INSERT OR REPLACE INTO apikeys_tombstones (key, rev) VALUES (old.key, {_CURRENT_REVISION});
+            DELETE FROM apikeys_tombstones WHERE key = new.key;
+        END
+        """,
+    ),
+    # 生命周期：时间均为 Unix 时间戳，迁移前已有的行创建/修改时间未知（NULL）；
+    # 部分索引只包含设置了过期时间的行，purge_expired / list_expiring 是一次索引范围查询
+    (
+        "ALTER TABLE apikeys ADD COLUMN created_at REAL",
+        "ALTER TABLE apikeys ADD COLUMN updated_at REAL",
+        "ALTER TABLE apikeys ADD COLUMN expires_at REAL",
+        "CREATE INDEX IF NOT EXISTS idx_apikeys_expires ON apikeys(expires_at) WHERE expires_at IS NOT NULL",
+    ),
+    # 访问统计：由 AccessRecorder 批量写回，不改变修订号，也不触发搜索索引与墓碑触发器
+    (
+        "ALTER TABLE apikeys ADD COLUMN access_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE apikeys ADD COLUMN accessed_at REAL",
+        "CREATE INDEX IF NOT EXISTS idx_apikeys_access_count ON apikeys(access_count DESC, key)",
+        "CREATE INDEX IF NOT EXISTS idx_apikeys_accessed_at ON apikeys(accessed_at, key)",
+    ),
+)
+SCHEMA_VERSION = len(_SCHEMA_MIGRATIONS)
+
+# 每个连接建立时执行的 PRAGMA：WAL 允许读写并发，NORMAL 在 WAL 下仍保证崩溃一致性
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+_BUSY_TIMEOUT_SECONDS = 5.0
+_CACHED_STATEMENTS = 256
+# busy_timeout 耗尽后整个操作的重试次数与首次退避时间（之后逐次翻倍并加随机抖动）
+_BUSY_RETRIES = 5
+_BUSY_BACKOFF_SECONDS = 0.05
+
+
+def _is_busy(exc: sqlite3.OperationalError) -> bool:
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+# 主密码轮换每个事务重新加密的行数，决定了轮换期间的内存占用与单次写锁时长
+_ROTATION_CHUNK_SIZE = 500
+# 启用解密缓存时每条明文的默认存活时间（秒），限定明文在内存中的暴露窗口
+_CACHE_TTL_SECONDS = 30.0
+# 开启访问统计时内存中的计数写回数据库的间隔（秒）
+_ACCESS_FLUSH_SECONDS = 60.0
+
+
 class ApiKeyStore:
-    def __init__(self, db_path: str, master_password: str | None = None) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        master_password: str | None = None,
+        kdf_params: dict[str, object] | None = None,
+        engine: CryptoEngine | None = None,
+        metrics: StoreMetrics | None = None,
+        cache_size: int = 0,
+        cache_ttl: float = _CACHE_TTL_SECONDS,
+        access_stats: bool = False,
+        access_flush_interval: float = _ACCESS_FLUSH_SECONDS,
+    ) -> None:
         self._db_path = db_path
+        # 各环节的计数与耗时；传入 metrics.NULL_METRICS 可完全关闭统计
+        self._metrics = metrics if metrics is not None else StoreMetrics()
+        # 整库加解密使用的线程池引擎，小批量时自动退化为串行；调用方传入的引擎由调用方负责关闭
+        self._owns_engine = engine is None
+        self._engine = engine or CryptoEngine()
+        # 每个线程持有一个长连接，避免每次操作都重新建立连接
+        self._local = threading.local()
+        # (所属线程, 连接)；线程结束后其连接在下次有线程新建连接时关闭，见 _connect
+        self._conns: list[tuple[threading.Thread, sqlite3.Connection]] = []
+        self._conns_lock = threading.Lock()
+        self._closed = False
         self._cipher: Fernet | None = None
+        self._aead: AESGCM | None = None
+        self._raw_key: bytes | None = None
+        # 主密码轮换未完成时的旧密钥，尚未重新加密的行用它解密
+        self._previous_ciphers: tuple[Fernet, AESGCM] | None = None
         self._salt: bytes | None = None
         self._verifier: bytes | None = None
-        if master_password is not None:
-            self._derive_key(master_password)
+        self._kdf_params: dict[str, object] | None = None
+        # 是否存在 FTS5 索引，首次搜索时探测
+        self._search_index: bool | None = None
+        # 可选的解密结果缓存（默认关闭）；其他连接的修改按修订号失效，见 _sync_cache
+        self._cache = RecordCache(cache_size, cache_ttl) if cache_size else None
+        self._cache_lock = threading.Lock()
+        self._cache_revision = 0
+        self._cache_signature: tuple[tuple[int, int] | None, ...] | None = None
+        # 可选的访问统计（默认关闭）：get / get_many 只在内存中计数，按间隔或 close 时批量写回
+        self._access = AccessRecorder(self._flush_access, access_flush_interval) if access_stats else None
+        # 构造时派生的密钥是否已通过验证器校验
+        self._unlocked = False
         self._init_db()
+        if master_password is not None:
+            self._derive_key(master_password, kdf_params)
+        if self._unlocked:
+            # 只处理尚未迁移的旧行；中途中断时下次解锁会从剩余行继续
+            self.migrate_legacy()
+        if self._unlocked and self._previous_ciphers is not None:
+            logger.info("resuming interrupted master password rotation for %s", self._db_path)
+            self._continue_rotation(_ROTATION_CHUNK_SIZE)
+        if self._cache is not None:
+            self._cache_signature = self.file_signature()
+            self._cache_revision = self.revision
+
+    def _read_meta(self) -> dict[str, object]:
+        with self._connect() as conn:
+            return {row["name"]: row["value"] for row in conn.execute("SELECT name, value FROM meta")}
+
+    @staticmethod
+    def _meta_kdf_params(meta: dict[str, object]) -> dict[str, object]:
+        # 没有记录 KDF 参数的旧库按旧的固定参数派生
+        return json.loads(meta["kdf"]) if "kdf" in meta else dict(kdf.LEGACY_KDF_PARAMS)
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    def file_signature(self) -> tuple[tuple[int, int] | None, ...]:
+        """数据库文件与 WAL 文件的 (mtime_ns, size)；任何连接提交写入都会改变它，检查只需两次 stat"""
+        signature = []
+        for path in (self._db_path, self._db_path + "-wal"):
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    @property
+    def initialized(self) -> bool:
+        """是否已设置过主密码（meta 表中已有盐值）"""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM meta WHERE name = 'salt'").fetchone() is not None
 
-    def _derive_key(self, master_password: str) -> None:
-        salt_path = self._db_path + ".salt"
-        if os.path.exists(salt_path):
-            with open(salt_path, "rb") as f:
-                self._salt = f.read()
+    def _derive_key(self, master_password: str, kdf_params: dict[str, object] | None = None) -> None:
+        """整个解锁过程只运行一次 KDF：派生后直接用同一个 cipher 校验验证器。
+
+        盐值、验证器与 KDF 参数通过一次查询从 meta 表读取，解锁时不写入任何数据；
+        只有新库（或缺少验证器的旧库）才会在一个写事务中写入。
+        """
+        meta = self._read_meta()
+        if "rotation" in meta:
+            self._unlock_rotating(master_password, json.loads(meta["rotation"]))
+            return
+        if "salt" in meta:
+            self._salt = bytes(meta["salt"])
+            self._kdf_params = self._meta_kdf_params(meta)
         else:
+            # 新库：生成盐值并记录 KDF 参数，kdf_params 只对新库生效
             self._salt = os.urandom(16)
-            with open(salt_path, "wb") as f:
-                f.write(self._salt)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self._salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-        self._cipher = Fernet(key)
-        self._verifier = self._cipher.encrypt(b"VERIFIER")
-        verifier_path = self._db_path + ".verifier"
-        with open(verifier_path, "wb") as f:
-            f.write(self._verifier)
+            self._kdf_params = dict(kdf_params or kdf.DEFAULT_KDF_PARAMS)
+        with self._metrics.span("kdf"):
+            raw_key = kdf.derive_key(master_password, self._salt, self._kdf_params)
+        cipher, aead = _make_ciphers(raw_key)
+        if "verifier" in meta:
+            self._verifier = bytes(meta["verifier"])
+            self._unlocked = self._check_verifier(cipher, self._verifier)
+        else:
+            self._verifier = cipher.encrypt(b"VERIFIER")
+            if not self._init_vault_meta("salt" in meta):
+                # 另一个连接抢先初始化了库，按它写入的参数重新解锁
+                self._derive_key(master_password)
+                return
+            self._unlocked = True
+        if not self._unlocked:
+            logger.info("master password rejected for %s", self._db_path)
+        # 密码错误时不保留 cipher，避免用错误的密钥写入数据
+        if self._unlocked:
+            self._cipher, self._aead, self._raw_key = cipher, aead, raw_key
+
+    def _init_vault_meta(self, has_salt: bool) -> bool:
+        """在一个写事务中写入盐值/KDF 参数/验证器；meta 已被他人修改时放弃并返回 False。
+
+        写锁保证多个进程同时创建新库时只有一个的盐值生效，其余进程随后按它的参数解锁。
+        """
+        def write(conn: sqlite3.Connection) -> bool:
+            current = {row["name"] for row in conn.execute("SELECT name FROM meta")}
+            if ("salt" in current) != has_salt or "verifier" in current:
+                return False
+            rows = [("verifier", self._verifier)]
+            if not has_salt:
+                rows += [("salt", self._salt), ("kdf", json.dumps(self._kdf_params))]
+            conn.executemany("INSERT INTO meta (name, value) VALUES (?, ?)", rows)
+            return True
+
+        return self._write(write)
+
+    def _unlock_rotating(self, master_password: str, rotation: dict[str, object]) -> None:
+        """轮换未完成时新旧密码都能解锁：用匹配的一方解开另一方的密钥，继续轮换"""
+        for side, other in (("new", "old"), ("old", "new")):
+            salt = base64.b64decode(rotation[f"{side}_salt"])
+            with self._metrics.span("kdf"):
+                raw_key = kdf.derive_key(master_password, salt, rotation[f"{side}_kdf"])
+            ciphers = _make_ciphers(raw_key)
+            if not self._check_verifier(ciphers[0], str(rotation[f"{side}_verifier"]).encode()):
+                continue
+            other_key = _unseal(ciphers[1], base64.b64decode(rotation[f"wrapped_{other}"]))
+            if side == "new":
+                self._set_rotation_keys(rotation, raw_key, other_key)
+            else:
+                self._set_rotation_keys(rotation, other_key, raw_key)
+            return
+        logger.info("master password rejected for %s", self._db_path)
+
+    def _set_rotation_keys(self, rotation: dict[str, object], new_key: bytes, old_key: bytes) -> None:
+        # 新写入一律使用新密钥，读取时先试新密钥再回退到旧密钥
+        self._cipher, self._aead = _make_ciphers(new_key)
+        self._previous_ciphers = _make_ciphers(old_key)
+        self._raw_key = new_key
+        self._salt = base64.b64decode(rotation["new_salt"])
+        self._kdf_params = dict(rotation["new_kdf"])
+        self._verifier = str(rotation["new_verifier"]).encode()
+        self._unlocked = True
+
+    @staticmethod
+    def _check_verifier(cipher: Fernet, verifier: bytes) -> bool:
+        try:
+            return cipher.decrypt(verifier) == b"VERIFIER"
+        except _fernet().InvalidToken:
+            return False
+
+    def lock(self) -> None:
+        """丢弃内存中的派生密钥；之后的加解密操作会失败，直到重新构造实例解锁"""
+        self._cipher = None
+        self._aead = None
+        self._raw_key = None
+        self._previous_ciphers = None
+        self._unlocked = False
+        if self._cache is not None:
+            self._cache.clear()
+
+    @property
+    def unlocked(self) -> bool:
+        """构造时传入的主密码是否正确；无需再次运行 KDF"""
+        return self._unlocked
+
+    def __enter__(self) -> "ApiKeyStore":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """写回未落盘的访问统计并关闭所有线程持有的数据库连接，之后该实例不可再使用"""
+        if self._access is not None and not self._closed:
+            try:
+                self._access.close()
+            except Exception:
+                logger.exception("failed to flush access stats on close")
+        with self._conns_lock:
+            self._closed = True
+            conns, self._conns = self._conns, []
+        if self._cache is not None:
+            self._cache.clear()
+        self._close_connections(conn for _thread, conn in conns)
+        if self._owns_engine:
+            self._engine.close()
+
+    @staticmethod
+    def _close_connections(conns: Iterable[sqlite3.Connection]) -> None:
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def release_connection(self) -> None:
+        """关闭当前线程持有的连接；每个请求一个线程的服务（如 agent）在线程结束前调用"""
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._conns_lock:
+            self._conns = [(thread, c) for thread, c in self._conns if c is not conn]
+        self._close_connections((conn,))
+
+    def _open_connection(self) -> sqlite3.Connection:
+        with self._metrics.span("connect"):
+            conn = sqlite3.connect(
+                self._db_path,
+                timeout=_BUSY_TIMEOUT_SECONDS,
+                cached_statements=_CACHED_STATEMENTS,
+                check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            try:
+                # 切换 WAL 需要短暂的独占锁，多个进程同时首次打开时可能遇到 busy
+                for pragma in _CONNECTION_PRAGMAS:
+                    conn.execute(pragma)
+            except BaseException:
+                conn.close()
+                raise
+        logger.debug("opened connection to %s in thread %s", self._db_path, threading.current_thread().name)
+        return conn
 
     @contextmanager
     def _connect(self) -> Iterator[sqlite3.Connection]:
-        conn = sqlite3.connect(self._db_path)
+        if self._closed:
+            raise RuntimeError("store is closed")
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._retry_busy(self._open_connection)
+            with self._conns_lock:
+                # 顺带回收已结束线程遗留的连接，线程不断新建时连接数与文件描述符不会无限增长
+                dead = [c for thread, c in self._conns if not thread.is_alive()]
+                self._conns = [(thread, c) for thread, c in self._conns if thread.is_alive()]
+                self._conns.append((threading.current_thread(), conn))
+            self._close_connections(dead)
+            self._local.conn = conn
         try:
-            conn.row_factory = sqlite3.Row
-            yield conn
-        finally:
-            conn.close()
+            with self._metrics.span("sql"):
+                yield conn
+        except BaseException:
+            # 出错时回滚未提交的事务，保证长连接回到干净状态
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def _retry_busy(self, fn: Callable[[], R]) -> R:
+        """busy_timeout 耗尽后仍拿不到锁时，按带抖动的指数退避重试整个操作，最多 _BUSY_RETRIES 次"""
+        delay = _BUSY_BACKOFF_SECONDS
+        for attempt in range(1, _BUSY_RETRIES + 1):
+            try:
+                return fn()
+            except sqlite3.OperationalError as exc:
+                if attempt == _BUSY_RETRIES or not _is_busy(exc):
+                    raise
+                self._metrics.incr("sql.busy_retries")
+                logger.debug("database busy (%s), retry %d/%d", exc, attempt, _BUSY_RETRIES - 1)
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+        raise AssertionError("unreachable")
+
+    def _write(self, fn: Callable[[sqlite3.Connection], R], encrypts: bool = False) -> R:
+        """以 BEGIN IMMEDIATE 开启写事务执行 fn 并提交，返回 fn 的结果。
+
+        一开始就取得写锁：WAL 下读事务中途升级为写事务遇到冲突时会直接返回 SQLITE_BUSY，
+        不经过 busy_timeout。出错时 _connect 已回滚，fn 会被整体重试，因此必须可重复执行。
+        fn 会写入密文时传 encrypts=True，并在 fn 内加密：事务开始时先经 _sync_key_epoch 确认
+        本实例的密钥仍是库当前的写入密钥。
+        """
+        def attempt() -> R:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if encrypts:
+                    self._sync_key_epoch(conn)
+                result = fn(conn)
+                conn.commit()
+            return result
+
+        return self._retry_busy(attempt)
+
+    def _write_change(self, fn: Callable[[sqlite3.Connection], R], encrypts: bool = False) -> R:
+        """与 _write 相同，但先把修订号加一；fn 写入的行以 _CURRENT_REVISION 记录修订号。
+
+        重新加密（轮换、格式升级）不改变明文，直接用 _write，不会产生变更记录。
+        """
+        def change(conn: sqlite3.Connection) -> R:
+            self._bump_revision(conn)
+            return fn(conn)
+
+        return self._write(change, encrypts)
+
+    def _sync_key_epoch(self, conn: sqlite3.Connection) -> None:
+        """在写事务内确认本实例持有库当前的写入密钥，以验证器作为密钥的纪元。
+
+        其他实例开始轮换主密码后，持旧密钥的实例从轮换记录中解开新密钥（新密钥由旧密钥包裹）
+        并改用新密钥写入；轮换已经完成、旧密钥无从取得新密钥时拒绝写入，
+        避免写入在轮换结束后永远无法解密的密文。
+        """
+        meta = {
+            row["name"]: row["value"]
+            for row in conn.execute("SELECT name, value FROM meta WHERE name IN ('verifier', 'rotation')")
+        }
+        if "rotation" in meta:
+            rotation = json.loads(meta["rotation"])
+            if self._verifier == str(rotation["new_verifier"]).encode():
+                return
+            if self._verifier == str(rotation["old_verifier"]).encode() and self._aead is not None:
+                new_key = _unseal(self._aead, base64.b64decode(rotation["wrapped_new"]))
+                logger.info("master password rotation started by another instance; switching to the new key")
+                self._set_rotation_keys(rotation, new_key, self._raw_key)
+                return
+        elif "verifier" not in meta or bytes(meta["verifier"]) == self._verifier:
+            # 轮换已由本实例或其他实例完成，所有行都已是新密钥的密文
+            self._previous_ciphers = None
+            return
+        raise RuntimeError("master password was changed by another process; reopen the store")
+
+    @staticmethod
+    def _bump_revision(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
 
     def _init_db(self) -> None:
+        if self._retry_busy(self._migrate_schema):
+            # 旁路文件已导入 meta 表并提交，之后整个库只是一个可原子复制的文件
+            for _name, suffix in _SIDE_FILES:
+                if os.path.exists(self._db_path + suffix):
+                    os.remove(self._db_path + suffix)
+
+    def _migrate_schema(self) -> bool:
+        """升级 schema，返回是否执行了迁移。
+
+        写锁即迁移锁：多个进程同时打开旧库时，只有先拿到锁的进程执行迁移，
+        其余进程在锁内重新读取版本号后发现已是最新，直接返回。
+        """
         with self._connect() as conn:
+            # 已是最新 schema 时无需获取写锁，启动只需一次读取
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return False
+            conn.execute("BEGIN IMMEDIATE")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS apikeys (
                     key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
+                    value BLOB NOT NULL,
                     remark TEXT NOT NULL
                 )
                 """
             )
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for step in _SCHEMA_MIGRATIONS[version:]:
+                if callable(step):
+                    step(conn)
+                    continue
+                for statement in step:
+                    conn.execute(statement)
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
+        return version < SCHEMA_VERSION
 
     def _normalize_str(self, s: str) -> str:
         s = s.strip()
@@ -93,145 +739,940 @@ class ApiKeyStore:
             raise ValueError("remark too long (max 500)")
         return rem
 
-    def _encrypt(self, plaintext: str) -> str:
-        if not self._cipher:
+    def _encrypt(self, plaintext: str) -> bytes:
+        """加密为 v2 格式，直接以 BLOB 写入，无需 base64"""
+        if not self._aead:
             raise RuntimeError("encryption key not set")
-        # Fernet.encrypt 返回的就是 base64 编码的 bytes
-        return self._cipher.encrypt(plaintext.encode()).decode()
+        return _seal(self._aead, plaintext.encode())
 
-    def _decrypt(self, ciphertext: str) -> str:
-        if not self._cipher:
-            raise RuntimeError("encryption key not set")
-        
-        # 兼容性逻辑：如果 ciphertext 看起来不像 Fernet 密文（通常以 gAAAA... 开头）
-        # 或者解密失败，我们尝试判断它是否是旧版本的明文数据
-        if not ciphertext.startswith("gAAAA"):
-            # 这里的判断标准是：如果它不符合 Fernet 格式，且不是空字符串，我们暂且认为它是旧数据
-            # 真正的解密动作在 try 块中
-            pass
+    @staticmethod
+    def _decrypt_with(ciphers: tuple[Fernet, AESGCM], ciphertext: str | bytes) -> bytes:
+        if isinstance(ciphertext, bytes):
+            return _unseal(ciphers[1], ciphertext)
+        # Fernet.decrypt 接受 base64 编码的 bytes 或 str
+        return ciphers[0].decrypt(ciphertext.encode())
 
+    def _decrypt(self, ciphertext: str | bytes) -> str:
+        """解密 v2 BLOB 或旧的 Fernet token（文本）"""
+        if not self._cipher or not self._aead:
+            raise RuntimeError("encryption key not set")
         try:
-            # Fernet.decrypt 接受 base64 编码的 bytes 或 str
-            plaintext = self._cipher.decrypt(ciphertext.encode())
+            try:
+                plaintext = self._decrypt_with((self._cipher, self._aead), ciphertext)
+            except (_fernet().InvalidToken, _invalid_tag()):
+                # 主密码轮换期间，尚未重新加密的行仍使用旧密钥
+                if self._previous_ciphers is None:
+                    raise
+                plaintext = self._decrypt_with(self._previous_ciphers, ciphertext)
             return plaintext.decode()
-        except (InvalidToken, base64.binascii.Error, ValueError):
-            # 如果解密失败，且数据不符合 Fernet 密文特征，尝试直接返回原文（旧版本明文）
-            # 注意：这只会在用户输入了正确的主密码但数据库里混有旧数据时发生
-            print(f"[DEBUG] 解密失败，尝试作为明文返回: {ciphertext[:10]}...")
-            return ciphertext
+        except (_fernet().InvalidToken, _invalid_tag(), ValueError) as exc:
+            raise ValueError("decryption failed") from exc
+
+    def _decode(self, value: str | bytes, fmt: int) -> str:
+        """按行格式还原明文；只有尚未迁移的旧行才需要试探是否为明文"""
+        if fmt != FMT_LEGACY:
+            return self._decrypt(value)
+        try:
+            return self._decrypt(value)
+        except ValueError:
+            return value
+
+    # encrypt / decrypt 的延迟按批记录一次：逐值加锁更新直方图会拖慢 list_all 这类大批量路径
+    def _encrypt_many(self, plaintexts: list[str]) -> list[bytes]:
+        with self._metrics.span("encrypt"):
+            return self._engine.map(self._encrypt, plaintexts)
+
+    def _decode_rows(self, rows: list[sqlite3.Row]) -> list[str]:
+        with self._metrics.span("decrypt"):
+            return self._engine.map(lambda row: self._decode(row["value"], row["fmt"]), rows)
+
+    def _has_search_index(self, conn: sqlite3.Connection) -> bool:
+        if self._search_index is None:
+            self._search_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'apikeys_fts'"
+            ).fetchone() is not None
+        return self._search_index
+
+    def _migrate_value(self, value: str) -> tuple[str | bytes, int]:
+        # 旧行中已是 Fernet 密文的只需打上格式标记，只有明文才需要加密
+        try:
+            self._decrypt(value)
+            return value, FMT_FERNET
+        except ValueError:
+            return self._encrypt(value), FMT_AEAD
+
+    def _upgrade_value(self, value: str) -> tuple[bytes, int]:
+        return self._encrypt(self._decrypt(value)), FMT_AEAD
 
     def verify_password(self, master_password: str) -> bool:
+        """用任意密码重新派生并校验；解锁流程应使用 unlocked，避免重复运行 KDF"""
         try:
-            salt_path = self._db_path + ".salt"
-            verifier_path = self._db_path + ".verifier"
-            if not os.path.exists(salt_path) or not os.path.exists(verifier_path):
+            meta = self._read_meta()
+            if "salt" not in meta or "verifier" not in meta:
                 return True
-            with open(salt_path, "rb") as f:
-                self._salt = f.read()
-            with open(verifier_path, "rb") as f:
-                verifier = f.read()
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=self._salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-            cipher = Fernet(key)
-            try:
-                decrypted = cipher.decrypt(verifier)
-                return decrypted == b"VERIFIER"
-            except InvalidToken:
-                return False
+            with self._metrics.span("kdf"):
+                raw_key = kdf.derive_key(master_password, bytes(meta["salt"]), self._meta_kdf_params(meta))
+            return self._check_verifier(_fernet().Fernet(base64.urlsafe_b64encode(raw_key)), bytes(meta["verifier"]))
         except Exception:
             return False
 
     def list_all(self) -> list[dict[str, str]]:
         with self._connect() as conn:
             rows = conn.execute(
-                "SELECT key, value, remark FROM apikeys ORDER BY key ASC"
+                "SELECT key, value, remark, fmt FROM apikeys ORDER BY key ASC"
             ).fetchall()
-        
-        decrypted_rows = []
-        needs_migration = False
-        
+        return [
+            {"key": row["key"], "value": value, "remark": row["remark"]}
+            for row, value in zip(rows, self._decode_rows(rows))
+        ]
+
+    def list_keys(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        after: str | None = None,
+    ) -> list[ApiKeyEntry]:
+        """只读取 key/备注 元数据，不解密。after 为上一页最后一个 key（键集分页），优先于 offset"""
+        sql = "SELECT key, remark FROM apikeys"
+        params: list[object] = []
+        if after is not None:
+            sql += " WHERE key > ?"
+            params.append(after)
+        sql += " ORDER BY key ASC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+            if after is None and offset:
+                sql += " OFFSET ?"
+                params.append(offset)
+        elif after is None and offset:
+            sql += " LIMIT -1 OFFSET ?"
+            params.append(offset)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [ApiKeyEntry(self, row["key"], row["remark"]) for row in rows]
+
+    def iter_keys(self, batch_size: int = 500) -> Iterator[ApiKeyEntry]:
+        """按 key 顺序流式返回元数据，每次只取一页，内存占用与库大小无关"""
+        after: str | None = None
+        while True:
+            page = self.list_keys(limit=batch_size, after=after)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after = page[-1].key
+
+    @property
+    def revision(self) -> int:
+        """当前修订号：每个修改数据的事务加一，只增不减"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT {_CURRENT_REVISION}").fetchone()[0]
+
+    def changes_since(self, revision: int) -> ChangeSet:
+        """返回修订号 revision 之后新增/修改与删除的 key，不解密；借助 rev 索引，耗时只与变更数量有关"""
+        with self._connect() as conn:
+            # 三次查询在同一个读事务中，看到的是同一份快照
+            conn.execute("BEGIN")
+            current = conn.execute(f"SELECT {_CURRENT_REVISION}").fetchone()[0]
+            reset = revision > current
+            since = 0 if reset else revision
+            rows = conn.execute(
+                "SELECT key, remark FROM apikeys WHERE rev > ? ORDER BY key", (since,)
+            ).fetchall()
+            deleted = [] if reset else [
+                row["key"]
+                for row in conn.execute("SELECT key FROM apikeys_tombstones WHERE rev > ? ORDER BY key", (since,))
+            ]
+            conn.rollback()
+        return ChangeSet(current, [ApiKeyEntry(self, row["key"], row["remark"]) for row in rows], deleted, reset)
+
+    def stats(self) -> dict[str, dict]:
+        """返回计数器与各环节（connect/sql/encrypt/decrypt/kdf/migration/upgrade/rotation/import/access_flush）延迟直方图的快照"""
+        return self._metrics.stats()
+
+    def add_hook(self, hook: SpanHook) -> None:
+        """注册 span 回调 hook(name, seconds, error)，用于接入外部 tracing"""
+        self._metrics.add_hook(hook)
+
+    def search(self, query: str, limit: int = 50) -> list[ApiKeyEntry]:
+        """在 key 与备注中做子串搜索，key 以 query 开头的排在最前，其余按相关度排序"""
+        query = query.strip()
+        if not query:
+            return []
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        prefix = escaped + "%"
+        with self._connect() as conn:
+            # trigram 索引至少需要 3 个字符，更短的查询直接扫描元数据列（不解密）
+            if len(query) >= 3 and self._has_search_index(conn):
+                rows = conn.execute(
+                    """
+                    SELECT a.key, a.remark FROM apikeys_fts f
+                    JOIN apikeys a ON a.rowid = f.rowid
+                    WHERE apikeys_fts MATCH ?
+                    ORDER BY (a.key LIKE ? ESCAPE '\\') DESC, f.rank, a.key
+                    LIMIT ?
+                    """,
+                    ('"' + query.replace('"', '""') + '"', prefix, limit),
+                ).fetchall()
+            else:
+                pattern = "%" + escaped + "%"
+                rows = conn.execute(
+                    """
+                    SELECT key, remark FROM apikeys
+                    WHERE key LIKE ? ESCAPE '\\' OR remark LIKE ? ESCAPE '\\'
+                    ORDER BY (key LIKE ? ESCAPE '\\') DESC, key
+                    LIMIT ?
+                    """,
+                    (pattern, pattern, prefix, limit),
+                ).fetchall()
+        return [ApiKeyEntry(self, row["key"], row["remark"]) for row in rows]
+
+    def rebuild_search_index(self) -> None:
+        """按 apikeys 表重建全文索引（例如 VACUUM 重排 rowid 之后）"""
+        with self._connect() as conn:
+            has_index = self._has_search_index(conn)
+        if has_index:
+            self._write(lambda conn: conn.execute("INSERT INTO apikeys_fts(apikeys_fts) VALUES ('rebuild')"))
+
+    def migrate_legacy(self, chunk_size: int = 500) -> int:
+        """把格式未知的旧行逐块迁移为密文，每块单独提交，可随时中断并在下次继续。返回处理的行数"""
+        if not self._cipher:
+            raise RuntimeError("encryption key not set")
+        with self._metrics.span("migration"):
+            total = self._rewrite_chunks(FMT_LEGACY, self._migrate_value, chunk_size)
+        if total:
+            logger.info("migrated %d legacy rows to encrypted format", total)
+            self._metrics.incr("migration.rows", total)
+        return total
+
+    def upgrade_format(self, chunk_size: int = 500) -> int:
+        """把 Fernet 行重新加密为 v2 二进制格式；与 migrate_legacy 一样逐块提交、可中断续做。返回升级的行数
+
+        升级后的空间要在 vacuum() 之后才会归还给文件系统。
+        """
+        if not self._cipher:
+            raise RuntimeError("encryption key not set")
+        with self._metrics.span("upgrade"):
+            total = self._rewrite_chunks(FMT_FERNET, self._upgrade_value, chunk_size)
+        if total:
+            logger.info("upgraded %d rows to ciphertext format v2", total)
+            self._metrics.incr("upgrade.rows", total)
+        return total
+
+    def rotate_master_password(
+        self,
+        old_password: str,
+        new_password: str,
+        kdf_params: dict[str, object] | None = None,
+        chunk_size: int = _ROTATION_CHUNK_SIZE,
+    ) -> int:
+        """更换主密码并用新密钥重新加密全部记录，返回重新加密的行数。
+
+        每块在一个写事务中完成重新加密并推进游标，内存占用只与 chunk_size 有关；
+        中途中断后用新旧任一密码解锁都会从游标处继续。新旧密钥都保存在库内（互相包裹），
+        因此任何时刻所有行都可读。其他实例在写事务内经 _sync_key_epoch 发现轮换后改用新密钥写入。
+        """
+        if not self._unlocked or self._raw_key is None:
+            raise RuntimeError("store is locked")
+        if self._previous_ciphers is not None:
+            raise RuntimeError("master password rotation already in progress")
+        if not new_password:
+            raise ValueError("new master password must be non-empty")
+        with self._metrics.span("kdf"):
+            old_key = kdf.derive_key(old_password, self._salt, self._kdf_params)
+        if not hmac.compare_digest(old_key, self._raw_key):
+            raise ValueError("old master password is incorrect")
+        new_salt = os.urandom(16)
+        new_kdf = dict(kdf_params or self._kdf_params)
+        with self._metrics.span("kdf"):
+            new_key = kdf.derive_key(new_password, new_salt, new_kdf)
+        new_ciphers = _make_ciphers(new_key)
+        rotation = {
+            "old_salt": base64.b64encode(self._salt).decode(),
+            "old_kdf": self._kdf_params,
+            "old_verifier": self._verifier.decode(),
+            "new_salt": base64.b64encode(new_salt).decode(),
+            "new_kdf": new_kdf,
+            "new_verifier": new_ciphers[0].encrypt(b"VERIFIER").decode(),
+            # 各自用对方的密钥包裹，任一密码解锁后都能取得另一把密钥
+            "wrapped_new": base64.b64encode(_seal(self._aead, new_key)).decode(),
+            "wrapped_old": base64.b64encode(_seal(new_ciphers[1], old_key)).decode(),
+        }
+
+        def begin(conn: sqlite3.Connection) -> None:
+            meta = {row["name"]: row["value"] for row in conn.execute("SELECT name, value FROM meta")}
+            if "rotation" in meta:
+                raise RuntimeError("master password rotation already in progress")
+            if bytes(meta.get("verifier", b"")) != self._verifier:
+                raise RuntimeError("master password was changed by another process; reopen the store")
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [("rotation", json.dumps(rotation)), ("rotation.cursor", 0)],
+            )
+
+        self._write(begin)
+        self._set_rotation_keys(rotation, new_key, old_key)
+        return self._continue_rotation(chunk_size)
+
+    def _continue_rotation(self, chunk_size: int) -> int:
+        def rotate_chunk(conn: sqlite3.Connection) -> int:
+            # 读取、重新加密与写回在同一个写事务中，期间的并发写入不会被覆盖
+            cursor = conn.execute("SELECT value FROM meta WHERE name = 'rotation.cursor'").fetchone()[0]
+            rows = conn.execute(
+                "SELECT rowid, value, fmt FROM apikeys WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (cursor, chunk_size),
+            ).fetchall()
+            if not rows:
+                return 0
+            values = self._engine.map(lambda row: self._encrypt(self._decode(row["value"], row["fmt"])), rows)
+            conn.executemany(
+                f"UPDATE apikeys SET value = ?, fmt = {FMT_AEAD} WHERE rowid = ?",
+                [(value, row["rowid"]) for row, value in zip(rows, values)],
+            )
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'rotation.cursor'", (rows[-1]["rowid"],))
+            return len(rows)
+
+        total = 0
+        with self._metrics.span("rotation"):
+            while True:
+                done = self._write(rotate_chunk, encrypts=True)
+                if not done:
+                    break
+                total += done
+            self._finish_rotation()
+        logger.info("master password rotated; re-encrypted %d rows", total)
+        self._metrics.incr("rotation.rows", total)
+        return total
+
+    def _finish_rotation(self) -> None:
+        # 新的盐值/KDF 参数/验证器与删除轮换记录在同一事务中提交
+        def finish(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [("salt", self._salt), ("kdf", json.dumps(self._kdf_params)), ("verifier", self._verifier)],
+            )
+            conn.execute("DELETE FROM meta WHERE name IN ('rotation', 'rotation.cursor')")
+
+        self._write(finish)
+        self._previous_ciphers = None
+
+    def export_stream(
+        self,
+        password: str,
+        chunk_size: int = 500,
+        kdf_params: dict[str, object] | None = None,
+    ) -> Iterator[bytes]:
+        """按 key 顺序分块导出为加密归档，逐帧产出 bytes，内存占用只与 chunk_size 有关。
+
+        归档用 password 派生的独立密钥加密，可在主密码不同的库中导入；
+        各块分别读取，导出期间的并发写入可能只有部分出现在归档中。
+        """
+        if not self._cipher:
+            raise RuntimeError("encryption key not set")
+        return archive.write_archive(
+            self._iter_export_batches(chunk_size),
+            password,
+            dict(kdf_params or self._kdf_params),
+        )
+
+    def _iter_export_batches(self, chunk_size: int) -> Iterator[list[dict[str, str]]]:
+        after = ""
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT key, value, remark, fmt FROM apikeys WHERE key > ? ORDER BY key LIMIT ?",
+                    (after, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [
+                {"key": row["key"], "value": value, "remark": row["remark"]}
+                for row, value in zip(rows, self._decode_rows(rows))
+            ]
+            self._metrics.incr("export.rows", len(rows))
+            after = rows[-1]["key"]
+
+    def import_stream(
+        self,
+        source: archive.ArchiveSource,
+        password: str,
+        on_conflict: str = CONFLICT_SKIP,
+        progress: Callable[[ImportResult], None] | None = None,
+    ) -> ImportResult:
+        """从 export_stream 生成的归档（文件对象或 bytes 块迭代器）逐帧导入，每帧一次批量写入。
+
+        overwrite 在单个事务中清空并重建整个库，归档损坏或密码错误时原数据保持不变；
+        skip/upsert 每帧单独提交，中途失败时已导入的帧会保留。
+        """
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"unknown conflict policy: {on_conflict}")
+        return self._import_batches(archive.read_archive(source, password), on_conflict, progress)
+
+    def import_records(
+        self,
+        rows: Iterable[dict[str, str]],
+        on_conflict: str = CONFLICT_SKIP,
+        batch_size: int = _IMPORT_BATCH_SIZE,
+        progress: Callable[[ImportResult], None] | None = None,
+        replace_all: bool = False,
+    ) -> ImportResult:
+        """从任意 {"key", "value", "remark"} 字典流（如 importers 中的解析器）导入，每 batch_size 条一个事务。
+
+        校验与 create 相同，不合法的条目记入 errors 而不中断导入。冲突只按 key 处理：skip 保留现有记录，
+        upsert 与 overwrite 都覆盖同名记录，库中其余记录不受影响。只有显式传入 replace_all=True
+        才在单个事务中清空整个库、只保留导入的内容。progress 在每批提交后以累计结果调用。
+        """
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"unknown conflict policy: {on_conflict}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        rows = iter(rows)
+        batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+        if replace_all:
+            policy = CONFLICT_OVERWRITE
+        else:
+            policy = CONFLICT_SKIP if on_conflict == CONFLICT_SKIP else CONFLICT_UPSERT
+        return self._import_batches(batches, policy, progress)
+
+    def _import_batches(
+        self,
+        batches: Iterable[list[dict[str, str]]],
+        on_conflict: str,
+        progress: Callable[[ImportResult], None] | None,
+    ) -> ImportResult:
+        if not self._cipher:
+            raise RuntimeError("encryption key not set")
+        result = ImportResult()
+        with self._metrics.span("import"), self._invalidating_all():
+            if on_conflict == CONFLICT_OVERWRITE:
+                with self._connect() as conn:
+                    # 数据源是单次消费的流，不能整体重试；取得写锁之后事务内不会再遇到 busy
+                    self._retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+                    self._sync_key_epoch(conn)
+                    self._bump_revision(conn)
+                    conn.execute("DELETE FROM apikeys")
+                    for rows in batches:
+                        result.add(self._import_rows(conn, self._normalize_rows(rows, result), CONFLICT_UPSERT))
+                        if progress is not None:
+                            progress(result)
+                    conn.commit()
+            else:
+                for rows in batches:
+                    normalized = self._normalize_rows(rows, result)
+                    result.add(self._write_change(
+                        lambda conn: self._import_rows(conn, normalized, on_conflict), encrypts=True,
+                    ))
+                    if progress is not None:
+                        progress(result)
+        self._metrics.incr("import.rows", result.inserted + result.updated)
+        return result
+
+    def _normalize_rows(self, rows: Iterable[dict[str, str]], result: ImportResult) -> list[tuple[str, str, str]]:
+        normalized = []
         for row in rows:
-            raw_value = row["value"]
+            error = row.get("error") if isinstance(row, dict) else None
+            if isinstance(error, Exception):
+                # 解析器无法识别的条目（如格式错误的行），key 为其位置说明
+                result.errors.append((str(row.get("key", "")), error))
+                continue
             try:
-                # 尝试解密
-                decrypted_value = self._decrypt(raw_value)
-                # 如果解密出的结果和原值一样，且原值不符合密文特征，说明是旧数据
-                if decrypted_value == raw_value and not raw_value.startswith("gAAAA"):
-                    needs_migration = True
-            except Exception:
-                decrypted_value = raw_value
-                needs_migration = True
-
-            decrypted_rows.append({
-                "key": row["key"],
-                "value": decrypted_value,
-                "remark": row["remark"],
-            })
-        
-        # 如果发现旧数据，自动进行迁移（重新加密存储）
-        if needs_migration:
-            print("[INFO] 检测到旧版本明文数据，正在自动迁移加密...")
-            self._migrate_to_encrypted(decrypted_rows)
-            
-        return decrypted_rows
-
-    def _migrate_to_encrypted(self, decrypted_data: list[dict[str, str]]):
-        """将明文数据重新加密并存回数据库"""
+                normalized.append((
+                    self._normalize_key(row["key"]),
+                    self._normalize_value(row["value"]),
+                    self._normalize_remark(row["remark"]),
+                ))
+            except (KeyError, TypeError, AttributeError, ValueError) as exc:
+                result.errors.append((str(row.get("key", "") if isinstance(row, dict) else row), exc))
+        return normalized
+
+    def _import_rows(
+        self,
+        conn: sqlite3.Connection,
+        rows: list[tuple[str, str, str]],
+        on_conflict: str,
+    ) -> tuple[int, int, int]:
+        """在调用方的事务中批量写入已校验的 (key, value, remark)，返回 (新增, 覆盖, 跳过)。
+
+        同一批内重复的 key 以最后一条为准。
+        """
+        latest = {row[0]: row for row in rows}
+        existing = self._existing_keys(conn, list(latest))
+        if on_conflict == CONFLICT_SKIP:
+            skipped = len(rows) - len(latest) + len(existing)
+            pending = [row for key, row in latest.items() if key not in existing]
+        else:
+            skipped = len(rows) - len(latest)
+            pending = list(latest.values())
+        if not pending:
+            return 0, 0, skipped
+        encrypted = self._encrypt_many([row[1] for row in pending])
+        conn.executemany(
+            f"""
+            INSERT INTO apikeys (key, value, remark, fmt, rev, created_at, updated_at)
+            VALUES (?, ?, ?, {FMT_AEAD}, {_CURRENT_REVISION}, {_NOW}, {_NOW})
+            ON CONFLICT(key) DO UPDATE SET
+                value = excluded.value, remark = excluded.remark, fmt = excluded.fmt, rev = excluded.rev,
+                updated_at = excluded.updated_at
+            """,
+            [(row[0], enc, row[2]) for row, enc in zip(pending, encrypted)],
+        )
+        updated = sum(1 for row in pending if row[0] in existing)
+        return len(pending) - updated, updated, skipped
+
+    def vacuum(self) -> None:
+        """重建数据库文件，归还升级或删除后空出的页"""
         with self._connect() as conn:
-            for item in decrypted_data:
-                encrypted_value = self._encrypt(item["value"])
-                conn.execute(
-                    "UPDATE apikeys SET value = ? WHERE key = ?",
-                    (encrypted_value, item["key"])
-                )
-            conn.commit()
-        print("[INFO] 数据库迁移完成")
+            conn.execute("VACUUM")
+
+    def _rewrite_chunks(
+        self,
+        fmt: int,
+        convert: Callable[[str], tuple[str | bytes, int]],
+        chunk_size: int,
+    ) -> int:
+        """逐块改写格式为 fmt 的行。
 
-    def create(self, key: str, value: str, remark: str) -> ApiKeyRecord:
+        每块的读取与写回都在同一个写事务中，写锁同时充当迁移锁：多个进程同时解锁旧库时
+        不会重复处理同一块，先完成的进程提交后，其他进程只会读到剩余的行。
+        """
+        # fmt 直接写进 SQL（内部整数常量），部分索引 idx_apikeys_legacy / idx_apikeys_fernet 才能命中
+        def rewrite_chunk(conn: sqlite3.Connection) -> int:
+            rows = conn.execute(
+                f"SELECT rowid, value FROM apikeys WHERE fmt = {int(fmt)} LIMIT ?",
+                (chunk_size,),
+            ).fetchall()
+            if not rows:
+                return 0
+            converted = self._engine.map(convert, [row["value"] for row in rows])
+            conn.executemany(
+                "UPDATE apikeys SET value = ?, fmt = ? WHERE rowid = ?",
+                [
+                    (value, new_fmt, row["rowid"])
+                    for row, (value, new_fmt) in zip(rows, converted)
+                ],
+            )
+            return len(rows)
+
+        # 先用普通读事务探测；没有待改写的行时（每次解锁的常见情况）不去抢写锁
+        with self._connect() as conn:
+            if conn.execute(f"SELECT 1 FROM apikeys WHERE fmt = {int(fmt)} LIMIT 1").fetchone() is None:
+                return 0
+        total = 0
+        while True:
+            done = self._write(rewrite_chunk, encrypts=True)
+            if not done:
+                return total
+            total += done
+
+    def create(self, key: str, value: str, remark: str, expires_at: float | None = None) -> ApiKeyRecord:
+        """新建记录；expires_at 为可选的过期时间（Unix 时间戳），到期后由 purge_expired 清理"""
         key_n = self._normalize_key(key)
         value_n = self._normalize_value(value)
         remark_n = self._normalize_remark(remark)
-        encrypted_value = self._encrypt(value_n)
-        with self._connect() as conn:
-            conn.execute(
-                "INSERT INTO apikeys (key, value, remark) VALUES (?, ?, ?)",
-                (key_n, encrypted_value, remark_n),
-            )
-            conn.commit()
+        self._write_change(lambda conn: conn.execute(
+            f"""
+            INSERT INTO apikeys (key, value, remark, fmt, rev, created_at, updated_at, expires_at)
+            VALUES (?, ?, ?, ?, {_CURRENT_REVISION}, {_NOW}, {_NOW}, ?)
+            """,
+            (key_n, self._encrypt_many([value_n])[0], remark_n, FMT_AEAD, expires_at),
+        ), encrypts=True)
         return ApiKeyRecord(key_n, value_n, remark_n)
 
+    def _sync_cache(self) -> None:
+        """文件签名变化说明有连接提交过写入，此时按修订号失效被修改、删除或重命名的 key。
+
+        文件未变化时命中缓存只需两次 stat；签名检查漏掉的修改（时间戳精度过粗）最多保留到 TTL 到期。
+        """
+        signature = self.file_signature()
+        if signature == self._cache_signature:
+            return
+        with self._cache_lock:
+            if signature == self._cache_signature:
+                return
+            changes = self.changes_since(self._cache_revision)
+            if changes.reset:
+                self._cache.clear()
+            else:
+                self._cache.invalidate([entry.key for entry in changes.changed] + changes.deleted)
+            self._cache_revision = changes.revision
+            self._cache_signature = signature
+
+    def _invalidate(self, keys: Iterable[str]) -> None:
+        # 在写事务提交之后调用：提交前开始读库的请求会因代数变化而不回填旧值
+        if self._cache is not None:
+            self._cache.invalidate(list(keys))
+
+    @contextmanager
+    def _invalidating_all(self) -> Iterator[None]:
+        """批量导入等改动范围不定的写入结束后清空整个缓存"""
+        try:
+            yield
+        finally:
+            if self._cache is not None:
+                self._cache.clear()
+
+    def _cache_put(self, record: ApiKeyRecord, generation: int) -> None:
+        evicted = self._cache.put(record.key, record.value, record.remark, generation)
+        if evicted:
+            self._metrics.incr("cache.evictions", evicted)
+
     def get(self, key: str) -> Optional[ApiKeyRecord]:
         key_n = self._normalize_key(key)
+        generation = 0
+        if self._cache is not None:
+            self._sync_cache()
+            cached = self._cache.get(key_n)
+            if cached is not None:
+                self._metrics.incr("cache.hits")
+                if self._access is not None:
+                    self._access.record((key_n,))
+                return ApiKeyRecord(key_n, *cached)
+            self._metrics.incr("cache.misses")
+            generation = self._cache.generation
         with self._connect() as conn:
             row = conn.execute(
-                "SELECT key, value, remark FROM apikeys WHERE key = ?", (key_n,)
+                "SELECT key, value, remark, fmt FROM apikeys WHERE key = ?", (key_n,)
             ).fetchone()
         if not row:
             return None
-        decrypted_value = self._decrypt(row["value"])
-        return ApiKeyRecord(row["key"], decrypted_value, row["remark"])
+        with self._metrics.span("decrypt"):
+            decrypted_value = self._decode(row["value"], row["fmt"])
+        record = ApiKeyRecord(row["key"], decrypted_value, row["remark"])
+        if self._cache is not None:
+            self._cache_put(record, generation)
+        if self._access is not None:
+            self._access.record((record.key,))
+        return record
 
     def update(self, old_key: str, new_key: str, new_value: str, new_remark: str) -> ApiKeyRecord:
         old_key_n = self._normalize_key(old_key)
         new_key_n = self._normalize_key(new_key)
         new_value_n = self._normalize_value(new_value)
         new_remark_n = self._normalize_remark(new_remark)
-        encrypted_new_value = self._encrypt(new_value_n)
-        with self._connect() as conn:
-            conn.execute(
-                "UPDATE apikeys SET key = ?, value = ?, remark = ? WHERE key = ?",
-                (new_key_n, encrypted_new_value, new_remark_n, old_key_n),
-            )
-            conn.commit()
+        try:
+            self._write_change(lambda conn: conn.execute(
+                f"UPDATE apikeys SET key = ?, value = ?, remark = ?, fmt = ?, rev = {_CURRENT_REVISION},"
+                f" updated_at = {_NOW} WHERE key = ?",
+                (new_key_n, self._encrypt_many([new_value_n])[0], new_remark_n, FMT_AEAD, old_key_n),
+            ), encrypts=True)
+        finally:
+            self._invalidate((old_key_n, new_key_n))
         return ApiKeyRecord(new_key_n, new_value_n, new_remark_n)
 
     def delete(self, key: str) -> None:
         key_n = self._normalize_key(key)
+        try:
+            self._write_change(lambda conn: conn.execute("DELETE FROM apikeys WHERE key = ?", (key_n,)))
+        finally:
+            self._invalidate((key_n,))
+
+    def set_expiry(self, key: str, expires_at: float | None) -> None:
+        """设置或清除（None）过期时间；key 不存在时抛出 KeyError"""
+        key_n = self._normalize_key(key)
+
+        def write(conn: sqlite3.Connection) -> int:
+            updated = conn.execute(
+                f"UPDATE apikeys SET expires_at = ?, updated_at = {_NOW} WHERE key = ?",
+                (expires_at, key_n),
+            ).rowcount
+            if updated:
+                # 只有确实改到行时才推进修订号，不存在的 key 不会唤醒变更监视
+                self._bump_revision(conn)
+                conn.execute(f"UPDATE apikeys SET rev = {_CURRENT_REVISION} WHERE key = ?", (key_n,))
+            return updated
+
+        if not self._write(write):
+            raise KeyError(key_n)
+
+    def list_expiring(self, within: float = 0.0, now: float | None = None) -> list[ApiKeyEntry]:
+        """返回在 within 秒内到期（含已过期）的条目，按过期时间排序；走过期时间索引，不扫描全表"""
+        deadline = (time.time() if now is None else now) + within
         with self._connect() as conn:
-            conn.execute("DELETE FROM apikeys WHERE key = ?", (key_n,))
-            conn.commit()
+            rows = conn.execute(
+                "SELECT key, remark, expires_at FROM apikeys WHERE expires_at <= ? ORDER BY expires_at, key",
+                (deadline,),
+            ).fetchall()
+        return [ApiKeyEntry(self, row["key"], row["remark"], row["expires_at"]) for row in rows]
+
+    def purge_expired(self, now: float | None = None) -> list[str]:
+        """在一个写事务中删除所有已过期的记录（留下删除墓碑），返回被删除的 key"""
+        deadline = time.time() if now is None else now
+
+        def write(conn: sqlite3.Connection) -> list[str]:
+            keys = [row["key"] for row in conn.execute("SELECT key FROM apikeys WHERE expires_at <= ?", (deadline,))]
+            if keys:
+                # 没有过期记录时不改变修订号，定期清理不会唤醒变更监视
+                self._bump_revision(conn)
+                conn.execute("DELETE FROM apikeys WHERE expires_at <= ?", (deadline,))
+            return keys
+
+        keys = self._write(write)
+        self._invalidate(keys)
+        if keys:
+            self._metrics.incr("expiry.purged", len(keys))
+            logger.info("purged %d expired keys", len(keys))
+        return keys
+
+    def _flush_access(self, pending: AccessCounts) -> None:
+        # 只更新统计列，不改变修订号；期间被删除或重命名的 key 不匹配任何行，其增量直接丢弃
+        with self._metrics.span("access_flush"):
+            self._write(lambda conn: conn.executemany(
+                "UPDATE apikeys SET access_count = access_count + ?, accessed_at = max(coalesce(accessed_at, 0), ?)"
+                " WHERE key = ?",
+                [(count, last, key) for key, (count, last) in pending.items()],
+            ))
+        self._metrics.incr("access.flushed", len(pending))
+
+    def flush_access_stats(self) -> int:
+        """立即写回内存中累计的访问统计，返回写回的 key 数；未开启统计时返回 0"""
+        return self._access.flush() if self._access is not None else 0
+
+    def top_keys(self, n: int = 10) -> list[KeyUsage]:
+        """访问次数最多的 n 个 key（不含从未访问过的），沿访问次数索引读取前 n 行"""
+        self.flush_access_stats()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, remark, access_count, accessed_at FROM apikeys WHERE access_count > 0"
+                " ORDER BY access_count DESC, key LIMIT ?",
+                (n,),
+            ).fetchall()
+        return [KeyUsage(row["key"], row["remark"], row["access_count"], row["accessed_at"]) for row in rows]
+
+    def unused_since(self, since: float) -> list[KeyUsage]:
+        """自 since（Unix 时间戳）以来未被访问过的 key，包括从未访问过的，最久未用的在前"""
+        self.flush_access_stats()
+        with self._connect() as conn:
+            # 拆成两次索引范围查询（OR 会退化为整个索引扫描），在同一个读事务中看到同一份快照
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                "SELECT key, remark, access_count, accessed_at FROM apikeys WHERE accessed_at IS NULL ORDER BY key"
+            ).fetchall()
+            rows += conn.execute(
+                "SELECT key, remark, access_count, accessed_at FROM apikeys WHERE accessed_at < ?"
+                " ORDER BY accessed_at, key",
+                (since,),
+            ).fetchall()
+            conn.rollback()
+        return [KeyUsage(row["key"], row["remark"], row["access_count"], row["accessed_at"]) for row in rows]
+
+    def _existing_keys(self, conn: sqlite3.Connection, keys: list[str]) -> set[str]:
+        found: set[str] = set()
+        for i in range(0, len(keys), _IN_CHUNK_SIZE):
+            chunk = keys[i:i + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key FROM apikeys WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(row["key"] for row in rows)
+        return found
+
+    def _run_batch(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        pending: list[tuple[int, tuple]],
+        results: list[BatchResult | None],
+    ) -> None:
+        """在调用方的事务内用 executemany 写入；若中途违反约束则回滚到保存点并逐条重试，只让出错的条目失败"""
+        conn.execute("SAVEPOINT batch")
+        try:
+            conn.executemany(sql, [params for _idx, params in pending])
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO batch")
+            for idx, params in pending:
+                try:
+                    conn.execute(sql, params)
+                except sqlite3.IntegrityError as exc:
+                    results[idx] = BatchResult(results[idx].key, error=exc)
+        conn.execute("RELEASE batch")
+
+    def create_many(self, items: Iterable[tuple[str, str, str]]) -> list[BatchResult]:
+        """批量新建，items 为 (key, value, remark)，返回与输入顺序一致的逐条结果"""
+        results: list[BatchResult | None] = []
+        pending: list[tuple[int, tuple]] = []
+        seen: set[str] = set()
+        for key, value, remark in items:
+            idx = len(results)
+            try:
+                key_n = self._normalize_key(key)
+                value_n = self._normalize_value(value)
+                remark_n = self._normalize_remark(remark)
+                if key_n in seen:
+                    raise ValueError(f"duplicate key in batch: {key_n}")
+            except ValueError as exc:
+                results.append(BatchResult(str(key), error=exc))
+                continue
+            seen.add(key_n)
+            results.append(BatchResult(key_n, record=ApiKeyRecord(key_n, value_n, remark_n)))
+            pending.append((idx, (key_n, value_n, remark_n)))
+
+        if pending:
+            def write(conn: sqlite3.Connection) -> None:
+                existing = self._existing_keys(conn, [params[0] for _idx, params in pending])
+                to_insert = []
+                for idx, params in pending:
+                    if params[0] in existing:
+                        results[idx] = BatchResult(params[0], error=ValueError(f"key already exists: {params[0]}"))
+                    else:
+                        to_insert.append((idx, params))
+                # 在事务内加密：密钥纪元已确认，且已存在的 key 无需加密
+                encrypted_values = self._encrypt_many([params[1] for _idx, params in to_insert])
+                to_insert = [
+                    (idx, (params[0], enc, params[2]))
+                    for (idx, params), enc in zip(to_insert, encrypted_values)
+                ]
+                self._run_batch(
+                    conn,
+                    "INSERT INTO apikeys (key, value, remark, fmt, rev, created_at, updated_at)"
+                    f" VALUES (?, ?, ?, {FMT_AEAD}, {_CURRENT_REVISION}, {_NOW}, {_NOW})",
+                    to_insert,
+                    results,
+                )
+
+            self._write_change(write, encrypts=True)
+        return results
+
+    def get_many(self, keys: Iterable[str]) -> list[BatchResult]:
+        """批量读取，一次（分块）IN 查询取回全部记录；不存在的 key 以 KeyError 标记"""
+        results: list[BatchResult] = []
+        wanted: list[str] = []
+        for key in keys:
+            try:
+                key_n = self._normalize_key(key)
+            except ValueError as exc:
+                results.append(BatchResult(str(key), error=exc))
+                continue
+            results.append(BatchResult(key_n))
+            wanted.append(key_n)
+
+        cached: dict[str, tuple[str, str]] = {}
+        generation = 0
+        if self._cache is not None and wanted:
+            self._sync_cache()
+            generation = self._cache.generation
+            for key_n in dict.fromkeys(wanted):
+                hit = self._cache.get(key_n)
+                if hit is not None:
+                    cached[key_n] = hit
+            self._metrics.incr("cache.hits", len(cached))
+            self._metrics.incr("cache.misses", len(set(wanted)) - len(cached))
+            wanted = [key_n for key_n in wanted if key_n not in cached]
+
+        rows_by_key: dict[str, sqlite3.Row] = {}
+        if wanted:
+            unique = list(dict.fromkeys(wanted))
+            with self._connect() as conn:
+                for i in range(0, len(unique), _IN_CHUNK_SIZE):
+                    chunk = unique[i:i + _IN_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    for row in conn.execute(
+                        f"SELECT key, value, remark, fmt FROM apikeys WHERE key IN ({placeholders})",
+                        chunk,
+                    ):
+                        rows_by_key[row["key"]] = row
+
+        def decode(row: sqlite3.Row) -> str | Exception:
+            try:
+                return self._decode(row["value"], row["fmt"])
+            except ValueError as exc:
+                return exc
+
+        with self._metrics.span("decrypt"):
+            decoded = dict(zip(rows_by_key, self._engine.map(decode, list(rows_by_key.values()))))
+        for result in results:
+            if result.error is not None:
+                continue
+            if result.key in cached:
+                result.record = ApiKeyRecord(result.key, *cached[result.key])
+                continue
+            row = rows_by_key.get(result.key)
+            if row is None:
+                result.error = KeyError(result.key)
+                continue
+            value = decoded[result.key]
+            if isinstance(value, Exception):
+                result.error = value
+                continue
+            result.record = ApiKeyRecord(row["key"], value, row["remark"])
+            if self._cache is not None:
+                self._cache_put(result.record, generation)
+        if self._access is not None:
+            self._access.record(r.key for r in results if r.record is not None)
+        return results
+
+    def update_many(self, items: Iterable[tuple[str, str, str, str]]) -> list[BatchResult]:
+        """批量更新，items 为 (old_key, new_key, value, remark)；旧 key 不存在时以 KeyError 标记"""
+        results: list[BatchResult | None] = []
+        pending: list[tuple[int, tuple]] = []
+        for old_key, new_key, value, remark in items:
+            idx = len(results)
+            try:
+                old_key_n = self._normalize_key(old_key)
+                new_key_n = self._normalize_key(new_key)
+                value_n = self._normalize_value(value)
+                remark_n = self._normalize_remark(remark)
+            except ValueError as exc:
+                results.append(BatchResult(str(old_key), error=exc))
+                continue
+            results.append(BatchResult(old_key_n, record=ApiKeyRecord(new_key_n, value_n, remark_n)))
+            pending.append((idx, (new_key_n, value_n, remark_n, old_key_n)))
+
+        if pending:
+            def write(conn: sqlite3.Connection) -> None:
+                existing = self._existing_keys(conn, [params[3] for _idx, params in pending])
+                to_update = []
+                for idx, params in pending:
+                    if params[3] not in existing:
+                        results[idx] = BatchResult(params[3], error=KeyError(params[3]))
+                    else:
+                        to_update.append((idx, params))
+                encrypted_values = self._encrypt_many([params[1] for _idx, params in to_update])
+                to_update = [
+                    (idx, (params[0], enc, params[2], params[3]))
+                    for (idx, params), enc in zip(to_update, encrypted_values)
+                ]
+                self._run_batch(
+                    conn,
+                    f"UPDATE apikeys SET key = ?, value = ?, remark = ?, fmt = {FMT_AEAD}, rev = {_CURRENT_REVISION},"
+                    f" updated_at = {_NOW} WHERE key = ?",
+                    to_update,
+                    results,
+                )
+
+            try:
+                self._write_change(write, encrypts=True)
+            finally:
+                self._invalidate(key for _idx, params in pending for key in (params[0], params[3]))
+        return results
+
+    def delete_many(self, keys: Iterable[str]) -> list[BatchResult]:
+        """批量删除；不存在的 key 以 KeyError 标记"""
+        results: list[BatchResult | None] = []
+        pending: list[tuple[int, tuple]] = []
+        for key in keys:
+            idx = len(results)
+            try:
+                key_n = self._normalize_key(key)
+            except ValueError as exc:
+                results.append(BatchResult(str(key), error=exc))
+                continue
+            results.append(BatchResult(key_n))
+            pending.append((idx, (key_n,)))
+
+        if pending:
+
+            def write(conn: sqlite3.Connection) -> None:
+                existing = self._existing_keys(conn, [params[0] for _idx, params in pending])
+                to_delete = []
+                for idx, params in pending:
+                    if params[0] not in existing:
+                        results[idx] = BatchResult(params[0], error=KeyError(params[0]))
+                    else:
+                        to_delete.append((idx, params))
+                self._run_batch(conn, "DELETE FROM apikeys WHERE key = ?", to_delete, results)
+
+            try:
+                self._write_change(write)
+            finally:
+                self._invalidate(params[0] for _idx, params in pending)
+        return results
@@ -1,18 +1,39 @@
 from __future__ import annotations
 
+import bisect
+import logging
+import queue
+import time
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 import threading
-from PIL import Image, ImageDraw
-import pystray
-from pystray import MenuItem as item
 
-from save_api_key.storage import ApiKeyStore
+from save_api_key import importers
+from save_api_key.storage import ApiKeyEntry, ApiKeyRecord, ApiKeyStore, ChangeSet, ImportResult
+from save_api_key.watch import ChangeWatcher
+from save_api_key.worker import StoreWorker
+
+
+logger = logging.getLogger(__name__)
+
+# 表格中 value 列只显示掩码，明文在点击复制或编辑时才从存储中解密
+_MASKED_VALUE = "••••••••"
+# 搜索框输入停止多久后才查询，避免每个按键都触发一次查询
+_SEARCH_DEBOUNCE_MS = 250
+_SEARCH_LIMIT = 500
+# 后台线程检查其他进程（命令行、agent）修改的间隔，以及主线程取出变更的间隔
+_WATCH_INTERVAL_SECONDS = 2.0
+_CHANGES_POLL_MS = 500
+# 过期检查的间隔，以及提前多久把即将到期的 key 标记出来
+_EXPIRY_SWEEP_SECONDS = 60.0
+_EXPIRY_WARNING_SECONDS = 7 * 24 * 3600.0
+# 退出时等待后台线程完成已排队写入的最长时间，之后调用方才会关闭存储
+_SHUTDOWN_TIMEOUT_SECONDS = 10.0
 
 
 class LoginDialog(tk.Toplevel):
     def __init__(self, master: tk.Misc, is_first_run: bool = False) -> None:
-        print("[DEBUG] 初始化LoginDialog...")
+        logger.debug("初始化LoginDialog...")
         super().__init__(master)
         
         title_text = "初始化主密码" if is_first_run else "登录"
@@ -55,7 +76,7 @@ class LoginDialog(tk.Toplevel):
 
         self.bind("<Return>", lambda _e: self._on_ok())
         self.password_entry.focus_set()
-        print("[DEBUG] LoginDialog初始化完成")
+        logger.debug("LoginDialog初始化完成")
 
     def _on_ok(self) -> None:
         pwd = self.password_var.get()
@@ -156,7 +177,7 @@ class ToastNotification(tk.Toplevel):
 
 
 class ApiKeyApp(tk.Tk):
-    def __init__(self, store: ApiKeyStore) -> None:
+    def __init__(self, store: ApiKeyStore, auto_purge: bool = False) -> None:
         super().__init__()
         self.title("API Key 管理")
         self.minsize(820, 420)
@@ -172,6 +193,18 @@ class ApiKeyApp(tk.Tk):
 
         self._store = store
         self._clipboard_content: str | None = None
+        # key 与表格行 id 的双向映射，增删改时只更新受影响的行
+        self._item_by_key: dict[str, str] = {}
+        self._key_by_item: dict[str, str] = {}
+        # 未过滤时表格中的 key 按顺序排列，用于二分定位插入位置
+        self._sorted_keys: list[str] = []
+        # 表格当前显示的搜索条件；输入框在防抖期间可能已经变化，增量更新以它为准
+        self._shown_query = ""
+        # 表格内容对应的修订号；不晚于它的变更已包含在最近一次全量加载中
+        self._shown_revision = 0
+        # 即将到期或已过期的 key 及其过期时间，由后台定期检查更新；auto_purge 时自动删除已过期的 key
+        self._expiring: dict[str, float] = {}
+        self._auto_purge = auto_purge
 
         root = ttk.Frame(self, padding=10)
         root.pack(fill=tk.BOTH, expand=True)
@@ -181,6 +214,15 @@ class ApiKeyApp(tk.Tk):
         title = ttk.Label(root, text="API Keys", font=("Segoe UI", 12, "bold"))
         title.grid(row=0, column=0, sticky="w", pady=(0, 8))
 
+        search_frame = ttk.Frame(root)
+        search_frame.grid(row=0, column=0, sticky="e", pady=(0, 8))
+        ttk.Label(search_frame, text="搜索(F):").grid(row=0, column=0, padx=(0, 6))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+        self.search_entry.grid(row=0, column=1)
+        self._search_after_id: str | None = None
+        self.search_var.trace_add("write", lambda *_a: self._schedule_search())
+
         table_frame = ttk.Frame(root)
         table_frame.grid(row=1, column=0, sticky="nsew")
         table_frame.rowconfigure(0, weight=1)
@@ -195,6 +237,8 @@ class ApiKeyApp(tk.Tk):
         self.tree.heading("key", text="Key")
         self.tree.heading("value", text="Value")
         self.tree.heading("remark", text="备注")
+        self.tree.tag_configure("expired", foreground="#c62828")
+        self.tree.tag_configure("expiring", foreground="#e65100")
 
         self.tree.column("key", width=220, anchor="w")
         self.tree.column("value", width=360, anchor="w")
@@ -206,16 +250,24 @@ class ApiKeyApp(tk.Tk):
         self.tree.grid(row=0, column=0, sticky="nsew")
         y_scroll.grid(row=0, column=1, sticky="ns")
 
+        self.status_var = tk.StringVar()
+        status_label = ttk.Label(root, textvariable=self.status_var, foreground="gray")
+        status_label.grid(row=2, column=0, sticky="w", pady=(10, 0))
+
         btn_bar = ttk.Frame(root)
         btn_bar.grid(row=2, column=0, sticky="e", pady=(10, 0))
 
         self.new_btn = ttk.Button(btn_bar, text="新建(N)...", command=self._on_new)
         self.edit_btn = ttk.Button(btn_bar, text="编辑(E)...", command=self._on_edit, state=tk.DISABLED)
         self.del_btn = ttk.Button(btn_bar, text="删除(D)", command=self._on_delete, state=tk.DISABLED)
+        self.refresh_btn = ttk.Button(btn_bar, text="刷新(R)", command=self._reload)
+        self.import_btn = ttk.Button(btn_bar, text="导入(I)...", command=self._on_import)
 
-        self.new_btn.grid(row=0, column=0, padx=(0, 8))
-        self.edit_btn.grid(row=0, column=1, padx=(0, 8))
-        self.del_btn.grid(row=0, column=2)
+        self.refresh_btn.grid(row=0, column=0, padx=(0, 8))
+        self.new_btn.grid(row=0, column=1, padx=(0, 8))
+        self.edit_btn.grid(row=0, column=2, padx=(0, 8))
+        self.del_btn.grid(row=0, column=3, padx=(0, 8))
+        self.import_btn.grid(row=0, column=4)
 
         self.bind("<Alt-n>", lambda _e: self._on_new())
         self.bind("<Alt-N>", lambda _e: self._on_new())
@@ -223,6 +275,13 @@ class ApiKeyApp(tk.Tk):
         self.bind("<Alt-E>", lambda _e: self._on_edit())
         self.bind("<Alt-d>", lambda _e: self._on_delete())
         self.bind("<Alt-D>", lambda _e: self._on_delete())
+        self.bind("<Alt-i>", lambda _e: self._on_import())
+        self.bind("<Alt-I>", lambda _e: self._on_import())
+        self.bind("<Alt-r>", lambda _e: self._reload())
+        self.bind("<Alt-R>", lambda _e: self._reload())
+        self.bind("<F5>", lambda _e: self._reload())
+        self.bind("<Control-f>", lambda _e: self.search_entry.focus_set())
+        self.search_entry.bind("<Escape>", lambda _e: self.search_var.set(""))
 
         self.tree.bind("<<TreeviewSelect>>", lambda _e: self._sync_buttons())
         self.tree.bind("<Double-1>", lambda _e: self._on_edit())
@@ -231,9 +290,27 @@ class ApiKeyApp(tk.Tk):
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
         self._setup_tray()
 
+        # 所有存储操作都在后台线程执行，Tk 主循环不会因 SQL 或解密而卡住
+        self._worker = StoreWorker(self, on_busy=self._set_busy)
+
+        # 其他进程的修改按修订号增量应用到表格：监视线程只把变更放入队列，由主线程取出
+        self._changes: queue.Queue[ChangeSet] = queue.Queue()
+        self._watcher = ChangeWatcher(store, callback=self._changes.put, interval=_WATCH_INTERVAL_SECONDS)
+        self._watcher.start()
+        self._sweeps: queue.Queue[list[ApiKeyEntry]] = queue.Queue()
+        self._sweeper_stopped = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep_expired, name="save_api_key-expiry", daemon=True)
+        self._sweeper.start()
+        self.after(_CHANGES_POLL_MS, self._drain_changes)
+
         self._reload()
 
     def _setup_tray(self) -> None:
+        # Pillow 与 pystray 较重，只在主窗口真正创建托盘图标时才导入
+        from PIL import Image, ImageDraw
+        import pystray
+        from pystray import MenuItem as item
+
         width, height = 64, 64
         image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(image)
@@ -264,14 +341,35 @@ class ApiKeyApp(tk.Tk):
         self.withdraw()
 
     def _quit_app(self) -> None:
+        # 由托盘线程调用；Tk 不是线程安全的，收尾工作交给主线程
+        self.icon.stop()
+        self.after(0, self._shutdown)
+
+    def _shutdown(self) -> None:
         # 退出前强制清空剪贴板，防止敏感数据泄露
         try:
             self.clipboard_clear()
         except Exception:
             pass
-        self.icon.stop()
-        self.after(0, self.quit)
-        self.after(0, self.destroy)
+        self._sweeper_stopped.set()
+        self._watcher.stop()
+        # 等排队或正在执行的新建/修改/导入完成，在主线程交付回调（失败时照常弹出错误），再让 main 关闭存储
+        if not self._worker.close(_SHUTDOWN_TIMEOUT_SECONDS):
+            logger.warning("store worker still busy after %.0fs; closing anyway", _SHUTDOWN_TIMEOUT_SECONDS)
+        self._worker.drain()
+        self._sweeper.join(_SHUTDOWN_TIMEOUT_SECONDS)
+        self.quit()
+        self.destroy()
+
+    def _set_busy(self, busy: bool) -> None:
+        self.status_var.set("正在处理..." if busy else "")
+        self.configure(cursor="watch" if busy else "")
+
+    def _show_error(self, exc: BaseException) -> None:
+        messagebox.showerror("错误", str(exc), parent=self)
+
+    def _submit(self, fn, *args, on_success=None, tag: str | None = None) -> None:
+        self._worker.submit(fn, *args, on_success=on_success, on_error=self._show_error, tag=tag)
 
     def _sync_buttons(self) -> None:
         has_sel = bool(self.tree.selection())
@@ -279,13 +377,164 @@ class ApiKeyApp(tk.Tk):
         self.del_btn.configure(state=(tk.NORMAL if has_sel else tk.DISABLED))
 
     def _clear_rows(self) -> None:
-        for item_id in self.tree.get_children():
-            self.tree.delete(item_id)
+        self.tree.delete(*self.tree.get_children())
+        self._item_by_key.clear()
+        self._key_by_item.clear()
+        self._sorted_keys = []
+
+    def _schedule_search(self) -> None:
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(_SEARCH_DEBOUNCE_MS, self._reload)
+
+    def _is_filtered(self) -> bool:
+        return bool(self._shown_query)
 
     def _reload(self) -> None:
+        """全量重建表格：只用于首次加载、显式刷新和搜索条件变化，并保留选中行与滚动位置"""
+        self._search_after_id = None
+        query = self.search_var.get().strip()
+
+        def fetch() -> tuple[int, list[ApiKeyEntry]]:
+            # 先读修订号再读列表：两者之间的修改会再经变更队列到达，重复应用是幂等的
+            revision = self._store.revision
+            if query:
+                return revision, self._store.search(query, limit=_SEARCH_LIMIT)
+            return revision, list(self._store.iter_keys())
+
+        # 同一 tag 的新请求会作废尚未完成的旧重载
+        self._submit(fetch, on_success=lambda result: self._populate(*result, query), tag="reload")
+
+    def _populate(self, revision: int, entries: list[ApiKeyEntry], query: str) -> None:
+        self._shown_revision = revision
+        self._shown_query = query
+        selected = self._get_selected()
+        y_top = self.tree.yview()[0]
         self._clear_rows()
-        for row in self._store.list_all():
-            self.tree.insert("", tk.END, values=(row["key"], row["value"], row["remark"]))
+        for entry in entries:
+            item_id = self.tree.insert("", tk.END, values=(entry.key, _MASKED_VALUE, entry.remark))
+            self._item_by_key[entry.key] = item_id
+            self._key_by_item[item_id] = entry.key
+        if not query:
+            self._sorted_keys = list(self._item_by_key)
+        self.tree.yview_moveto(y_top)
+        if selected is not None and selected[0] in self._item_by_key:
+            self.tree.selection_set(self._item_by_key[selected[0]])
+        self._highlight_expiry()
+        self._sync_buttons()
+
+    def _drain_changes(self) -> None:
+        try:
+            while True:
+                changes = self._changes.get_nowait()
+                if changes.revision > self._shown_revision:
+                    self._apply_changes(changes)
+        except queue.Empty:
+            pass
+        sweep = None
+        try:
+            while True:
+                sweep = self._sweeps.get_nowait()
+        except queue.Empty:
+            pass
+        if sweep is not None:
+            self._expiring = {entry.key: entry.expires_at for entry in sweep}
+            self._highlight_expiry()
+        self.after(_CHANGES_POLL_MS, self._drain_changes)
+
+    def _sweep_expired(self) -> None:
+        """后台线程：定期经过期时间索引查出即将到期的 key，结果放入队列由主线程标记"""
+        while True:
+            try:
+                if self._auto_purge:
+                    # 删除经修订号变更由监视线程同步到表格
+                    self._store.purge_expired()
+                self._sweeps.put(self._store.list_expiring(_EXPIRY_WARNING_SECONDS))
+            except Exception:
+                logger.exception("expiry sweep failed")
+            if self._sweeper_stopped.wait(_EXPIRY_SWEEP_SECONDS):
+                return
+
+    def _highlight_expiry(self) -> None:
+        now = time.time()
+        for key, item_id in self._item_by_key.items():
+            expires_at = self._expiring.get(key)
+            if expires_at is None:
+                tags: tuple[str, ...] = ()
+            else:
+                tags = ("expired",) if expires_at <= now else ("expiring",)
+            self.tree.item(item_id, tags=tags)
+
+    def _apply_changes(self, changes: ChangeSet) -> None:
+        """应用其他连接的修改，只更新受影响的行"""
+        self._shown_revision = changes.revision
+        if changes.reset or self._is_filtered():
+            # 变更后的行是否匹配搜索条件由索引决定，直接重新查询
+            self._reload()
+            return
+        for key in changes.deleted:
+            self._apply_deleted(key)
+        for entry in changes.changed:
+            item_id = self._item_by_key.get(entry.key)
+            if item_id is not None:
+                self.tree.item(item_id, values=(entry.key, _MASKED_VALUE, entry.remark))
+                continue
+            index = bisect.bisect_left(self._sorted_keys, entry.key)
+            self._sorted_keys.insert(index, entry.key)
+            item_id = self.tree.insert("", index, values=(entry.key, _MASKED_VALUE, entry.remark))
+            self._item_by_key[entry.key] = item_id
+            self._key_by_item[item_id] = entry.key
+
+    def _select_item(self, item_id: str) -> None:
+        self.tree.selection_set(item_id)
+        self.tree.see(item_id)
+        self._sync_buttons()
+
+    def _apply_created(self, key: str, remark: str) -> None:
+        if self._is_filtered():
+            # 新行是否匹配当前搜索条件由索引决定，直接重新查询
+            self._reload()
+            return
+        item_id = self._item_by_key.get(key)
+        if item_id is not None:
+            # 监视线程可能已先把同一行插入表格，这里只就地更新
+            self.tree.item(item_id, values=(key, _MASKED_VALUE, remark))
+            self._select_item(item_id)
+            return
+        index = bisect.bisect_left(self._sorted_keys, key)
+        self._sorted_keys.insert(index, key)
+        item_id = self.tree.insert("", index, values=(key, _MASKED_VALUE, remark))
+        self._item_by_key[key] = item_id
+        self._key_by_item[item_id] = key
+        self._select_item(item_id)
+
+    def _apply_updated(self, old_key: str, key: str, remark: str) -> None:
+        if key != old_key:
+            # 监视线程可能已先插入了新 key 的行，去掉它以免重复
+            self._apply_deleted(key)
+        item_id = self._item_by_key.pop(old_key, None)
+        if item_id is None:
+            self._reload()
+            return
+        self.tree.item(item_id, values=(key, _MASKED_VALUE, remark))
+        self._item_by_key[key] = item_id
+        self._key_by_item[item_id] = key
+        if key != old_key and not self._is_filtered():
+            # 重命名：只把这一行移动到新的排序位置
+            del self._sorted_keys[bisect.bisect_left(self._sorted_keys, old_key)]
+            index = bisect.bisect_left(self._sorted_keys, key)
+            self._sorted_keys.insert(index, key)
+            self.tree.move(item_id, "", index)
+        self._select_item(item_id)
+
+    def _apply_deleted(self, key: str) -> None:
+        item_id = self._item_by_key.pop(key, None)
+        if item_id is None:
+            return
+        del self._key_by_item[item_id]
+        self.tree.delete(item_id)
+        if not self._is_filtered():
+            del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
         self._sync_buttons()
 
     def _on_cell_click(self, event: tk.Event) -> None:
@@ -302,10 +551,22 @@ class ApiKeyApp(tk.Tk):
             col_idx = int(column_id.replace("#", "")) - 1
             if col_idx < 0:
                 return
-            value = self.tree.item(item_id, "values")[col_idx]
+            values = self.tree.item(item_id, "values")
+            value = str(values[col_idx])
         except (ValueError, IndexError):
             return
 
+        if col_idx == 1:
+            key = self._key_by_item.get(item_id, str(values[0]))
+            self._submit(self._store.get, key, on_success=self._copy_record_value)
+            return
+        self._copy_to_clipboard(value)
+
+    def _copy_record_value(self, record: ApiKeyRecord | None) -> None:
+        if record is not None:
+            self._copy_to_clipboard(record.value)
+
+    def _copy_to_clipboard(self, value: str) -> None:
         self.clipboard_clear()
         self.clipboard_append(value)
         self.update()
@@ -323,15 +584,16 @@ class ApiKeyApp(tk.Tk):
         except Exception:
             pass
 
-    def _get_selected(self) -> tuple[str, str, str] | None:
+    def _get_selected(self) -> tuple[str, str] | None:
         sel = self.tree.selection()
         if not sel:
             return None
         item_id = sel[0]
+        key = self._key_by_item.get(item_id)
         values = self.tree.item(item_id, "values")
-        if len(values) != 3:
+        if key is None or len(values) != 3:
             return None
-        return (str(values[0]), str(values[1]), str(values[2]))
+        return (key, str(values[2]))
 
     def _on_new(self) -> None:
         dialog = ApiKeyEditDialog(self, "新建 API Key", "", "", "")
@@ -339,40 +601,75 @@ class ApiKeyApp(tk.Tk):
         if dialog.result is None:
             return
         key, value, remark = dialog.result
+        self._submit(
+            self._store.create,
+            key,
+            value,
+            remark,
+            on_success=lambda record: self._apply_created(record.key, record.remark),
+        )
+
+    def _on_import(self) -> None:
+        path = filedialog.askopenfilename(
+            parent=self,
+            title="导入 API Key",
+            filetypes=[("支持的格式", "*.env *.json *.jsonl *.ndjson *.csv"), ("所有文件", "*.*")],
+        )
+        if not path:
+            return
         try:
-            self._store.create(key, value, remark)
-        except Exception as exc:
-            messagebox.showerror("错误", str(exc), parent=self)
+            fmt = importers.detect_format(path)
+        except ValueError as exc:
+            self._show_error(exc)
             return
+        # 解析与写入都在后台线程中流式进行；已存在的 key 保持不变
+        self._submit(
+            lambda: self._store.import_records(importers.iter_file(path, fmt)),
+            on_success=self._on_imported,
+        )
+
+    def _on_imported(self, result: ImportResult) -> None:
         self._reload()
+        lines = [f"新增 {result.inserted} 条，已存在跳过 {result.skipped} 条，失败 {result.failed} 条"]
+        lines += [f"{key}: {error}" for key, error in result.errors[:10]]
+        if result.failed > 10:
+            lines.append("...")
+        messagebox.showinfo("导入完成", "\n".join(lines), parent=self)
 
     def _on_edit(self) -> None:
         selected = self._get_selected()
         if selected is None:
             return
-        old_key, old_value, old_remark = selected
-        dialog = ApiKeyEditDialog(self, "编辑 API Key", old_key, old_value, old_remark)
+        old_key, old_remark = selected
+        # 先在后台取出并解密旧值，再在主线程弹出编辑框
+        self._submit(
+            self._store.get,
+            old_key,
+            on_success=lambda record: self._open_edit_dialog(old_key, old_remark, record),
+        )
+
+    def _open_edit_dialog(self, old_key: str, old_remark: str, record: ApiKeyRecord | None) -> None:
+        if record is None:
+            return
+        dialog = ApiKeyEditDialog(self, "编辑 API Key", old_key, record.value, old_remark)
         self.wait_window(dialog)
         if dialog.result is None:
             return
         new_key, new_value, new_remark = dialog.result
-        try:
-            self._store.update(old_key, new_key, new_value, new_remark)
-        except Exception as exc:
-            messagebox.showerror("错误", str(exc), parent=self)
-            return
-        self._reload()
+        self._submit(
+            self._store.update,
+            old_key,
+            new_key,
+            new_value,
+            new_remark,
+            on_success=lambda updated: self._apply_updated(old_key, updated.key, updated.remark),
+        )
 
     def _on_delete(self) -> None:
         selected = self._get_selected()
         if selected is None:
             return
-        key, _value, _remark = selected
+        key, _remark = selected
         if not messagebox.askyesno("确认删除", f"确定要删除 Key: {key} 吗？", parent=self):
             return
-        try:
-            self._store.delete(key)
-        except Exception as exc:
-            messagebox.showerror("错误", str(exc), parent=self)
-            return
-        self._reload()
+        self._submit(self._store.delete, key, on_success=lambda _result: self._apply_deleted(key))
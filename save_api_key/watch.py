@@ -0,0 +1,81 @@
+"""监视库的变更：按修订号增量同步，而不是每次重读整张表。
+
+ChangeWatcher 每次轮询先比较数据库文件与 WAL 文件的 (mtime, size)，文件未变化时不查询数据库；
+变化后调用 changes_since 取出修订号之后的变更。任何连接或进程提交写入都会改动 WAL 文件，
+因此同样能发现其他进程的修改。文件系统时间戳精度较粗时，每隔若干次轮询会强制查询一次。
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable
+
+from save_api_key.storage import ApiKeyStore, ChangeSet
+
+logger = logging.getLogger(__name__)
+
+ChangeCallback = Callable[[ChangeSet], None]
+
+# 文件签名未变化时，每隔多少次轮询仍强制查询一次修订号
+_FORCE_CHECK_EVERY = 10
+
+
+class ChangeWatcher:
+    def __init__(
+        self,
+        store: ApiKeyStore,
+        callback: ChangeCallback | None = None,
+        interval: float = 1.0,
+        revision: int | None = None,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self._store = store
+        self._callback = callback
+        self._interval = interval
+        # 已同步到的修订号，默认从当前开始，只报告此后的变更
+        self.revision = store.revision if revision is None else revision
+        self._signature = self._store.file_signature()
+        self._polls = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll(self) -> ChangeSet | None:
+        """检查一次；有变更时返回 ChangeSet 并前移 revision，否则返回 None"""
+        self._polls += 1
+        signature = self._store.file_signature()
+        if signature == self._signature and self._polls % _FORCE_CHECK_EVERY:
+            return None
+        # 先记录签名再查询：查询之后才提交的写入会改变签名，下次轮询不会漏掉
+        self._signature = signature
+        changes = self._store.changes_since(self.revision)
+        self.revision = changes.revision
+        return changes if changes else None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                changes = self.poll()
+                if changes is not None and self._callback is not None:
+                    self._callback(changes)
+            except Exception:
+                logger.exception("change watcher poll failed")
+
+    def start(self) -> "ChangeWatcher":
+        """在后台线程中按 interval 轮询，回调在该线程中执行"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="save_api_key-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "ChangeWatcher":
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.stop()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import queue
+import threading
+import tkinter as tk
+from typing import Any, Callable
+
+SuccessCallback = Callable[[Any], None]
+ErrorCallback = Callable[[BaseException], None]
+
+
+class StoreWorker:
+    """在后台线程中串行执行存储操作，结果经 after() 轮询交回 Tk 主线程回调。
+
+    后台线程从不直接接触 Tk 对象；同一 tag 的新请求会让尚未完成的旧请求作废，
+    用于丢弃被后续搜索/刷新取代的重载。
+    """
+
+    def __init__(
+        self,
+        widget: tk.Misc,
+        on_busy: Callable[[bool], None] | None = None,
+        poll_ms: int = 20,
+    ) -> None:
+        self._widget = widget
+        self._on_busy = on_busy
+        self._poll_ms = poll_ms
+        self._requests: queue.Queue = queue.Queue()
+        self._results: queue.Queue = queue.Queue()
+        self._generations: dict[str, int] = {}
+        self._pending = 0
+        self._poll_id: str | None = None
+        self._thread = threading.Thread(target=self._run, name="save_api_key-store", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_success: SuccessCallback | None = None,
+        on_error: ErrorCallback | None = None,
+        tag: str | None = None,
+    ) -> None:
+        """提交一个操作；只能在 Tk 主线程调用"""
+        generation = 0
+        if tag is not None:
+            generation = self._generations.get(tag, 0) + 1
+            self._generations[tag] = generation
+        self._requests.put((fn, args, on_success, on_error, tag, generation))
+        self._pending += 1
+        if self._pending == 1 and self._on_busy is not None:
+            self._on_busy(True)
+        if self._poll_id is None:
+            self._poll_id = self._widget.after(self._poll_ms, self._poll)
+
+    def _is_current(self, tag: str | None, generation: int) -> bool:
+        return tag is None or self._generations.get(tag) == generation
+
+    def _run(self) -> None:
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            fn, args, on_success, on_error, tag, generation = request
+            if not self._is_current(tag, generation):
+                # 已被同 tag 的新请求取代，不再执行
+                self._results.put((None, None, tag, generation, None, None))
+                continue
+            try:
+                result = fn(*args)
+            except Exception as exc:
+                self._results.put((None, on_error, tag, generation, None, exc))
+            else:
+                self._results.put((on_success, None, tag, generation, result, None))
+
+    def _poll(self) -> None:
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    on_success, on_error, tag, generation, result, error = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending -= 1
+                if self._pending == 0 and self._on_busy is not None:
+                    self._on_busy(False)
+                if not self._is_current(tag, generation):
+                    continue
+                if error is not None:
+                    if on_error is not None:
+                        on_error(error)
+                elif on_success is not None:
+                    on_success(result)
+        finally:
+            # 回调抛出异常时也要继续轮询剩余结果
+            if self._pending > 0 and self._poll_id is None:
+                self._poll_id = self._widget.after(self._poll_ms, self._poll)
+
+    def close(self, timeout: float | None = 0.0) -> bool:
+        """停止接收新请求；已排队的请求执行完后线程退出。
+
+        timeout 非 0 时最多等待这么久（None 为一直等待），返回线程是否已经退出。
+        不交付回调：剩余结果由调用方在 Tk 主线程调用 drain() 交付。
+        """
+        self._requests.put(None)
+        self._cancel_poll()
+        if timeout != 0.0:
+            self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def drain(self) -> None:
+        """立即交付已完成请求的回调；只能在 Tk 主线程调用，通常在 close() 之后"""
+        self._poll()
+        self._cancel_poll()
+
+    def _cancel_poll(self) -> None:
+        if self._poll_id is not None:
+            try:
+                self._widget.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
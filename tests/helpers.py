@@ -0,0 +1,14 @@
+"""测试共用的常量与替身"""
+
+# 测试用的低成本 KDF 参数，避免每个用例都跑完整的 PBKDF2
+FAST_KDF = {"algorithm": "pbkdf2-sha256", "iterations": 1000}
+
+
+class FakeClock:
+    """可手动拨动的时钟，替代 time.time / time.monotonic"""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
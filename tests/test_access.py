@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from save_api_key.access import AccessRecorder
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF, FakeClock
+
+
+class TestAccessRecorder(unittest.TestCase):
+    def test_accumulates_and_flushes_in_one_batch(self) -> None:
+        clock = FakeClock(100.0)
+        batches = []
+        recorder = AccessRecorder(batches.append, interval=3600, clock=clock)
+        recorder.record(["a", "b"])
+        clock.now = 105.0
+        recorder.record(["a"])
+        self.assertEqual(len(recorder), 2)
+        self.assertEqual(recorder.flush(), 2)
+        self.assertEqual(batches, [{"a": (2, 105.0), "b": (1, 100.0)}])
+        self.assertEqual(recorder.flush(), 0)
+        self.assertEqual(len(batches), 1)
+
+        recorder.record(["c"])
+        recorder.close()
+        self.assertEqual(batches[-1], {"c": (1, 105.0)})
+        # 关闭后的访问不再记录
+        recorder.record(["d"])
+        self.assertEqual(len(recorder), 0)
+
+    def test_failed_flush_keeps_counts(self) -> None:
+        clock = FakeClock(100.0)
+        batches = []
+
+        def flaky(pending: dict) -> None:
+            if not batches:
+                batches.append(None)
+                raise OSError("disk busy")
+            batches.append(pending)
+
+        recorder = AccessRecorder(flaky, interval=3600, clock=clock)
+        recorder.record(["a"])
+        with self.assertRaises(OSError):
+            recorder.flush()
+        clock.now = 110.0
+        recorder.record(["a"])
+        recorder.flush()
+        self.assertEqual(batches[-1], {"a": (2, 110.0)})
+        recorder.close()
+
+    def test_invalid_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            AccessRecorder(lambda _pending: None, interval=0)
+
+
+class TestStoreAccessStats(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.db_path = os.path.join(self._tmp.name, "a.db")
+        self.store = ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF, access_stats=True, cache_size=4)
+        self.addCleanup(self.store.close)
+        self.store.create_many([(f"k{i}", f"v{i}", "r") for i in range(4)])
+
+    def test_reads_do_not_write_until_flush(self) -> None:
+        revision = self.store.revision
+        for _ in range(3):
+            self.store.get("k1")
+        self.store.get_many(["k1", "k2", "missing"])
+        self.assertIsNone(self.store.get("missing"))
+        # 读取期间没有写入：另一个连接看不到任何计数
+        with ApiKeyStore(self.db_path) as other:
+            self.assertEqual(other.top_keys(), [])
+
+        top = self.store.top_keys(2)
+        self.assertEqual([(u.key, u.count) for u in top], [("k1", 4), ("k2", 1)])
+        self.assertIsNotNone(top[0].last_access)
+        # 统计写回不改变修订号，不会唤醒变更监视
+        self.assertEqual(self.store.revision, revision)
+        self.assertEqual([u.key for u in self.store.unused_since(top[0].last_access + 1)], ["k0", "k3", "k1", "k2"])
+        self.assertEqual([u.key for u in self.store.unused_since(0)], ["k0", "k3"])
+
+    def test_close_flushes_pending_counts(self) -> None:
+        self.store.get("k3")
+        self.store.update("k3", "renamed", "v3", "r")
+        self.store.get("renamed")
+        self.store.close()
+        # 写回前已被重命名的 key 的计数无法对应到行，被丢弃
+        with ApiKeyStore(self.db_path) as other:
+            self.assertEqual([(u.key, u.count) for u in other.top_keys()], [("renamed", 1)])
+
+    def test_disabled_by_default(self) -> None:
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as plain:
+            plain.get("k0")
+            self.assertEqual(plain.flush_access_stats(), 0)
+            self.assertEqual(plain.top_keys(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "requires unix domain sockets")
+class TestAgent(unittest.TestCase):
+    def setUp(self) -> None:
+        from save_api_key.agent import AgentServer
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.store = ApiKeyStore(os.path.join(self._tmp.name, "a.db"), "pw", kdf_params=FAST_KDF)
+        self.addCleanup(self.store.close)
+        self.store.create_many([("k1", "v1", "r1"), ("k2", "v2", "r2")])
+        self.socket_path = os.path.join(self._tmp.name, "agent", "agent.sock")
+        self.server = AgentServer(self.store, self.socket_path, idle_timeout=30)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.addCleanup(self.thread.join, 5)
+        self.addCleanup(self.server.stop)
+        for _ in range(200):
+            if os.path.exists(self.socket_path):
+                break
+            threading.Event().wait(0.01)
+
+    def test_many_clients_do_not_leak_connections(self) -> None:
+        from save_api_key.agent import AgentClient
+
+        for _ in range(300):
+            with AgentClient(self.socket_path) as client:
+                self.assertEqual(client.get("k1").value, "v1")
+        # 处理线程在客户端断开后才释放连接，最后几个可能尚未结束
+        for _ in range(200):
+            if len(self.store._conns) <= 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertLessEqual(len(self.store._conns), 2)
+
+    def test_existing_socket_path(self) -> None:
+        from save_api_key.agent import AgentClient, AgentError, AgentServer
+
+        # 已有 agent 在监听：拒绝启动，也不删除对方的套接字
+        with self.assertRaises(AgentError):
+            AgentServer(self.store, self.socket_path).serve_forever()
+        with AgentClient(self.socket_path) as client:
+            self.assertTrue(client.ping())
+
+        # 普通文件不会被当作遗留套接字删除
+        other_path = os.path.join(self._tmp.name, "agent", "other.sock")
+        with open(other_path, "w") as f:
+            f.write("keep")
+        with self.assertRaises(AgentError):
+            AgentServer(self.store, other_path)._bind()
+        self.assertTrue(os.path.isfile(other_path))
+        os.unlink(other_path)
+
+        # 上次异常退出遗留的套接字（无人监听）被替换
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(other_path)
+        stale.close()
+        server = AgentServer(self.store, other_path)._bind()
+        server.server_close()
+        self.assertTrue(stat.S_ISSOCK(os.stat(other_path).st_mode))
+
+    def test_queries_and_lock(self) -> None:
+        from save_api_key.agent import AgentClient
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+        with AgentClient(self.socket_path) as client:
+            self.assertTrue(client.ping())
+            self.assertEqual(client.get("k1").value, "v1")
+            self.assertIsNone(client.get("missing"))
+            self.assertEqual(sorted(client.get_many(["k1", "k2", "nope"])), ["k1", "k2"])
+            self.assertEqual([row["key"] for row in client.list()], ["k1", "k2"])
+            client.lock()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(self.store.unlocked)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_does_not_unlink_replaced_socket(self) -> None:
+        # 运行期间套接字被删除并由别人重新创建：退出时保留新的文件
+        for _ in range(200):
+            if self.server._socket_id is not None:
+                break
+            threading.Event().wait(0.01)
+        os.unlink(self.socket_path)
+        replacement = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(replacement.close)
+        replacement.bind(self.socket_path)
+        self.server.stop()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertTrue(os.path.exists(self.socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from save_api_key.async_store import AsyncApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+class TestAsyncApiKeyStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.store = await AsyncApiKeyStore.open(
+            os.path.join(self._tmp.name, "a.db"), "pw", max_workers=2, kdf_params=FAST_KDF
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.store.close()
+
+    async def test_crud_and_iteration(self) -> None:
+        self.assertTrue(self.store.unlocked)
+        await self.store.create("k1", "v1", "r1")
+        results = await self.store.create_many([(f"k{i}", f"v{i}", "r") for i in range(2, 8)])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual((await self.store.get("k3")).value, "v3")
+
+        await self.store.update("k1", "k1", "new", "r1")
+        self.assertEqual((await self.store.get("k1")).value, "new")
+        await self.store.delete("k2")
+        self.assertIsNone(await self.store.get("k2"))
+
+        keys = [entry.key async for entry in self.store.iter_keys(batch_size=2)]
+        self.assertEqual(keys, ["k1", "k3", "k4", "k5", "k6", "k7"])
+        records = [record async for record in self.store.iter_records(batch_size=4)]
+        self.assertEqual([r.value for r in records], ["new", "v3", "v4", "v5", "v6", "v7"])
+        self.assertEqual(len([r async for r in self.store]), 6)
+        self.assertEqual(len(await self.store.list_all()), 6)
+
+    async def test_expiry(self) -> None:
+        await self.store.create("old", "v", "r", expires_at=100.0)
+        await self.store.create("keep", "v", "r")
+        await self.store.set_expiry("keep", 10_000.0)
+        expiring = await self.store.list_expiring(within=1_000.0, now=0.0)
+        self.assertEqual([(e.key, e.expires_at) for e in expiring], [("old", 100.0)])
+        self.assertEqual(await self.store.purge_expired(now=200.0), ["old"])
+        self.assertIsNone(await self.store.get("old"))
+        self.assertEqual((await self.store.get("keep")).value, "v")
+
+    async def test_concurrent_gets_are_coalesced(self) -> None:
+        await self.store.create("k", "v", "r")
+        sync_store = self.store.store
+        original_get = sync_store.get
+        calls: list[str] = []
+        release = threading.Event()
+
+        def slow_get(key: str):
+            calls.append(key)
+            release.wait(2)
+            return original_get(key)
+
+        sync_store.get = slow_get
+        try:
+            tasks = [asyncio.ensure_future(self.store.get("k")) for _ in range(20)]
+            await asyncio.sleep(0.05)
+            release.set()
+            records = await asyncio.gather(*tasks)
+        finally:
+            sync_store.get = original_get
+        self.assertEqual(calls, ["k"])
+        self.assertEqual({r.value for r in records}, {"v"})
+
+    async def test_write_discards_inflight_get(self) -> None:
+        await self.store.create("k", "old", "r")
+        sync_store = self.store.store
+        original_get = sync_store.get
+
+        def slow_get(key: str):
+            record = original_get(key)
+            time.sleep(0.2)
+            return record
+
+        sync_store.get = slow_get
+        try:
+            stale = asyncio.ensure_future(self.store.get("k"))
+            await asyncio.sleep(0.02)
+            await self.store.update("k", "k", "new", "r")
+            fresh = await self.store.get("k")
+        finally:
+            sync_store.get = original_get
+        self.assertEqual((await stale).value, "old")
+        self.assertEqual(fresh.value, "new")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from save_api_key.cache import RecordCache
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF, FakeClock
+
+
+class TestRecordCache(unittest.TestCase):
+    def test_lru_ttl_and_wipe(self) -> None:
+        clock = FakeClock()
+        cache = RecordCache(max_size=2, ttl=10, clock=clock)
+        cache.put("a", "va", "ra", cache.generation)
+        cache.put("b", "vb", "rb", cache.generation)
+        self.assertEqual(cache.get("a"), ("va", "ra"))
+        # a 刚被访问过，超出容量时淘汰最久未用的 b
+        entry_b = cache._entries["b"]
+        self.assertEqual(cache.put("c", "vc", "rc", cache.generation), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(bytes(entry_b.value), b"\0\0")
+
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 1)
+
+        entry_c = cache._entries["c"]
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(bytes(entry_c.value), b"\0\0")
+
+    def test_stale_generation_is_not_stored(self) -> None:
+        cache = RecordCache(max_size=4, ttl=10)
+        generation = cache.generation
+        cache.invalidate(["k"])
+        cache.put("k", "old", "r", generation)
+        self.assertIsNone(cache.get("k"))
+
+    def test_invalid_arguments(self) -> None:
+        with self.assertRaises(ValueError):
+            RecordCache(max_size=0, ttl=10)
+        with self.assertRaises(ValueError):
+            RecordCache(max_size=1, ttl=0)
+
+
+class TestStoreCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.db_path = os.path.join(self._tmp.name, "c.db")
+        self.store = ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF, cache_size=8)
+        self.addCleanup(self.store.close)
+        self.store.create_many([(f"k{i}", f"v{i}", "r") for i in range(4)])
+
+    def counters(self) -> dict[str, int]:
+        return self.store.stats()["counters"]
+
+    def test_hits_and_local_invalidation(self) -> None:
+        self.assertEqual(self.store.get("k1").value, "v1")
+        self.assertEqual(self.store.get("k1").value, "v1")
+        self.assertEqual([r.record.value for r in self.store.get_many(["k1", "k2"])], ["v1", "v2"])
+        self.assertEqual((self.counters()["cache.hits"], self.counters()["cache.misses"]), (2, 2))
+
+        self.store.update("k1", "k1", "new", "r")
+        self.assertEqual(self.store.get("k1").value, "new")
+        self.store.update("k2", "renamed", "v2", "r")
+        self.assertIsNone(self.store.get("k2"))
+        self.store.delete("k1")
+        self.assertIsNone(self.store.get("k1"))
+        self.store.delete_many(["renamed"])
+        self.assertIsNone(self.store.get("renamed"))
+
+    def test_changes_from_other_connections_invalidate(self) -> None:
+        self.assertEqual(self.store.get("k0").value, "v0")
+        self.assertEqual(self.store.get("k3").value, "v3")
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as other:
+            other.update("k0", "k0", "changed", "r")
+            other.delete("k3")
+        self.assertEqual(self.store.get("k0").value, "changed")
+        self.assertIsNone(self.store.get("k3"))
+
+    def test_lock_wipes_cache(self) -> None:
+        self.store.get("k0")
+        self.assertEqual(len(self.store._cache), 1)
+        self.store.lock()
+        self.assertEqual(len(self.store._cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
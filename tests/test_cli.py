@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from save_api_key import cli
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmp.name, "cli.db")
+        ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF).close()
+        patcher = mock.patch.dict(os.environ, {cli.PASSWORD_ENV: "pw"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+    def run_cli(self, *argv: str) -> tuple[int, str]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            code = cli.main(["--db", self.db_path, *argv])
+        return code, out.getvalue()
+
+    def test_set_get_list_delete(self) -> None:
+        self.assertEqual(self.run_cli("set", "OPENAI", "sk-1", "--remark", "prod")[0], 0)
+        self.assertEqual(self.run_cli("get", "OPENAI"), (0, "sk-1\n"))
+        self.assertEqual(self.run_cli("set", "OPENAI", "sk-2")[0], 0)
+        code, out = self.run_cli("get", "OPENAI", "--json")
+        self.assertEqual(json.loads(out), {"key": "OPENAI", "value": "sk-2", "remark": "prod"})
+        self.assertEqual(self.run_cli("list"), (0, "OPENAI\tprod\n"))
+        self.assertEqual(self.run_cli("delete", "OPENAI")[0], 0)
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("get", "OPENAI")[0], 1)
+
+    def test_list_limit(self) -> None:
+        for i in range(5):
+            self.assertEqual(self.run_cli("set", f"K{i}", "v", "--remark", "r")[0], 0)
+        self.assertEqual(len(self.run_cli("list")[1].splitlines()), 5)
+        self.assertEqual(self.run_cli("list", "--limit", "2"), (0, "K0\tr\nK1\tr\n"))
+        self.assertEqual(len(self.run_cli("list", "K", "--limit", "3")[1].splitlines()), 3)
+
+    def test_wrong_password(self) -> None:
+        with mock.patch.dict(os.environ, {cli.PASSWORD_ENV: "bad"}), mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("get", "x")[0], 1)
+
+    def test_export_import_roundtrip(self) -> None:
+        self.run_cli("set", "a", "1", "--remark", "r")
+        export_path = os.path.join(self._tmp.name, "export.json")
+        self.assertEqual(self.run_cli("export", export_path)[0], 0)
+        if os.name == "posix":
+            self.assertEqual(stat.S_IMODE(os.stat(export_path).st_mode), 0o600)
+        self.run_cli("delete", "a")
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("import", export_path)[0], 0)
+        self.assertEqual(self.run_cli("get", "a"), (0, "1\n"))
+
+    def test_import_env_and_csv(self) -> None:
+        self.run_cli("set", "A", "old")
+        env_path = os.path.join(self._tmp.name, "legacy.env")
+        with open(env_path, "w", encoding="utf-8") as f:
+            f.write("A=new\nB=2\nnot a pair\n")
+        with mock.patch("sys.stderr", io.StringIO()) as err:
+            self.assertEqual(self.run_cli("import", env_path, "--remark", "legacy")[0], 1)
+        self.assertIn("新增 1 条，覆盖 0 条，跳过 1 条，失败 1 条", err.getvalue())
+        self.assertEqual(self.run_cli("get", "A"), (0, "old\n"))
+
+        csv_path = os.path.join(self._tmp.name, "keys.txt")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("key,value\nA,from-csv\n")
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("import", csv_path)[0], 1)
+            self.assertEqual(self.run_cli("import", csv_path, "--format", "csv", "--on-conflict", "upsert")[0], 0)
+        self.assertEqual(self.run_cli("get", "A"), (0, "from-csv\n"))
+
+        # overwrite 只覆盖同名 key，不会删除库中的其他记录
+        with open(env_path, "w", encoding="utf-8") as f:
+            f.write("A=one-line\n")
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("import", env_path, "--on-conflict", "overwrite")[0], 0)
+        self.assertEqual(self.run_cli("get", "B"), (0, "2\n"))
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("import", env_path, "--replace-all")[0], 0)
+        self.assertEqual(self.run_cli("list"), (0, "A\tA\n"))
+
+        with mock.patch("sys.stderr", io.StringIO()) as err:
+            self.assertEqual(self.run_cli("import", os.path.join(self._tmp.name, "missing.env"))[0], 1)
+        self.assertIn("无法读取", err.getvalue())
+
+    def test_expire_and_purge(self) -> None:
+        self.run_cli("set", "A", "1")
+        self.run_cli("set", "B", "2")
+        self.assertEqual(self.run_cli("expire", "A", "--in", "0")[0], 0)
+        self.assertEqual(self.run_cli("expire", "B", "--in", "30d")[0], 0)
+        code, out = self.run_cli("list", "--expiring", "1d", "--json")
+        self.assertEqual([json.loads(line)["key"] for line in out.splitlines()], ["A"])
+        self.assertEqual(len(self.run_cli("list", "--expiring", "31d")[1].splitlines()), 2)
+        self.assertEqual(self.run_cli("purge"), (0, "A\n"))
+        self.assertEqual(self.run_cli("expire", "B", "--clear")[0], 0)
+        self.assertEqual(self.run_cli("list", "--expiring", "1w"), (0, ""))
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("expire", "A", "--in", "1h")[0], 1)
+        self.assertEqual(cli._parse_duration("90m"), 5400)
+
+    def test_usage(self) -> None:
+        self.run_cli("set", "A", "1")
+        self.run_cli("set", "B", "2")
+        # 命令行的 get 是短命进程，不统计访问，读取时不写库
+        self.run_cli("get", "A")
+        self.assertEqual(self.run_cli("usage"), (0, ""))
+        with ApiKeyStore(self.db_path, "pw", access_stats=True) as store:
+            store.get("A")
+            store.get("A")
+        code, out = self.run_cli("usage", "--json")
+        self.assertEqual([(item["key"], item["count"]) for item in map(json.loads, out.splitlines())], [("A", 2)])
+        self.assertEqual(self.run_cli("usage", "--unused-for", "1d"), (0, "B\t0\t-\n"))
+
+    def test_backup_restore(self) -> None:
+        self.run_cli("set", "a", "1")
+        backup_path = os.path.join(self._tmp.name, "backup.sak")
+        self.assertEqual(self.run_cli("backup", backup_path)[0], 0)
+        self.run_cli("set", "a", "2")
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("restore", backup_path, "--on-conflict", "upsert")[0], 0)
+        self.assertEqual(self.run_cli("get", "a"), (0, "1\n"))
+
+    def test_passwd(self) -> None:
+        self.run_cli("set", "a", "1")
+        with mock.patch.dict(os.environ, {cli.NEW_PASSWORD_ENV: "pw2"}), mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("passwd")[0], 0)
+        with mock.patch.dict(os.environ, {cli.PASSWORD_ENV: "pw2"}):
+            self.assertEqual(self.run_cli("get", "a"), (0, "1\n"))
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("get", "a")[0], 1)
+
+    def test_run_injects_secrets(self) -> None:
+        self.run_cli("set", "OPENAI", "sk-1")
+        self.run_cli("set", "GH", "gh-1")
+        with mock.patch("os.execvpe") as execvpe, mock.patch.object(cli.os, "name", "posix"):
+            self.run_cli("run", "--map", "OPENAI_API_KEY=OPENAI", "--map", "GH", "--", "job", "--flag")
+        file, argv, env = execvpe.call_args.args
+        self.assertEqual((file, argv), ("job", ["job", "--flag"]))
+        self.assertEqual((env["OPENAI_API_KEY"], env["GH"]), ("sk-1", "gh-1"))
+        self.assertNotIn(cli.PASSWORD_ENV, env)
+
+        with mock.patch("os.execvpe") as execvpe, mock.patch("sys.stderr", io.StringIO()) as err:
+            self.assertEqual(self.run_cli("run", "--map", "X=missing", "--map", "Y=OPENAI", "--", "job")[0], 1)
+        execvpe.assert_not_called()
+        self.assertIn("missing", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
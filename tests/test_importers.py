@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from save_api_key import importers
+from save_api_key.importers import ParseError
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+def rows(records) -> list[tuple]:
+    return [(r["key"], r["value"], r["remark"]) if "error" not in r else ("error", r["key"]) for r in records]
+
+
+class TestParsers(unittest.TestCase):
+    def test_env(self) -> None:
+        text = "\n".join([
+            "# comment",
+            "export OPENAI=sk-1",
+            "PLAIN = value with spaces  # trailing comment",
+            'QUOTED="a#b \\"c\\"\\n"',
+            "SINGLE='raw \\n # kept'",
+            "EMPTY=",
+            "broken line",
+            'BAD="unterminated',
+        ])
+        self.assertEqual(rows(importers.parse_env(io.StringIO(text), remark="legacy")), [
+            ("OPENAI", "sk-1", "legacy"),
+            ("PLAIN", "value with spaces", "legacy"),
+            ("QUOTED", 'a#b "c"\n', "legacy"),
+            ("SINGLE", "raw \\n # kept", "legacy"),
+            ("EMPTY", "", "legacy"),
+            ("error", "line 7"),
+            ("error", "line 8"),
+        ])
+
+    def test_json_array_streams_across_chunks(self) -> None:
+        items = [{"key": f"k{i}", "value": "v" * (i % 7), "remark": "r"} for i in range(200)]
+        items[5] = 12345
+        data = json.dumps(items, indent=1)
+        with mock.patch.object(importers, "_JSON_CHUNK_SIZE", 7):
+            parsed = rows(importers.parse_json(io.StringIO(data)))
+        self.assertEqual(len(parsed), 200)
+        self.assertEqual(parsed[5], ("error", "element 5"))
+        self.assertEqual(parsed[199], ("k199", "v" * (199 % 7), "r"))
+
+        self.assertEqual(rows(importers.parse_json(io.StringIO('{"A": "1", "B": "2"}'))), [
+            ("A", "1", "A"), ("B", "2", "B"),
+        ])
+        self.assertEqual(list(importers.parse_json(io.StringIO(" [ ] "))), [])
+        for bad in ('[{"key": "a", "value": "b"} {"key": "c"}]', '[{"key": "a"', "3"):
+            with self.assertRaises(ParseError):
+                list(importers.parse_json(io.StringIO(bad)))
+
+    def test_jsonl_and_csv(self) -> None:
+        text = '{"key": "a", "value": "1"}\n\nnot json\n{"key": "b", "value": "2", "remark": "x"}\n'
+        self.assertEqual(rows(importers.parse_jsonl(io.StringIO(text))), [
+            ("a", "1", "a"), ("error", "line 3"), ("b", "2", "x"),
+        ])
+        csv_text = 'Value,KEY,remark\n"multi\nline",a,note\n2,b,\n,\n3\n'
+        self.assertEqual(rows(importers.parse_csv(io.StringIO(csv_text, newline=""))), [
+            ("a", "multi\nline", "note"), ("b", "2", "b"), ("error", "line 6"),
+        ])
+        with self.assertRaises(ParseError):
+            list(importers.parse_csv(io.StringIO("name,secret\n")))
+
+    def test_detect_format(self) -> None:
+        self.assertEqual(importers.detect_format("/x/.env"), "env")
+        self.assertEqual(importers.detect_format("prod.env"), "env")
+        self.assertEqual(importers.detect_format(".env.local"), "env")
+        self.assertEqual(importers.detect_format("keys.CSV"), "csv")
+        self.assertEqual(importers.detect_format("dump.ndjson"), "jsonl")
+        with self.assertRaises(ValueError):
+            importers.detect_format("keys.txt")
+
+
+class TestImportRecords(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.store = ApiKeyStore(os.path.join(self._tmp.name, "i.db"), "pw", kdf_params=FAST_KDF)
+        self.addCleanup(self.store.close)
+
+    def test_batches_validation_and_conflicts(self) -> None:
+        self.store.create("k0", "local", "mine")
+        records = [{"key": f"k{i}", "value": f"v{i}", "remark": "r"} for i in range(10)]
+        records += [
+            {"key": "k3", "value": "dup", "remark": "r"},
+            {"key": " ", "value": "x", "remark": "r"},
+            {"key": "toolong", "value": "x" * 3000, "remark": "r"},
+            {"key": "line 9", "error": ParseError("line 9: bad")},
+        ]
+        seen = []
+        result = self.store.import_records(iter(records), batch_size=4, progress=lambda r: seen.append(r.processed))
+        self.assertEqual((result.inserted, result.updated, result.skipped, result.failed), (9, 0, 2, 3))
+        self.assertEqual(seen, [4, 8, 12, 14])
+        self.assertEqual(self.store.get("k0").value, "local")
+        self.assertEqual(self.store.get("k3").value, "v3")
+
+        result = self.store.import_records(records, on_conflict="upsert", batch_size=100)
+        self.assertEqual((result.inserted, result.updated, result.skipped), (0, 10, 1))
+        self.assertEqual(self.store.get("k3").value, "dup")
+
+        # overwrite 只覆盖同名 key，清空整个库必须显式 replace_all
+        result = self.store.import_records([{"key": "k1", "value": "again", "remark": "r"}], on_conflict="overwrite")
+        self.assertEqual((result.inserted, result.updated), (0, 1))
+        self.assertEqual(len(self.store.list_keys()), 10)
+        result = self.store.import_records(records[:2], replace_all=True)
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual([e.key for e in self.store.list_keys()], ["k0", "k1"])
+        with self.assertRaises(ValueError):
+            self.store.import_records(records, batch_size=0)
+
+    def test_import_file(self) -> None:
+        path = os.path.join(self._tmp.name, "legacy.env")
+        with open(path, "w", encoding="utf-8-sig") as f:
+            f.write("\n".join(f"KEY_{i}=value-{i}" for i in range(1000)))
+        result = self.store.import_records(importers.iter_file(path, remark="legacy"))
+        self.assertEqual(result.inserted, 1000)
+        record = self.store.get("KEY_0")
+        self.assertEqual((record.value, record.remark), ("value-0", "legacy"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+READERS = 3
+WRITERS = 3
+WRITES_PER_WRITER = 40
+
+
+def _open_vault(db_path: str, barrier, queue) -> None:
+    barrier.wait()
+    try:
+        with ApiKeyStore(db_path, "pw", kdf_params=FAST_KDF) as store:
+            queue.put(("ok", store.unlocked))
+    except Exception as exc:
+        queue.put(("error", repr(exc)))
+
+
+def _writer(db_path: str, writer_id: int, barrier, queue) -> None:
+    try:
+        with ApiKeyStore(db_path, "pw", kdf_params=FAST_KDF) as store:
+            barrier.wait()
+            for i in range(WRITES_PER_WRITER):
+                key = f"w{writer_id}-{i}"
+                store.create(key, "v1", "r")
+                store.update(key, key, "v2", "r")
+            store.create_many([(f"w{writer_id}-batch-{i}", "b", "r") for i in range(10)])
+        queue.put(("ok", writer_id))
+    except Exception as exc:
+        queue.put(("error", repr(exc)))
+
+
+def _reader(db_path: str, barrier, queue) -> None:
+    try:
+        with ApiKeyStore(db_path, "pw", kdf_params=FAST_KDF) as store:
+            barrier.wait()
+            for _ in range(WRITES_PER_WRITER):
+                for entry in store.list_keys(limit=20):
+                    record = store.get(entry.key)
+                    # 读到的值要么是旧值要么是新值，不会读到半写的记录
+                    if record is not None and record.value not in ("seed", "v1", "v2", "b"):
+                        raise AssertionError(f"unexpected value {record.value!r}")
+        queue.put(("ok", None))
+    except Exception as exc:
+        queue.put(("error", repr(exc)))
+
+
+class TestMultiProcess(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.db_path = os.path.join(self._tmp.name, "mp.db")
+        self.ctx = multiprocessing.get_context("spawn")
+
+    def _run(self, procs, queue) -> list:
+        for proc in procs:
+            proc.start()
+        results = [queue.get(timeout=60) for _ in procs]
+        for proc in procs:
+            proc.join(timeout=60)
+            self.assertEqual(proc.exitcode, 0)
+        errors = [detail for status, detail in results if status == "error"]
+        self.assertEqual(errors, [])
+        return [detail for _status, detail in results]
+
+    def test_concurrent_first_open_shares_one_salt(self) -> None:
+        barrier = self.ctx.Barrier(4)
+        queue = self.ctx.Queue()
+        procs = [self.ctx.Process(target=_open_vault, args=(self.db_path, barrier, queue)) for _ in range(4)]
+        self.assertEqual(self._run(procs, queue), [True] * 4)
+
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as store:
+            self.assertTrue(store.unlocked)
+        with ApiKeyStore(self.db_path, "wrong", kdf_params=FAST_KDF) as store:
+            self.assertFalse(store.unlocked)
+
+    def test_readers_and_writers(self) -> None:
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as store:
+            store.create_many([(f"seed-{i}", "seed", "r") for i in range(20)])
+
+        barrier = self.ctx.Barrier(READERS + WRITERS)
+        queue = self.ctx.Queue()
+        procs = [
+            self.ctx.Process(target=_writer, args=(self.db_path, i, barrier, queue)) for i in range(WRITERS)
+        ] + [self.ctx.Process(target=_reader, args=(self.db_path, barrier, queue)) for _ in range(READERS)]
+        self._run(procs, queue)
+
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as store:
+            entries = store.list_keys()
+            self.assertEqual(len(entries), 20 + WRITERS * (WRITES_PER_WRITER + 10))
+            for writer_id in range(WRITERS):
+                self.assertEqual(store.get(f"w{writer_id}-{WRITES_PER_WRITER - 1}").value, "v2")
+
+
+if __name__ == "__main__":
+    unittest.main()
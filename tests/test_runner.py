@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from save_api_key import runner
+from save_api_key.storage import ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+class TestRunner(unittest.TestCase):
+    def test_parse_mappings(self) -> None:
+        self.assertEqual(
+            runner.parse_mappings(["OPENAI_API_KEY=openai", " GH ", "A = a key "]),
+            {"OPENAI_API_KEY": "openai", "GH": "GH", "A": "a key"},
+        )
+        for bad in (["1X=k"], ["X="], ["X-Y=k"], ["X=a", "X=b"]):
+            with self.assertRaises(ValueError):
+                runner.parse_mappings(bad)
+
+    def test_build_env_reports_all_missing(self) -> None:
+        with self.assertRaises(KeyError) as ctx:
+            runner.build_env({"A": "a", "B": "b", "C": "c"}, {"b": "1"}, base={})
+        self.assertIn("a, c", str(ctx.exception))
+        self.assertEqual(runner.build_env({"A": "a"}, {"a": "1"}, base={"PATH": "/bin"}), {"PATH": "/bin", "A": "1"})
+
+    def test_run_with_secrets_uses_one_batch_read(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ApiKeyStore(os.path.join(tmp, "r.db"), "pw", kdf_params=FAST_KDF)
+            try:
+                store.create_many([(f"k{i}", f"v{i}", "r") for i in range(50)])
+                mappings = {f"SECRET_{i}": f"k{i}" for i in range(50)}
+                calls = []
+                original = store.get_many
+                store.get_many = lambda keys: calls.append(keys) or original(keys)
+                code = runner.run_with_secrets(
+                    store,
+                    mappings,
+                    [sys.executable, "-c", "import os, sys; sys.exit(os.environ['SECRET_7'] != 'v7')"],
+                )
+            finally:
+                store.close()
+        self.assertEqual(code, 0)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,25 @@
+import io
+import json
 import os
+import sqlite3
 import tempfile
+import threading
 import unittest
-from save_api_key.storage import ApiKeyStore
+from unittest import mock
+
+from save_api_key import kdf
+from save_api_key.archive import ArchiveError
+from save_api_key.crypto import CryptoEngine
+from save_api_key.metrics import NULL_METRICS
+from save_api_key.storage import FMT_AEAD, FMT_FERNET, SCHEMA_VERSION, ApiKeyStore
+
+from tests.helpers import FAST_KDF
+
+
+def remove_vault_files(db_path: str) -> None:
+    for suffix in ("", "-wal", "-shm", ".salt", ".verifier", ".kdf"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
 
 
 class TestSecureStorage(unittest.TestCase):
@@ -12,14 +30,8 @@ class TestSecureStorage(unittest.TestCase):
         self.store = ApiKeyStore(self.db_path, self.master_password)
 
     def tearDown(self) -> None:
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-        salt_path = self.db_path + ".salt"
-        if os.path.exists(salt_path):
-            os.remove(salt_path)
-        verifier_path = self.db_path + ".verifier"
-        if os.path.exists(verifier_path):
-            os.remove(verifier_path)
+        self.store.close()
+        remove_vault_files(self.db_path)
         os.rmdir(self.tmpdir)
 
     def test_create_and_list(self) -> None:
@@ -63,10 +75,433 @@ class TestSecureStorage(unittest.TestCase):
 
     def test_encryption(self) -> None:
         self.store.create("enc_key", "secret_value", "enc_remark")
-        with open(self.db_path, "rb") as f:
-            raw = f.read()
+        raw = b""
+        for path in (self.db_path, self.db_path + "-wal"):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    raw += f.read()
         self.assertNotIn(b"secret_value", raw)
 
+    def test_persistent_connection_and_close(self) -> None:
+        self.store.create("k", "v", "r")
+        with self.store._connect() as conn1:
+            mode = conn1.execute("PRAGMA journal_mode").fetchone()[0]
+        with self.store._connect() as conn2:
+            pass
+        self.assertIs(conn1, conn2)
+        self.assertEqual(mode, "wal")
+
+        with ApiKeyStore(self.db_path, self.master_password) as other:
+            self.assertEqual(other.get("k").value, "v")
+        with self.assertRaises(RuntimeError):
+            other.get("k")
+
+    def test_batch_crud(self) -> None:
+        self.store.create("exists", "v0", "r0")
+        created = self.store.create_many([
+            ("a", "va", "ra"),
+            ("b", "vb", "rb"),
+            ("exists", "vx", "rx"),
+            ("", "v", "r"),
+            ("a", "dup", "dup"),
+        ])
+        self.assertEqual([r.ok for r in created], [True, True, False, False, False])
+        self.assertEqual(self.store.get("a").value, "va")
+
+        fetched = self.store.get_many(["a", "b", "missing"])
+        self.assertEqual([r.record.value for r in fetched[:2]], ["va", "vb"])
+        self.assertIsInstance(fetched[2].error, KeyError)
+
+        updated = self.store.update_many([
+            ("a", "a2", "va2", "ra2"),
+            ("missing", "m", "v", "r"),
+            ("b", "exists", "vb2", "rb2"),
+        ])
+        self.assertEqual([r.ok for r in updated], [True, False, False])
+        self.assertEqual(self.store.get("a2").value, "va2")
+        self.assertEqual(self.store.get("b").value, "vb")
+
+        deleted = self.store.delete_many(["a2", "b", "missing"])
+        self.assertEqual([r.ok for r in deleted], [True, True, False])
+        self.assertEqual([row["key"] for row in self.store.list_all()], ["exists"])
+
+    def test_list_keys_paging(self) -> None:
+        self.store.create_many([(f"k{i:02d}", f"v{i}", f"r{i}") for i in range(7)])
+        page = self.store.list_keys(limit=3)
+        self.assertEqual([e.key for e in page], ["k00", "k01", "k02"])
+        self.assertEqual(page[1].remark, "r1")
+        self.assertEqual(page[1].value, "v1")
+        self.assertEqual([e.key for e in self.store.list_keys(limit=2, offset=5)], ["k05", "k06"])
+        self.assertEqual([e.key for e in self.store.list_keys(after="k04")], ["k05", "k06"])
+        self.assertEqual(len(list(self.store.iter_keys(batch_size=2))), 7)
+
+    def test_parallel_engine(self) -> None:
+        engine = CryptoEngine(max_workers=4, chunk_size=3, serial_threshold=0)
+        self.assertEqual(engine.map(lambda x: x * 2, list(range(20))), [x * 2 for x in range(20)])
+
+        parallel_db = os.path.join(self.tmpdir, "parallel.db")
+        store = ApiKeyStore(parallel_db, "pw", kdf_params=FAST_KDF, engine=engine)
+        store.create_many([(f"k{i:02d}", f"v{i}", "r") for i in range(20)])
+        rows = store.list_all()
+        self.assertEqual([row["value"] for row in rows], [f"v{i}" for i in range(20)])
+        self.assertEqual(len([r for r in store.get_many(["k01", "k19"]) if r.ok]), 2)
+        executor = engine._executor
+        store.close()
+        # 传入的引擎归调用方所有，关闭存储不会关闭它的线程池
+        self.assertIs(engine._executor, executor)
+        self.assertIsNotNone(executor)
+        engine.close()
+        remove_vault_files(parallel_db)
+
+    def test_legacy_rows_migrated_once(self) -> None:
+        legacy_db = os.path.join(self.tmpdir, "legacy.db")
+        store = ApiKeyStore(legacy_db, "pw", kdf_params=FAST_KDF)
+        # 旧库中的密文都是 Fernet token
+        token = store._cipher.encrypt(b"already_encrypted").decode()
+        side_files = {".salt": store._salt, ".verifier": store._verifier, ".kdf": json.dumps(FAST_KDF).encode()}
+        store.close()
+        # 模拟引入格式列之前的旧库：明文与密文混存，盐值等保存在旁路文件中
+        remove_vault_files(legacy_db)
+        for suffix, data in side_files.items():
+            with open(legacy_db + suffix, "wb") as f:
+                f.write(data)
+        conn = sqlite3.connect(legacy_db)
+        conn.execute("CREATE TABLE apikeys (key TEXT PRIMARY KEY, value TEXT NOT NULL, remark TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO apikeys VALUES (?, ?, ?)",
+            [("enc", token, "r"), ("plain1", "p1", "r"), ("plain2", "p2", "r")],
+        )
+        conn.commit()
+        conn.close()
+
+        store = ApiKeyStore(legacy_db, "pw")
+        self.assertEqual(
+            [row["value"] for row in store.list_all()],
+            ["already_encrypted", "p1", "p2"],
+        )
+        with store._connect() as conn:
+            rows = {row["key"]: row for row in conn.execute("SELECT key, value, fmt FROM apikeys")}
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        self.assertEqual(version, SCHEMA_VERSION)
+        # 旁路文件已导入 meta 表并删除
+        self.assertFalse(any(os.path.exists(legacy_db + suffix) for suffix in side_files))
+        self.assertTrue(store.verify_password("pw"))
+        # 已加密的旧行不会被重新加密，明文行直接加密为 v2
+        self.assertEqual(rows["enc"]["fmt"], FMT_FERNET)
+        self.assertEqual(rows["enc"]["value"], token)
+        self.assertEqual(rows["plain1"]["fmt"], FMT_AEAD)
+        self.assertIsInstance(rows["plain1"]["value"], bytes)
+        self.assertEqual(store.migrate_legacy(), 0)
+        store.close()
+        remove_vault_files(legacy_db)
+
+    def test_unlock_does_not_wait_for_writer(self) -> None:
+        self.store.create("k", "v", "r")
+        # 另一个连接长期持有写锁：没有待迁移的行时解锁只读，不应排队等写锁
+        writer = sqlite3.connect(self.db_path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            with mock.patch.object(ApiKeyStore, "_write", side_effect=AssertionError("unexpected write")):
+                with ApiKeyStore(self.db_path, self.master_password) as other:
+                    self.assertEqual(other.get("k").value, "v")
+        finally:
+            writer.execute("ROLLBACK")
+
+    def test_v2_format_and_upgrade(self) -> None:
+        self.store.create("new", "secret-value", "r")
+        with self.store._connect() as conn:
+            row = conn.execute("SELECT value, fmt, typeof(value) AS t FROM apikeys WHERE key = 'new'").fetchone()
+        self.assertEqual((row["fmt"], row["t"]), (FMT_AEAD, "blob"))
+        # 版本字节 + nonce + 密文 + 标签，比 Fernet token 小得多
+        self.assertEqual(row["value"][:1], b"\x02")
+        self.assertEqual(len(row["value"]), 1 + 12 + len("secret-value") + 16)
+
+        # 模拟升级前写入的 Fernet 行：读取透明，upgrade_format 后改为 v2
+        tokens = [self.store._cipher.encrypt(f"old{i}".encode()).decode() for i in range(5)]
+        with self.store._connect() as conn:
+            conn.executemany(
+                "INSERT INTO apikeys (key, value, remark, fmt) VALUES (?, ?, 'r', ?)",
+                [(f"old{i}", token, FMT_FERNET) for i, token in enumerate(tokens)],
+            )
+            conn.commit()
+        self.assertEqual(self.store.get("old3").value, "old3")
+        self.assertEqual(self.store.upgrade_format(chunk_size=2), 5)
+        self.assertEqual(self.store.upgrade_format(), 0)
+        self.assertEqual([r.record.value for r in self.store.get_many(["old0", "old4"])], ["old0", "old4"])
+        with self.store._connect() as conn:
+            fmts = {row[0] for row in conn.execute("SELECT fmt FROM apikeys")}
+            # 篡改任意字节都会导致认证失败
+            blob = bytearray(conn.execute("SELECT value FROM apikeys WHERE key = 'new'").fetchone()[0])
+            blob[-1] ^= 1
+            conn.execute("UPDATE apikeys SET value = ? WHERE key = 'new'", (bytes(blob),))
+            conn.commit()
+        self.assertEqual(fmts, {FMT_AEAD})
+        with self.assertRaises(ValueError):
+            self.store.get("new")
+
+    def test_rotate_master_password(self) -> None:
+        rotate_db = os.path.join(self.tmpdir, "rotate.db")
+        store = ApiKeyStore(rotate_db, "old-pw", kdf_params=FAST_KDF)
+        store.create_many([(f"k{i:02d}", f"v{i}", "r") for i in range(10)])
+        with self.assertRaises(ValueError):
+            store.rotate_master_password("wrong", "new-pw")
+
+        # 第三块加密时模拟崩溃：前两块已提交，其余行仍是旧密钥
+        original_encrypt = ApiKeyStore._encrypt
+        calls = []
+
+        def failing_encrypt(self_, plaintext):
+            calls.append(plaintext)
+            if len(calls) > 4:
+                raise RuntimeError("crash")
+            return original_encrypt(self_, plaintext)
+
+        with mock.patch.object(ApiKeyStore, "_encrypt", failing_encrypt):
+            with self.assertRaises(RuntimeError):
+                store.rotate_master_password("old-pw", "new-pw", chunk_size=2)
+        # 中断期间全部数据仍可读，新写入使用新密钥
+        self.assertEqual([r.record.value for r in store.get_many(["k00", "k09"])], ["v0", "v9"])
+        store.create("k10", "v10", "r")
+        store.close()
+
+        # 用旧密码解锁也能继续完成轮换
+        store = ApiKeyStore(rotate_db, "old-pw")
+        self.assertTrue(store.unlocked)
+        self.assertEqual(len(store.list_all()), 11)
+        store.close()
+
+        self.assertFalse(ApiKeyStore(rotate_db, "old-pw").unlocked)
+        store = ApiKeyStore(rotate_db, "new-pw")
+        self.assertTrue(store.unlocked)
+        self.assertTrue(store.verify_password("new-pw"))
+        self.assertEqual(store.get("k10").value, "v10")
+        self.assertEqual([row["value"] for row in store.list_all()][:3], ["v0", "v1", "v2"])
+        with store._connect() as conn:
+            names = {row[0] for row in conn.execute("SELECT name FROM meta")}
+        self.assertEqual(names, {"salt", "verifier", "kdf", "revision"})
+        # 重新加密不改变明文，不产生变更记录
+        revision = store.revision
+        self.assertEqual(store.rotate_master_password("new-pw", "newer-pw"), 11)
+        self.assertEqual(store.revision, revision)
+        store.close()
+        self.assertTrue(ApiKeyStore(rotate_db, "newer-pw").unlocked)
+        remove_vault_files(rotate_db)
+
+    def test_connections_of_finished_threads_are_closed(self) -> None:
+        self.store.create("k", "v", "r")
+        for _ in range(20):
+            worker = threading.Thread(target=self.store.get, args=("k",))
+            worker.start()
+            worker.join()
+        # 新线程建立连接时回收已结束线程的连接
+        self.assertLessEqual(len(self.store._conns), 3)
+        worker = threading.Thread(target=lambda: (self.store.get("k"), self.store.release_connection()))
+        worker.start()
+        worker.join()
+        self.assertEqual([thread for thread, _conn in self.store._conns], [threading.current_thread()])
+
+    def test_rotation_with_other_instance_open(self) -> None:
+        rotate_db = os.path.join(self.tmpdir, "shared.db")
+        a = ApiKeyStore(rotate_db, "old-pw", kdf_params=FAST_KDF)
+        b = ApiKeyStore(rotate_db, "old-pw")
+        a.create_many([(f"k{i}", f"v{i}", "r") for i in range(6)])
+
+        # 轮换进行中：持旧密钥的 b 从轮换记录中取得新密钥后写入
+        original_encrypt = ApiKeyStore._encrypt
+        calls = []
+
+        def failing_encrypt(self_, plaintext):
+            calls.append(plaintext)
+            if len(calls) > 2:
+                raise RuntimeError("crash")
+            return original_encrypt(self_, plaintext)
+
+        with mock.patch.object(ApiKeyStore, "_encrypt", failing_encrypt):
+            with self.assertRaises(RuntimeError):
+                a.rotate_master_password("old-pw", "new-pw", chunk_size=2)
+        b.create("during", "v", "r")
+        b.update_many([("k5", "k5", "v5b", "r")])
+        a.close()
+        ApiKeyStore(rotate_db, "new-pw").close()
+
+        # 轮换已完成：b 既有的旧密钥解不开任何新密文，拒绝写入而不是写出无法解密的数据
+        b2 = ApiKeyStore(rotate_db, "new-pw")
+        self.assertTrue(b2.unlocked)
+        c = ApiKeyStore(rotate_db, "new-pw")
+        c.rotate_master_password("new-pw", "newer-pw")
+        c.close()
+        with self.assertRaisesRegex(RuntimeError, "changed by another process"):
+            b2.create("after", "v", "r")
+        b2.close()
+        b.close()
+
+        store = ApiKeyStore(rotate_db, "newer-pw")
+        self.assertEqual(store.get("during").value, "v")
+        self.assertEqual(store.get("k5").value, "v5b")
+        self.assertIsNone(store.get("after"))
+        store.close()
+        remove_vault_files(rotate_db)
+
+    def test_export_import_stream(self) -> None:
+        self.store.create_many([(f"k{i:02d}", f"v{i}", "r") for i in range(25)])
+        chunks = list(self.store.export_stream("archive-pw", chunk_size=10, kdf_params=FAST_KDF))
+        # 头 + 3 个数据帧 + 结束帧
+        self.assertEqual(len(chunks), 5)
+        data = b"".join(chunks)
+        self.assertNotIn(b"v10", data)
+
+        other_db = os.path.join(self.tmpdir, "other.db")
+        other = ApiKeyStore(other_db, "other-pw", kdf_params=FAST_KDF)
+        other.create("k00", "local", "mine")
+        result = other.import_stream(io.BytesIO(data), "archive-pw")
+        self.assertEqual((result.inserted, result.updated, result.skipped), (24, 0, 1))
+        self.assertEqual(other.get("k00").value, "local")
+
+        result = other.import_stream(iter(chunks), "archive-pw", on_conflict="upsert")
+        self.assertEqual((result.inserted, result.updated), (0, 25))
+        self.assertEqual(other.get("k00").value, "v0")
+
+        # 密码错误或归档被截断时 overwrite 不改动现有数据
+        other.create("extra", "x", "r")
+        with self.assertRaises(ArchiveError):
+            other.import_stream(io.BytesIO(data), "wrong", on_conflict="overwrite")
+        with self.assertRaises(ArchiveError):
+            other.import_stream(io.BytesIO(data[:-40]), "archive-pw", on_conflict="overwrite")
+        self.assertEqual(len(other.list_all()), 26)
+        result = other.import_stream(io.BytesIO(data), "archive-pw", on_conflict="overwrite")
+        self.assertEqual(result.inserted, 25)
+        self.assertIsNone(other.get("extra"))
+        self.assertEqual([e.key for e in other.search("k07")], ["k07"])
+        with self.assertRaises(ValueError):
+            other.import_stream(io.BytesIO(data), "archive-pw", on_conflict="merge")
+        other.close()
+        remove_vault_files(other_db)
+
+    def test_archive_rejects_hostile_kdf_params(self) -> None:
+        from save_api_key import archive
+
+        hostile = [
+            {"algorithm": "scrypt", "n": 2 ** 30, "r": 8, "p": 1},
+            {"algorithm": "scrypt", "n": 1000, "r": 8, "p": 1},
+            {"algorithm": "pbkdf2-sha256", "iterations": 10 ** 12},
+            {"algorithm": "argon2"},
+            "pbkdf2",
+        ]
+        for params in hostile:
+            header = json.dumps({"kdf": params, "salt": "AAAAAAAAAAAAAAAAAAAAAA=="}).encode()
+            data = archive.MAGIC + archive._LENGTH.pack(len(header)) + header
+            with mock.patch.object(kdf, "derive_key") as derive:
+                with self.assertRaises(ArchiveError):
+                    self.store.import_stream(io.BytesIO(data), "pw")
+            derive.assert_not_called()
+        with self.assertRaises(ValueError):
+            list(self.store.export_stream("pw", kdf_params={"algorithm": "pbkdf2-sha256", "iterations": 0}))
+
+    def test_changes_since(self) -> None:
+        start = self.store.revision
+        self.store.create_many([(f"k{i}", f"v{i}", "r") for i in range(5)])
+        self.store.create("gone", "v", "r")
+        after_create = self.store.revision
+        self.assertEqual(after_create, start + 2)
+
+        changes = self.store.changes_since(start)
+        self.assertEqual(changes.revision, after_create)
+        self.assertEqual([e.key for e in changes.changed], ["gone", "k0", "k1", "k2", "k3", "k4"])
+        self.assertEqual(changes.deleted, [])
+
+        self.store.update("k1", "k1", "new", "remark")
+        self.store.update("k2", "renamed", "v2", "r")
+        self.store.delete("gone")
+        self.store.delete_many(["k3"])
+        changes = self.store.changes_since(after_create)
+        self.assertEqual([(e.key, e.remark) for e in changes.changed], [("k1", "remark"), ("renamed", "r")])
+        self.assertEqual(changes.deleted, ["gone", "k2", "k3"])
+        self.assertFalse(self.store.changes_since(changes.revision))
+
+        # 重新创建已删除的 key 会清除墓碑
+        self.store.create("gone", "again", "r")
+        changes = self.store.changes_since(after_create)
+        self.assertIn("gone", [e.key for e in changes.changed])
+        self.assertNotIn("gone", changes.deleted)
+
+        # 起点比库中修订号还新时要求调用方全量重建
+        changes = self.store.changes_since(self.store.revision + 10)
+        self.assertTrue(changes.reset)
+        self.assertEqual(len(changes.changed), len(self.store.list_all()))
+        self.assertEqual(len(self.store.changes_since(0).changed), len(self.store.list_all()))
+
+    def test_expiry(self) -> None:
+        now = 1_000_000.0
+        self.store.create("soon", "v", "r", expires_at=now + 60)
+        self.store.create("later", "v", "r", expires_at=now + 3600)
+        self.store.create("forever", "v", "r")
+        self.store.create("past", "v", "r")
+        revision = self.store.revision
+        self.store.set_expiry("past", now - 1)
+        self.assertEqual([e.key for e in self.store.changes_since(revision).changed], ["past"])
+        # 不存在的 key 不推进修订号
+        revision = self.store.revision
+        with self.assertRaises(KeyError):
+            self.store.set_expiry("missing", now)
+        self.assertEqual(self.store.revision, revision)
+
+        self.assertEqual([(e.key, e.expires_at) for e in self.store.list_expiring(now=now)], [("past", now - 1)])
+        self.assertEqual([e.key for e in self.store.list_expiring(120, now=now)], ["past", "soon"])
+        self.assertEqual([e.key for e in self.store.list_expiring(10**6, now=now)], ["past", "soon", "later"])
+
+        revision = self.store.revision
+        self.assertEqual(self.store.purge_expired(now=now + 60), ["past", "soon"])
+        changes = self.store.changes_since(revision)
+        self.assertEqual(changes.deleted, ["past", "soon"])
+        self.assertEqual(self.store.get("later").value, "v")
+
+        # 没有到期的记录时不产生新的修订号
+        revision = self.store.revision
+        self.assertEqual(self.store.purge_expired(now=now + 60), [])
+        self.assertEqual(self.store.revision, revision)
+        self.store.set_expiry("later", None)
+        self.assertEqual(self.store.purge_expired(now=now * 2), [])
+        self.assertEqual(len(self.store.list_all()), 2)
+
+    def test_search(self) -> None:
+        self.store.create_many([
+            ("OPENAI_KEY", "v1", "prod"),
+            ("MY_OPENAI", "v2", "staging"),
+            ("github_token", "v3", "for openai proxy"),
+            ("aws_100%_key", "v4", "misc"),
+        ])
+        self.assertEqual(
+            [e.key for e in self.store.search("openai")],
+            ["OPENAI_KEY", "MY_OPENAI", "github_token"],
+        )
+        self.assertEqual([e.key for e in self.store.search("gi")], ["github_token", "MY_OPENAI"])
+        self.assertEqual([e.key for e in self.store.search("0%")], ["aws_100%_key"])
+        self.assertEqual(self.store.search("  "), [])
+
+        self.store.update("github_token", "gitlab_token", "v3", "ci")
+        self.store.delete("MY_OPENAI")
+        self.assertEqual([e.key for e in self.store.search("openai")], ["OPENAI_KEY"])
+        self.assertEqual([e.key for e in self.store.search("gitlab")], ["gitlab_token"])
+
+    def test_stats_and_hooks(self) -> None:
+        spans: list[str] = []
+        self.store.add_hook(lambda name, _seconds, _error: spans.append(name))
+        self.store.create("k", "v", "r")
+        self.store.get("k")
+        stats = self.store.stats()
+        self.assertEqual(stats["latency"]["kdf"]["count"], 1)
+        self.assertGreaterEqual(stats["latency"]["decrypt"]["count"], 1)
+        self.assertIn("encrypt", spans)
+        self.assertIn("sql", spans)
+
+        quiet_db = os.path.join(self.tmpdir, "quiet.db")
+        quiet = ApiKeyStore(quiet_db, "pw", kdf_params=FAST_KDF, metrics=NULL_METRICS)
+        quiet.create("k", "v", "r")
+        self.assertEqual(quiet.stats(), {"counters": {}, "latency": {}})
+        quiet.close()
+        remove_vault_files(quiet_db)
+
     def test_input_validation(self) -> None:
         with self.assertRaises(ValueError):
             self.store.create("", "value", "remark")
@@ -81,14 +516,45 @@ class TestSecureStorage(unittest.TestCase):
         empty_db_path = os.path.join(self.tmpdir, "empty.db")
         empty_store = ApiKeyStore(empty_db_path, "AnyPassword")
         self.assertTrue(empty_store.verify_password("AnyPassword"))
-        if os.path.exists(empty_db_path):
-            os.remove(empty_db_path)
-        salt_path = empty_db_path + ".salt"
-        if os.path.exists(salt_path):
-            os.remove(salt_path)
-        verifier_path = empty_db_path + ".verifier"
-        if os.path.exists(verifier_path):
-            os.remove(verifier_path)
+        empty_store.close()
+        remove_vault_files(empty_db_path)
+
+    def test_unlock_derives_once_and_rejects_wrong_password(self) -> None:
+        self.assertTrue(self.store.unlocked)
+        self.store.create("k", "v", "r")
+        with mock.patch("save_api_key.kdf.derive_key", wraps=kdf.derive_key) as derive:
+            reopened = ApiKeyStore(self.db_path, self.master_password)
+        self.assertEqual(derive.call_count, 1)
+        self.assertTrue(reopened.unlocked)
+        reopened.close()
+
+        wrong = ApiKeyStore(self.db_path, "WrongPassword")
+        self.assertFalse(wrong.unlocked)
+        with self.assertRaises(RuntimeError):
+            wrong.create("k2", "v2", "r2")
+        wrong.close()
+        # 错误密码不能覆盖验证器
+        self.assertTrue(self.store.verify_password(self.master_password))
+
+    def test_kdf_params_persisted(self) -> None:
+        scrypt_db = os.path.join(self.tmpdir, "scrypt.db")
+        params = {"algorithm": "scrypt", "n": 2 ** 10, "r": 8, "p": 1}
+        store = ApiKeyStore(scrypt_db, "pw", kdf_params=params)
+        store.create("k", "v", "r")
+        store.close()
+        # 已存在的库忽略新传入的参数，以记录的参数为准
+        reopened = ApiKeyStore(scrypt_db, "pw", kdf_params=FAST_KDF)
+        self.assertTrue(reopened.unlocked)
+        self.assertEqual(reopened.get("k").value, "v")
+        reopened.close()
+        remove_vault_files(scrypt_db)
+
+    def test_calibrate(self) -> None:
+        params = kdf.calibrate(0.01)
+        self.assertEqual(params["algorithm"], "pbkdf2-sha256")
+        self.assertGreaterEqual(params["iterations"], 100000)
+        scrypt_params = kdf.calibrate(0.01, algorithm="scrypt")
+        self.assertEqual(scrypt_params["algorithm"], "scrypt")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import os
+import queue
+import tempfile
+import unittest
+
+from save_api_key.storage import ApiKeyStore
+from save_api_key.watch import ChangeWatcher
+
+from tests.helpers import FAST_KDF
+
+
+class TestChangeWatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.db_path = os.path.join(self._tmp.name, "w.db")
+        self.store = ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF)
+        self.addCleanup(self.store.close)
+
+    def test_poll_reports_changes_from_other_connections(self) -> None:
+        self.store.create("existing", "v", "r")
+        watcher = ChangeWatcher(self.store)
+        self.assertIsNone(watcher.poll())
+
+        # 另一个实例（独立连接，相当于另一个进程）写入
+        with ApiKeyStore(self.db_path, "pw", kdf_params=FAST_KDF) as other:
+            other.create("new", "v", "r")
+            other.delete("existing")
+        changes = watcher.poll()
+        self.assertEqual([e.key for e in changes.changed], ["new"])
+        self.assertEqual(changes.deleted, ["existing"])
+        self.assertEqual(watcher.revision, self.store.revision)
+        self.assertIsNone(watcher.poll())
+
+    def test_background_thread_invokes_callback(self) -> None:
+        received: queue.Queue = queue.Queue()
+        with ChangeWatcher(self.store, callback=received.put, interval=0.02):
+            self.store.create("k", "v", "r")
+            changes = received.get(timeout=2)
+        self.assertEqual([e.key for e in changes.changed], ["k"])
+
+    def test_invalid_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            ChangeWatcher(self.store, interval=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+from save_api_key.worker import StoreWorker
+
+
+class FakeWidget:
+    """只实现 after/after_cancel 的替身，由测试手动驱动回调"""
+
+    def __init__(self) -> None:
+        self.callbacks: dict[str, object] = {}
+        self._next_id = 0
+
+    def after(self, _ms: int, fn) -> str:
+        self._next_id += 1
+        after_id = f"after#{self._next_id}"
+        self.callbacks[after_id] = fn
+        return after_id
+
+    def after_cancel(self, after_id: str) -> None:
+        self.callbacks.pop(after_id, None)
+
+    def run_until_idle(self, timeout: float = 2.0) -> None:
+        deadline = time.time() + timeout
+        while self.callbacks and time.time() < deadline:
+            after_id, fn = next(iter(self.callbacks.items()))
+            del self.callbacks[after_id]
+            fn()
+            time.sleep(0.005)
+
+
+class TestStoreWorker(unittest.TestCase):
+    def test_results_delivered_on_caller_thread(self) -> None:
+        widget = FakeWidget()
+        busy: list[bool] = []
+        worker = StoreWorker(widget, on_busy=busy.append)
+        results: list[tuple[int, str]] = []
+        errors: list[BaseException] = []
+
+        worker.submit(lambda x: x * 2, 21, on_success=lambda r: results.append((r, threading.current_thread().name)))
+        worker.submit(lambda: 1 / 0, on_error=errors.append)
+        widget.run_until_idle()
+        worker.close()
+
+        self.assertEqual(results, [(42, threading.current_thread().name)])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+        self.assertEqual(busy, [True, False])
+
+    def test_superseded_requests_are_dropped(self) -> None:
+        widget = FakeWidget()
+        worker = StoreWorker(widget)
+        gate = threading.Event()
+        delivered: list[str] = []
+
+        worker.submit(gate.wait)
+        worker.submit(lambda: "old", on_success=delivered.append, tag="reload")
+        worker.submit(lambda: "new", on_success=delivered.append, tag="reload")
+        gate.set()
+        widget.run_until_idle()
+        worker.close()
+
+        self.assertEqual(delivered, ["new"])
+
+    def test_close_waits_for_queued_writes(self) -> None:
+        widget = FakeWidget()
+        worker = StoreWorker(widget)
+        done: list[str] = []
+        errors: list[BaseException] = []
+
+        def slow_write() -> str:
+            time.sleep(0.05)
+            return "saved"
+
+        worker.submit(slow_write, on_success=done.append)
+        worker.submit(lambda: 1 / 0, on_error=errors.append)
+        # close 只等待线程结束，不交付回调；剩余回调由调用方在主线程 drain
+        self.assertTrue(worker.close(timeout=5))
+        self.assertEqual(done, [])
+        worker.drain()
+        self.assertEqual(done, ["saved"])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+        self.assertEqual(widget.callbacks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()